@@ -260,6 +260,37 @@ class APIClient: ObservableObject {
         }
     }
     
+    /// Asks the server to warm a game's rules before the first question; the response body is ignored
+    func prepareGame(gameId: String) async throws {
+        guard let url = URL(string: "\(baseURL)/api/games/\(gameId)/prepare") else {
+            throw NetworkError.invalidURL
+        }
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        
+        if let token = try? KeychainManager.shared.retrieveToken() {
+            request.setValue("Bearer \(token)", forHTTPHeaderField: "Authorization")
+        }
+        
+        do {
+            let (data, response) = try await session.data(for: request)
+            
+            guard let httpResponse = response as? HTTPURLResponse else {
+                throw NetworkError.invalidResponse
+            }
+            
+            guard httpResponse.statusCode == 200 else {
+                let message = String(data: data, encoding: .utf8)
+                throw NetworkError.serverError(statusCode: httpResponse.statusCode, message: message)
+            }
+        } catch let error as NetworkError {
+            throw error
+        } catch {
+            throw NetworkError.networkError(error)
+        }
+    }
+    
     // MARK: - Chat
     
     func queryChatBot(query: String, gameSystem: String) async throws -> StructuredChatResponse {
@@ -37,6 +37,10 @@ class GameManager: ObservableObject {
     
     func selectGame(_ game: Game) {
         selectedGame = game
+        // Warm the game's rules on the server so the first question is fast
+        Task {
+            try? await apiClient.prepareGame(gameId: game.game_id)
+        }
     }
     
     func clearSelection() {
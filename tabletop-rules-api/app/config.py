@@ -7,8 +7,92 @@ class Settings(BaseSettings):
     mongodb_uri: str
     database_name: str = "tabletop_rules"
     openai_api_key: Optional[str] = None  # Optional for basic testing
+    openai_base_url: Optional[str] = None  # e.g. http://localhost:8100/v1 for the fake OpenAI server
     environment: str = "development"
     secret_key: str = "your-secret-key-change-this-in-production"  # For JWT tokens
+
+    # LLM latency budget and hedged retries
+    llm_timeout_seconds: float = 8.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+    llm_max_hedged_requests: int = 1
+
+    # Per-request LLM budgets, enforced before the call is made
+    llm_max_prompt_tokens: int = 3000
+    llm_max_output_tokens: int = 800
+    llm_min_output_tokens: int = 150  # Below this the template answer is served instead
+    llm_max_cost_per_request: float = 0.001  # USD; 0 disables
+    llm_target_latency_seconds: float = 6.0  # 0 disables
+    llm_latency_probe_seconds: float = 60.0  # How often a call is let through when the latency estimate alone would block it
+
+    # Prompt context packing
+    context_token_budget: int = 1500
+    context_candidate_rules: int = 15
+
+    # Conversation history sent with follow-up questions
+    conversation_window_turns: int = 12  # Newest turns loaded per query
+    conversation_history_tokens: int = 600  # Older turns are reduced to a list of earlier questions
+
+    # Per-game rule corpora cached in each worker; warmed at startup for the busiest games
+    corpus_cache_check_seconds: float = 30.0  # How long a cached corpus is trusted before its version is re-checked
+    corpus_cache_max_games: int = 50
+    corpus_cache_max_rules: int = 50  # Rules scored per game by /api/chat/query
+    warm_top_games: int = 5
+    prepare_max_cold_per_minute: int = 30  # Cold games POST /api/games/{id}/prepare may load per worker per minute
+    warm_timeout_seconds: float = 10.0
+    search_index_max_rules: int = 20000  # Rules held per game in the corpus cache and indexed for search
+    federated_search_max_games: int = 50  # Games searched by one cross-game search
+    federated_search_timeout_seconds: float = 2.0  # For loading indexes, then for searching; games not done in time are reported, not waited for
+    
+    # Batch questions (/api/chat/batch) for tournament tooling and the CLI
+    batch_max_questions: int = 100
+    batch_llm_concurrency: int = 4  # Answers generated at once per batch; requests may ask for fewer
+
+    # Follow-up questions re-rank the conversation's cached candidates plus a small fresh retrieval
+    retrieval_cache_ttl_seconds: float = 300.0
+    retrieval_cache_max_conversations: int = 1000
+    retrieval_cache_candidates: int = 30
+    followup_fresh_rules: int = 10
+
+    # Circuit breaker in front of the LLM call
+    breaker_window_size: int = 20
+    breaker_min_requests: int = 5
+    breaker_error_rate_threshold: float = 0.5
+    breaker_slow_call_rate_threshold: float = 0.5
+    breaker_slow_call_seconds: float = 5.0
+    breaker_open_seconds: float = 30.0
+
+    # Metrics; set the directory when running several uvicorn workers
+    metrics_multiprocess_dir: Optional[str] = None
+    metrics_flush_seconds: float = 5.0
+
+    # Per-request stage profiles (Server-Timing header, slow-request samples)
+    server_timing_enabled: bool = True
+    request_profile_log: bool = False  # One JSON line per request with its stage breakdown
+    profile_sample_rate: float = 0.1
+    profile_slow_request_ms: float = 1000.0  # Always sampled
+    profile_buffer_size: int = 200
+
+    # LLM usage rollups (per minute, game and model) flushed to MongoDB
+    usage_flush_seconds: float = 10.0
+    usage_rollup_retention_days: int = 90
+
+    # Precomputed template answers; stored edits are reloaded so every worker picks them up
+    answer_registry_reload_seconds: float = 60.0
+
+    # Batch precomputation of LLM answers for each game's most asked questions
+    precompute_top_n: int = 200
+    precompute_concurrency: int = 4
+    precompute_on_change: bool = True  # Re-answer stale entries after a re-ingest or rule edit
+    precompute_refresh_delay_seconds: float = 30.0
+
+    # Query log for analytics and precomputation; buffered and written in batches
+    query_log_enabled: bool = True
+    query_log_max_buffer: int = 10000  # Entries beyond this are dropped while MongoDB is slow
+    query_log_batch_size: int = 500
+    query_log_flush_seconds: float = 2.0
+    query_log_retention_days: int = 30
     
     class Config:
         env_file = ".env"
@@ -22,6 +22,7 @@ class StructuredChatResponse(BaseModel):
     game_system: str
     structured_response: 'StructuredRuleResponse'
     search_method: str = "text_regex"
+    metadata: Dict[str, Any] = Field(default_factory=dict)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class StreamResponse(BaseModel):
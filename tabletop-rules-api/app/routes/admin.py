@@ -4,9 +4,23 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.database import get_database
 from app.services.auth_service import verify_admin_token, get_admin_user
+from app.services.context_packer import prepare_chunk_for_prompt, prompt_fields
+from app.services.metrics import metrics
+from app.services.profiling import span, slow_requests
+from app.services.retrieval_cache import retrieval_cache
+from app.services.boost_rules import boost_registry, validate_boost_rules
+from app.services.answer_registry import answer_registry, validate_answer
+from app.services.precompute_service import precompute_service
+from app.services.query_log import query_log, top_queries, latency_by_game
+from app.services.corpus_cache import corpus_cache
+from app.services.search_index import search_indexes
+from app.services.typeahead import typeahead_indexes
+from app.services.spelling import spelling_indexes
+from app.config import settings
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
+import time
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -52,6 +66,8 @@ async def basic_markdown_processing(content: str, filename: str, db: AsyncIOMoto
     import frontmatter
     from datetime import datetime
     
+    start_time = time.perf_counter()
+    
     # Parse frontmatter
     try:
         post = frontmatter.loads(content)
@@ -92,13 +108,19 @@ async def basic_markdown_processing(content: str, filename: str, db: AsyncIOMoto
                 },
                 "created_at": datetime.utcnow()
             }
-            chunks.append(chunk)
+            chunks.append(prepare_chunk_for_prompt(chunk))
     
     # Insert chunks
     if chunks:
-        await db.content_chunks.insert_many(chunks)
+        with span("mongo_write"):
+            await db.content_chunks.insert_many(chunks)
+    retrieval_cache.invalidate_game(game_id)
+    corpus_cache.invalidate(game_id)
+    search_indexes.invalidate(game_id)
+    metrics.record_ingest("markdown_simple", len(chunks), time.perf_counter() - start_time)
     
-    # Register/update game
+    # Register/update game; a new corpus version retires precomputed answers
+    previous_game = await db.games.find_one({"game_id": game_id}, {"corpus_version": 1})
     game_doc = {
         "game_id": game_id,
         "name": metadata.get('name', game_id.title()),
@@ -111,6 +133,8 @@ async def basic_markdown_processing(content: str, filename: str, db: AsyncIOMoto
         "rule_count": len(chunks),
         "categories": list(set([chunk["category_id"] for chunk in chunks])),
         "ai_tags": metadata.get('ai_tags', []),
+        "boost_rules": metadata.get('boost_rules'),
+        "corpus_version": (previous_game or {}).get("corpus_version", 0) + 1,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
         "auto_registered": True
@@ -121,6 +145,16 @@ async def basic_markdown_processing(content: str, filename: str, db: AsyncIOMoto
         game_doc,
         upsert=True
     )
+    boost_registry.invalidate(game_id)
+    precompute_service.versions.pop(game_id, None)
+    try:
+        # Build autocomplete and spelling dictionaries now rather than on the first query
+        await typeahead_indexes.get(db, game_id)
+        await spelling_indexes.get(db, game_id)
+    except Exception as e:
+        print(f"Could not build typeahead and spelling indexes for {game_id}: {e}")
+    if previous_game and settings.precompute_on_change:
+        precompute_service.schedule_refresh(db, game_id, retrieve_rules)
     
     return {
         "success": True,
@@ -129,6 +163,30 @@ async def basic_markdown_processing(content: str, filename: str, db: AsyncIOMoto
         "filename": filename
     }
 
+async def retrieve_rules(db: AsyncIOMotorDatabase, game_id: str, question: str) -> List[Dict[str, Any]]:
+    """Context candidates for a question, ranked as /api/chat/query ranks them"""
+    from app.routes.chat import score_rules_for_query
+    all_rules = await corpus_cache.get_rules(db, game_id, limit=settings.corpus_cache_max_rules)
+    boosts = await boost_registry.refresh(db, game_id)
+    return score_rules_for_query(all_rules, question.lower(), boosts)[:settings.context_candidate_rules]
+
+def invalidate_game_caches(game_id: Optional[str]):
+    """Drop this worker's in-memory copies of a game's rules, boosts and indexes"""
+    if not game_id:
+        return
+    retrieval_cache.invalidate_game(game_id)
+    corpus_cache.invalidate(game_id)
+    search_indexes.invalidate(game_id)
+    boost_registry.invalidate(game_id)
+
+async def corpus_changed(db: AsyncIOMotorDatabase, game_id: Optional[str]):
+    """A game's rules were edited: bump its corpus version and refresh precomputed answers"""
+    if not game_id:
+        return
+    await precompute_service.bump_corpus_version(db, game_id)
+    if settings.precompute_on_change:
+        precompute_service.schedule_refresh(db, game_id, retrieve_rules)
+
 @router.get("/games/registered")
 async def list_registered_games(
     db: AsyncIOMotorDatabase = Depends(get_database),
@@ -163,6 +221,7 @@ async def delete_game(
     try:
         # Delete rules
         rules_result = await db.content_chunks.delete_many({"game_id": game_id})
+        invalidate_game_caches(game_id)
         
         # Delete game
         game_result = await db.games.delete_one({"game_id": game_id})
@@ -216,6 +275,141 @@ async def list_games_detailed(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch games: {str(e)}")
 
+@router.get("/games/{game_id}/boost-rules")
+async def get_boost_rules(
+    game_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Get a game's relevance boost rules and where they come from."""
+    try:
+        game = await db.games.find_one({"game_id": game_id}, {"boost_rules": 1})
+        if not game:
+            raise HTTPException(status_code=404, detail=f"Game not found: {game_id}")
+        
+        boosts = await boost_registry.refresh(db, game_id)
+        config = boost_registry.entries[game_id]["config"]
+        return {
+            "game_id": game_id,
+            "source": "game" if game.get("boost_rules") else ("bundled" if config else "global"),
+            "boost_rules": config,
+            "pattern_count": len(boosts.patterns)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch boost rules: {str(e)}")
+
+@router.put("/games/{game_id}/boost-rules")
+async def update_boost_rules(
+    game_id: str,
+    boost_rules: Dict[str, Any],
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Replace a game's relevance boost rules; takes effect on the next query."""
+    try:
+        try:
+            validate_boost_rules(boost_rules)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid boost rules: {str(e)}")
+        
+        result = await db.games.update_one(
+            {"game_id": game_id},
+            {"$set": {"boost_rules": boost_rules, "updated_at": datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=404, detail=f"Game not found: {game_id}")
+        
+        invalidate_game_caches(game_id)
+        boosts = await boost_registry.refresh(db, game_id)
+        
+        return {
+            "success": True,
+            "game_id": game_id,
+            "pattern_count": len(boosts.patterns)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update boost rules: {str(e)}")
+
+@router.get("/games/{game_id}/answers")
+async def list_answers(
+    game_id: str,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """List a game's precomputed template answers (bundled and stored)."""
+    answers = answer_registry.list(game_id)
+    return {
+        "game_id": game_id,
+        "answers": answers,
+        "total": len(answers)
+    }
+
+@router.put("/games/{game_id}/answers/{intent_key}")
+async def put_answer(
+    game_id: str,
+    intent_key: str,
+    answer: Dict[str, Any],
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Create or replace the precomputed answer for an intent key such as 'move:pawn'."""
+    try:
+        intent, _, subject = intent_key.partition(":")
+        try:
+            document = validate_answer(intent, subject, answer)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid answer: {str(e)}")
+        
+        document = {**document, "game_id": game_id, "updated_at": datetime.utcnow()}
+        await db.answers.replace_one(
+            {"game_id": game_id, "intent": document["intent"], "subject": document["subject"]},
+            document,
+            upsert=True
+        )
+        answer_registry.put(game_id, document)
+        
+        return {
+            "success": True,
+            "game_id": game_id,
+            "intent_key": f"{document['intent']}:{document['subject']}"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store answer: {str(e)}")
+
+@router.delete("/games/{game_id}/answers/{intent_key}")
+async def delete_answer(
+    game_id: str,
+    intent_key: str,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Delete a stored answer; a bundled answer with the same key takes its place."""
+    try:
+        intent, _, subject = intent_key.partition(":")
+        result = await db.answers.delete_one({"game_id": game_id, "intent": intent, "subject": subject.lower()})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail=f"No stored answer for {intent_key}")
+        answer_registry.remove(game_id, intent_key.lower())
+        
+        return {
+            "success": True,
+            "game_id": game_id,
+            "intent_key": intent_key
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete answer: {str(e)}")
+
 @router.get("/games/{game_id}/rules")
 async def get_game_rules(
     game_id: str,
@@ -292,8 +486,17 @@ async def update_rule(
         if not update_data:
             raise HTTPException(status_code=400, detail="No valid fields to update")
         
+        existing_rule = await db.content_chunks.find_one({"_id": obj_id})
+        if not existing_rule:
+            raise HTTPException(status_code=404, detail="Rule not found")
+        
+        # Regenerate the prompt-ready rendering so it never goes stale
+        modified_fields = list(update_data.keys())
+        update_data.update(prompt_fields({**existing_rule, **update_data}))
+        
         # Add update timestamp
         update_data["updated_at"] = datetime.utcnow()
+        modified_fields.append("updated_at")
         
         # Update the rule
         result = await db.content_chunks.update_one(
@@ -303,6 +506,8 @@ async def update_rule(
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Rule not found")
+        invalidate_game_caches(existing_rule.get("game_id"))
+        await corpus_changed(db, existing_rule.get("game_id"))
         
         # Get updated rule
         updated_rule = await db.content_chunks.find_one({"_id": obj_id})
@@ -310,7 +515,7 @@ async def update_rule(
         return {
             "success": True,
             "rule_id": rule_id,
-            "modified_fields": list(update_data.keys()),
+            "modified_fields": modified_fields,
             "updated_rule": {
                 "rule_id": str(updated_rule["_id"]),
                 "title": updated_rule.get("title"),
@@ -353,6 +558,8 @@ async def delete_rule(
         
         # Update game rule count
         game_id = rule.get("game_id")
+        invalidate_game_caches(game_id)
+        await corpus_changed(db, game_id)
         if game_id:
             remaining_count = await db.content_chunks.count_documents({"game_id": game_id})
             await db.games.update_one(
@@ -375,6 +582,35 @@ async def delete_rule(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete rule: {str(e)}")
 
+@router.post("/rules/prepare-prompts")
+async def backfill_prompt_renderings(
+    game_id: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Store prompt-ready renderings for rules ingested before they existed (CLI endpoint)."""
+    try:
+        query = {"prompt_text": {"$exists": False}}
+        if game_id:
+            query["game_id"] = game_id
+        
+        updated = 0
+        async for rule in db.content_chunks.find(query, {"title": 1, "content": 1, "category_id": 1}):
+            await db.content_chunks.update_one(
+                {"_id": rule["_id"]},
+                {"$set": prompt_fields(rule)}
+            )
+            updated += 1
+        
+        return {
+            "success": True,
+            "game_id": game_id,
+            "rules_updated": updated
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prompt backfill failed: {str(e)}")
+
 @router.post("/games/{game_id}/validate")
 async def validate_game_integrity(
     game_id: str,
@@ -537,4 +773,98 @@ async def debug_parse_markdown(
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Parse failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Parse failed: {str(e)}")
+
+@router.post("/precompute")
+async def start_precompute(
+    request: Dict[str, Any] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Precompute LLM answers for the most asked questions of some or all games."""
+    try:
+        request = request or {}
+        game_ids = request.get("game_ids")
+        if not game_ids:
+            game_ids = [game["game_id"] for game in await db.games.find({}, {"game_id": 1}).to_list(length=500)]
+        
+        await precompute_service.ensure_indexes(db)
+        job = precompute_service.start_job(
+            db,
+            retrieve_rules,
+            game_ids,
+            top_n=request.get("top_n"),
+            concurrency=request.get("concurrency")
+        )
+        return precompute_service.job_status(job["job_id"])
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start precompute job: {str(e)}")
+
+@router.get("/precompute/{job_id}")
+async def get_precompute_job(
+    job_id: str,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Progress of a precompute job."""
+    job = precompute_service.job_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Precompute job not found: {job_id}")
+    return job
+
+@router.get("/analytics/top-queries")
+async def get_top_queries(
+    game_id: Optional[str] = None,
+    days: float = 7,
+    limit: int = 20,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Most asked questions, counted by normalized text."""
+    try:
+        return {"days": days, "queries": await top_queries(db, game_id, days, limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate queries: {str(e)}")
+
+@router.get("/analytics/zero-result-queries")
+async def get_zero_result_queries(
+    game_id: Optional[str] = None,
+    days: float = 7,
+    limit: int = 20,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Most asked questions that matched no rules."""
+    try:
+        return {"days": days, "queries": await top_queries(db, game_id, days, limit, zero_results=True)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate queries: {str(e)}")
+
+@router.get("/analytics/latency-by-game")
+async def get_latency_by_game(
+    days: float = 7,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Query counts, latency and answer paths (llm, template, precomputed, no_results) per game."""
+    try:
+        return {"days": days, "games": await latency_by_game(db, days), "query_log": query_log.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to aggregate queries: {str(e)}")
+
+@router.get("/profiling/slow-requests")
+async def get_slow_requests(
+    limit: int = 20,
+    route: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Slowest sampled requests with their per-stage breakdown."""
+    return {
+        "requests": slow_requests.slowest(limit=limit, route=route),
+        "sampling": {
+            "sample_rate": slow_requests.sample_rate,
+            "slow_request_ms": slow_requests.slow_seconds * 1000,
+            "buffer_size": slow_requests.profiles.maxlen,
+            "buffered": len(slow_requests.profiles)
+        }
+    }
@@ -1,6 +1,8 @@
 # app/routes/chat.py - Fixed version
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.database import get_database
 from app.models import (
@@ -11,129 +13,91 @@ from app.models import (
     ContentType
 )
 from app.services.ai_chat_service import ai_chat_service
+from app.services.conversation_service import conversation_service
+from app.services.retrieval_cache import retrieval_cache
+from app.services.boost_rules import boost_registry, CompiledBoosts
+from app.services.answer_registry import answer_registry
+from app.services.precompute_service import precompute_service
+from app.services.query_log import query_log
+from app.services.corpus_cache import corpus_cache
+from app.services.search_index import search_indexes, federated_search, highlight, tokenize, SNIPPET_CHARS
+from app.services.typeahead import typeahead_indexes
+from app.services.spelling import spelling_indexes
+from app.services.auth_service import get_conversation_owner, get_optional_user, resolve_conversation_owner
+from app.services.profiling import span
+from app.config import settings
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
 import re
+import time
 import uuid
 from datetime import datetime
+from functools import partial
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-def score_rules_for_query(rules: List, query_text: str) -> List:
-    """Score and rank rules based on relevance to the query."""
+def score_rules_for_query(rules: List, query_text: str, boosts: Optional[CompiledBoosts] = None) -> List:
+    """Score and rank rules based on relevance to the query.
     
-    # Extract key terms from query (ignore common words)
+    Game-specific boosts (entities, keywords, penalty terms) come from the
+    game's boost rules; by default those of the rules' game are used.
+    """
+    return score_rules_for_queries(rules, [query_text], boosts)[0]
+
+def score_rules_for_queries(rules: List, query_texts: List[str], boosts: Optional[CompiledBoosts] = None) -> List[List]:
+    """Rank the rules for several queries in one pass over the rules.
+    
+    Each rule's fields are lower-cased once and scored against every
+    query, so a batch of questions costs one walk of the corpus.
+    """
+    if boosts is None:
+        boosts = boost_registry.get(rules[0].get("game_id") if rules else None)
+    
+    # Extract key terms from each query (ignore common words)
     stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'how', 'what', 'when', 'where', 'why', 'is', 'are', 'can', 'do', 'does'}
-    query_terms = [term.strip('?.,!') for term in query_text.lower().split() if term not in stop_words]
+    queries = []
+    for query_text in query_texts:
+        query_terms = [term.strip('?.,!') for term in query_text.lower().split() if term not in stop_words]
+        queries.append((query_terms, boosts.plan(query_text.lower(), query_terms)))
     
     # Score each rule
-    scored_rules = []
+    scored_rules = [[] for _ in queries]
     for rule in rules:
-        score = 0
         title = rule.get("title", "").lower()
         content = rule.get("content", "").lower()
         category = rule.get("category_id", "").lower()
         
-        # High priority scoring for titles - exact matches get big boost
-        for term in query_terms:
-            if term in title:
-                score += 10  # Title matches are highly relevant
-                if term == title.lower():
-                    score += 20  # Exact title match is extremely relevant
-            
-            # Medium priority for content matches
-            content_matches = content.count(term)
-            score += content_matches * 2
-            
-            # Category relevance
-            if term in category:
-                score += 5
-        
-        # Special chess-specific logic with more precise scoring
-        if "pawn" in query_terms:
-            if "pawn movement" in title.lower() or "pawn movement" in content.lower():
-                score += 25  # Very high priority for pawn movement rules
-            elif "pawn" in title.lower():
-                score += 20  # High priority for pawn-specific titles
-            elif "pawn" in content.lower():
-                score += 15  # Medium priority for pawn mentions
+        for (query_terms, boost_plan), scored in zip(queries, scored_rules):
+            score = 0
             
-            # Penalize rules that mention pawns negatively
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "knight" in query_terms:
-            if "knight movement" in title.lower() or "knight movement" in content.lower():
-                score += 25
-            elif "knight" in title.lower():
-                score += 20
-            elif "knight" in content.lower():
-                score += 15
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "king" in query_terms:
-            if "king movement" in title.lower() or "king movement" in content.lower():
-                score += 25
-            elif "king" in title.lower():
-                score += 20
-            elif "king" in content.lower():
-                score += 15
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "queen" in query_terms:
-            if "queen movement" in title.lower() or "queen movement" in content.lower():
-                score += 25
-            elif "queen" in title.lower():
-                score += 20
-            elif "queen" in content.lower():
-                score += 15
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "bishop" in query_terms:
-            if "bishop movement" in title.lower() or "bishop movement" in content.lower():
-                score += 25
-            elif "bishop" in title.lower():
-                score += 20
-            elif "bishop" in content.lower():
-                score += 15
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "rook" in query_terms:
-            if "rook movement" in title.lower() or "rook movement" in content.lower():
-                score += 25
-            elif "rook" in title.lower():
-                score += 20
-            elif "rook" in content.lower():
-                score += 15
-            if "illegal" in title.lower() or "penalty" in title.lower():
-                score -= 10
-        elif "castle" in query_terms or "castling" in query_terms:
-            if "castle" in title or "castle" in content or "castling" in title or "castling" in content:
-                score += 15
-        elif "checkmate" in query_terms:
-            if "checkmate" in title or "checkmate" in content:
-                score += 15
-        elif "check" in query_terms and "checkmate" not in query_terms:
-            if "check" in title or "check" in content:
-                score += 15
-        elif "move" in query_terms or "movement" in query_terms:
-            if "movement" in category or "move" in title or "move" in content:
-                score += 10
-            # Bonus for combining movement with piece type
-            for piece in ["pawn", "knight", "king", "queen", "bishop", "rook"]:
-                if piece in query_terms and piece in title.lower():
-                    score += 15
+            # High priority scoring for titles - exact matches get big boost
+            for term in query_terms:
+                if term in title:
+                    score += 10  # Title matches are highly relevant
+                    if term == title:
+                        score += 20  # Exact title match is extremely relevant
                 
-        # Penalize very general rules unless specifically asked for
-        if "overview" in title.lower() and "overview" not in query_terms:
-            score -= 5
-        if "setup" in title.lower() and "setup" not in query_terms and "start" not in query_terms:
-            score -= 3
+                # Medium priority for content matches
+                content_matches = content.count(term)
+                score += content_matches * 2
+                
+                # Category relevance
+                if term in category:
+                    score += 5
+            
+            # Game-specific boosts and demotions, one automaton pass per field
+            score += boosts.score(boost_plan, title, content, category)
             
-        scored_rules.append((score, rule))
+            scored.append((score, rule))
     
     # Sort by score (highest first) and return rules only
-    scored_rules.sort(key=lambda x: x[0], reverse=True)
-    return [rule for score, rule in scored_rules if score > 0]
+    ranked = []
+    for scored in scored_rules:
+        scored.sort(key=lambda x: x[0], reverse=True)
+        ranked.append([rule for score, rule in scored if score > 0])
+    return ranked
 
 def create_structured_no_results_response(query: str, game_id: str) -> StructuredChatResponse:
     """Create structured response for no results."""
@@ -156,93 +120,19 @@ def create_structured_no_results_response(query: str, game_id: str) -> Structure
         search_method="enhanced_scoring"
     )
 
-def generate_contextual_summary(query: str, primary_rule: dict, num_rules: int) -> str:
+def generate_contextual_summary(query: str, primary_rule: dict, num_rules: int, answer: Optional[dict] = None) -> str:
     """Generate a direct answer following CLAUDE.md template format."""
-    query_lower = query.lower()
-    
-    # Generate bold direct answers (1-2 sentences max)
-    if "how" in query_lower and ("move" in query_lower or "moves" in query_lower):
-        if "pawn" in query_lower:
-            return "**Pawns move one square forward, or two squares forward on their first move.**"
-        elif "knight" in query_lower:
-            return "**Knights move in an L-shape: two squares in one direction, then one square perpendicular.**"
-        elif "king" in query_lower:
-            return "**The king moves one square in any direction (horizontal, vertical, or diagonal).**"
-        elif "queen" in query_lower:
-            return "**The queen moves any number of squares in any direction—horizontally, vertically, or diagonally.**"
-        elif "bishop" in query_lower:
-            return "**Bishops move diagonally any number of squares.**"
-        elif "rook" in query_lower:
-            return "**Rooks move horizontally or vertically any number of squares.**"
-        else:
-            return "**Each chess piece has unique movement patterns.**"
-    
-    elif "what" in query_lower:
-        if "checkmate" in query_lower:
-            return "**Checkmate occurs when the king is in check and cannot escape capture, ending the game.**"
-        elif "check" in query_lower and "checkmate" not in query_lower:
-            return "**Check is when the king is under attack and must be moved to safety immediately.**"
-        elif "castling" in query_lower or "castle" in query_lower:
-            return "**Castling is a special move that allows the king and rook to move simultaneously for king safety.**"
-        elif "en passant" in query_lower:
-            return "**En passant is a special pawn capture rule for pawns that move two squares forward.**"
-    
-    elif "can" in query_lower:
-        if "pawn" in query_lower:
-            return "**Pawns can move forward, capture diagonally, and promote when reaching the opposite end.**"
-        elif "king" in query_lower and "castle" in query_lower:
-            return "**The king can castle if neither piece has moved and there are no pieces between them.**"
+    # Precomputed bold direct answer (1-2 sentences max)
+    if answer and answer.get("summary"):
+        return answer["summary"]
     
     # Generic fallback with bold formatting
     return f"**Found specific rules about {query.lower().replace('how does', '').replace('what is', '').strip()}.**"
 
-def generate_detailed_explanation(query_lower: str, primary_rule: dict, rules: List) -> str:
+def generate_detailed_explanation(query_lower: str, primary_rule: dict, rules: List, answer: Optional[dict] = None) -> str:
     """Generate detailed explanation with concrete example following CLAUDE.md format."""
-    
-    if "pawn" in query_lower and "move" in query_lower:
-        return """Pawns are unique pieces with special movement rules. They move straight forward one square to an unoccupied square. On a pawn's very first move from its starting position, it has the option to advance two squares forward instead of one, provided both squares are unoccupied. Unlike other pieces, pawns capture differently than they move—they capture diagonally forward one square.
-
-Example: A pawn on e2 can move to e3, or jump to e4 on its first move. If there's an opponent piece on d3 or f3, the pawn can capture it by moving diagonally."""
-    
-    elif "knight" in query_lower and "move" in query_lower:
-        return """The knight has the most distinctive movement pattern in chess. It moves in an "L" shape: exactly two squares in one direction (horizontal or vertical), then exactly one square perpendicular to that direction. Knights are the only pieces that can "jump over" other pieces during their move.
-
-Example: A knight on d4 can move to c2, e2, b3, f3, b5, f5, c6, or e6. Even if there are pieces blocking the path, the knight can still reach its destination squares."""
-    
-    elif "king" in query_lower and "move" in query_lower:
-        return """The king is the most important piece but has limited mobility. It can move exactly one square in any direction: horizontally, vertically, or diagonally. The king can never move into check (a square attacked by an opponent's piece).
-
-Example: A king on e1 can move to d1, d2, e2, f2, or f1, provided these squares are not under attack by enemy pieces."""
-    
-    elif "queen" in query_lower and "move" in query_lower:
-        return """The queen is the most powerful piece, combining the movement abilities of both the rook and bishop. She can move any number of squares horizontally, vertically, or diagonally, but cannot jump over other pieces.
-
-Example: A queen on d4 can move to any square along the d-file, 4th rank, or the diagonals (a1-h8 and g1-a7), as long as the path is clear."""
-    
-    elif "bishop" in query_lower and "move" in query_lower:
-        return """Bishops move exclusively along diagonal lines. Each player starts with two bishops: one on light squares and one on dark squares, and they remain on their respective colored squares throughout the game.
-
-Example: A bishop on c1 can move to b2, a3, d2, e3, f4, g5, or h6, but cannot reach any dark squares."""
-    
-    elif "rook" in query_lower and "move" in query_lower:
-        return """Rooks move in straight lines along ranks (horizontal) and files (vertical). They can move any number of squares in these directions but cannot move diagonally or jump over pieces.
-
-Example: A rook on a1 can move anywhere along the a-file (a2-a8) or the first rank (b1-h1), provided the path is unobstructed."""
-    
-    elif "checkmate" in query_lower:
-        return """Checkmate ends the game immediately. It occurs when the king is in check (under attack) and has no legal moves to escape capture. This includes being unable to move to a safe square, block the attack, or capture the attacking piece.
-
-Example: If a queen on d8 attacks a king on e8, and the king cannot move to f8 (blocked by own pieces) or capture the queen, it's checkmate."""
-    
-    elif "check" in query_lower and "checkmate" not in query_lower:
-        return """When a king is in check, the player must immediately resolve the threat on their next move. There are three ways to get out of check: move the king to a safe square, capture the attacking piece, or block the attack with another piece.
-
-Example: If a rook attacks your king, you can move the king away, capture the rook with another piece, or place a piece between the rook and king."""
-    
-    elif "castling" in query_lower or "castle" in query_lower:
-        return """Castling is a special defensive move involving the king and either rook. The king moves two squares toward the rook, and the rook moves to the square the king crossed. This can only be done if neither piece has moved, there are no pieces between them, and the king is not in check.
-
-Example: In kingside castling, the king moves from e1 to g1, and the rook moves from h1 to f1, all in one turn."""
+    if answer and answer.get("explanation"):
+        return answer["explanation"]
     
     # Generic fallback using actual rule content
     if primary_rule and primary_rule.get("content"):
@@ -255,53 +145,10 @@ Example: In kingside castling, the king moves from e1 to g1, and the rook moves
     
     return f"This rule covers the specific mechanics and applications within {query_lower}."
 
-def generate_related_rules(query_lower: str, related_rules: List) -> str:
+def generate_related_rules(query_lower: str, related_rules: List, answer: Optional[dict] = None) -> str:
     """Generate related rules bullet points following CLAUDE.md format."""
-    
-    if "pawn" in query_lower and "move" in query_lower:
-        return """• **En Passant**: Special pawn capture rule when opponent pawn moves two squares
-• **Pawn Promotion**: Pawns reaching the opposite end transform into any piece
-• **Illegal Moves**: Moving pawns backward or sideways is forbidden"""
-    
-    elif "knight" in query_lower and "move" in query_lower:
-        return """• **Knight Forks**: Knights can attack multiple pieces simultaneously
-• **Knight vs Bishop**: Knights and bishops have roughly equal value in most positions  
-• **Knight Outposts**: Knights are strongest when placed on secure squares in enemy territory"""
-    
-    elif "king" in query_lower and "move" in query_lower:
-        return """• **Castling**: Special king move for safety and rook development
-• **King and Pawn Endings**: Basic endgame technique with king and pawns
-• **Stalemate**: When the king has no legal moves but is not in check"""
-    
-    elif "queen" in query_lower and "move" in query_lower:
-        return """• **Queen Development**: Generally develop minor pieces before the queen
-• **Queen Trades**: Exchanging queens often leads to endgames
-• **Queen vs Multiple Pieces**: Queen can sometimes fight several minor pieces"""
-    
-    elif "bishop" in query_lower and "move" in query_lower:
-        return """• **Bishop Pair**: Having both bishops is usually advantageous
-• **Good vs Bad Bishop**: Bishops blocked by own pawns are considered "bad"
-• **Fianchetto**: Developing bishops on long diagonals from knight squares"""
-    
-    elif "rook" in query_lower and "move" in query_lower:
-        return """• **Castling**: Rooks participate in the special castling move
-• **Rook Endgames**: Most common type of chess endgame
-• **Open Files**: Rooks are most effective on open or semi-open files"""
-    
-    elif "checkmate" in query_lower:
-        return """• **Check**: When the king is under attack but can escape
-• **Stalemate**: King has no legal moves but is not in check (draw)
-• **Basic Checkmate Patterns**: Queen and king vs king, rook and king vs king"""
-    
-    elif "check" in query_lower:
-        return """• **Checkmate**: When check cannot be escaped, ending the game
-• **Discovery Check**: Moving a piece to reveal check from another piece
-• **Double Check**: Rare situation when king is in check from two pieces"""
-    
-    elif "castling" in query_lower:
-        return """• **Kingside Castling**: More common, castling toward the h-file
-• **Queenside Castling**: Less common, castling toward the a-file
-• **Castling Rights**: Permanently lost if king or rook moves"""
+    if answer and answer.get("related"):
+        return '\n'.join(f"• {item}" for item in answer["related"])
     
     # Generate from actual related rules if available
     if related_rules:
@@ -316,7 +163,7 @@ def generate_related_rules(query_lower: str, related_rules: List) -> str:
             bullets.append(f"• **{title}**: {first_sentence}")
         return '\n'.join(bullets)
     
-    return """• **General Rules**: Basic chess principles and guidelines
+    return """• **General Rules**: Basic principles and guidelines
 • **Special Moves**: Advanced techniques and exceptions
 • **Strategy Tips**: Positional and tactical considerations"""
 
@@ -392,14 +239,17 @@ def create_structured_gaming_response(rules: List, query: str, game_id: str) ->
     primary_rule = rules[0]
     query_lower = query.lower()
     
+    # Precomputed answer for the question's intent, if the game has one
+    answer = answer_registry.match(game_id, query)
+    
     # 1. DIRECT ANSWER (Bold, 1-2 sentences)
-    direct_answer = generate_contextual_summary(query, primary_rule, len(rules))
+    direct_answer = generate_contextual_summary(query, primary_rule, len(rules), answer)
     
     # 2. DETAILED EXPLANATION with concrete example
-    detailed_explanation = generate_detailed_explanation(query_lower, primary_rule, rules)
+    detailed_explanation = generate_detailed_explanation(query_lower, primary_rule, rules, answer)
     
     # 3. RELATED RULES (3-5 bullet points)
-    related_rules_content = generate_related_rules(query_lower, rules[1:5] if len(rules) > 1 else [])
+    related_rules_content = generate_related_rules(query_lower, rules[1:5] if len(rules) > 1 else [], answer)
     
     # Create single section with the complete template format
     template_content = f"""{direct_answer}
@@ -444,87 +294,433 @@ def create_structured_gaming_response(rules: List, query: str, game_id: str) ->
         }
     )
 
+def serialize_response(response: BaseModel) -> JSONResponse:
+    """Serialize a response here rather than in FastAPI so it is timed as a stage"""
+    with span("serialization"):
+        return JSONResponse(content=jsonable_encoder(response))
+
 class ChatQuery(BaseModel):
     query: str
     game_system: str
     conversation_id: Optional[str] = None
 
+class BatchQuestion(BaseModel):
+    query: str
+    game_system: str
+    id: Optional[str] = None  # Echoed back so clients can match answers to questions
+
+class BatchQuery(BaseModel):
+    questions: List[BatchQuestion]
+    concurrency: Optional[int] = None
+
+# Words that tie a question to the previous one ("what if it is captured?")
+FOLLOWUP_REFERENCES = {"it", "its", "it's", "that", "this", "they", "them", "their", "those", "these", "he", "she", "his", "her"}
+FOLLOWUP_OPENERS = ("and ", "also ", "but ", "then ", "what about ", "how about ")
+
+def topic_terms(text: str) -> set:
+    """Stemmed words longer than three letters, as the search index sees them"""
+    return {term for term, _, _ in tokenize(text) if len(term) > 3}
+
+def is_followup(cached: dict, query_text: str) -> bool:
+    """Whether a question continues the topic of the conversation's cached candidates.
+
+    It does when it refers back to the previous question, has no topic
+    words of its own, or shares one with the previous question or the
+    title of its top candidate. Anything else is a new topic.
+    """
+    query_lower = query_text.lower()
+    words = {word.strip("?.,!") for word in query_lower.split()}
+    if words & FOLLOWUP_REFERENCES or query_lower.startswith(FOLLOWUP_OPENERS):
+        return True
+    terms = topic_terms(query_lower)
+    if not terms:
+        return True
+    topic = topic_terms(cached["query"]).union(*(topic_terms(rule.get("title", "")) for rule in cached["rules"][:1]))
+    return bool(terms & topic)
+
+async def keyword_candidates(db: AsyncIOMotorDatabase, game_id: str, query_text: str, limit: int) -> List:
+    """Best matches for the query's longer words in the game's in-memory search index"""
+    terms = topic_terms(query_text)
+    if not terms or limit <= 0:
+        return []
+    index = await search_indexes.get(db, game_id)
+    _, hits = index.search(" ".join(sorted(terms)), limit=limit)
+    return [hit["rule"] for hit in hits]
+
+def rerank_followup(cached: dict, fresh_rules: List, query_text: str, boosts: Optional[CompiledBoosts] = None) -> List:
+    """Rank a follow-up within the cached candidates plus freshly retrieved rules.
+
+    Follow-ups often lack the topic ("and when it's captured?"), so when the
+    question alone matches nothing the previous question is added. An empty
+    result means the pool has nothing for it and the caller searches afresh.
+    """
+    seen = set()
+    pool = []
+    for rule in list(cached["rules"]) + list(fresh_rules):
+        key = rule.get("_id") or (rule.get("title"), rule.get("content"))
+        if key not in seen:
+            seen.add(key)
+            pool.append(rule)
+    return (
+        score_rules_for_query(pool, query_text, boosts)
+        or score_rules_for_query(pool, f"{cached['query']} {query_text}", boosts)
+    )
+
+async def lookup_precomputed(db: AsyncIOMotorDatabase, game_id: str, query: str) -> Optional[dict]:
+    """Answer generated ahead of time for this question and the game's current rules"""
+    try:
+        with span("precomputed_lookup"):
+            return await precompute_service.lookup(db, game_id, query)
+    except Exception as e:
+        print(f"Could not look up precomputed answer: {e}")
+        return None
+
+def log_query(chat_query: ChatQuery, game_id: str, user_id: Optional[str], path: str, rules: List, start_time: float):
+    """Queue the query for the query log; never waits on the database"""
+    if settings.query_log_enabled:
+        query_log.record(
+            game_id, chat_query.query, path, rules,
+            latency=time.perf_counter() - start_time,
+            user_id=user_id,
+            conversation_id=chat_query.conversation_id
+        )
+
+async def load_conversation_history(chat_query: ChatQuery, user_id: Optional[str]) -> List[dict]:
+    """Recent turns of the client's conversation, trimmed to the history token budget"""
+    if not chat_query.conversation_id:
+        return []
+    try:
+        with span("conversation_load"):
+            return await conversation_service.get_history(chat_query.conversation_id, user_id)
+    except Exception as e:
+        print(f"Could not load conversation history: {e}")
+        return []
+
+async def record_conversation_turns(chat_query: ChatQuery, user_id: Optional[str], game_id: str, answer: str):
+    """Append the question and its answer to the client's conversation"""
+    if not chat_query.conversation_id:
+        return
+    try:
+        with span("conversation_write"):
+            await conversation_service.append_turns(chat_query.conversation_id, user_id, game_id, [
+                {"role": "user", "content": chat_query.query},
+                {"role": "assistant", "content": answer}
+            ])
+    except Exception as e:
+        print(f"Could not store conversation turns: {e}")
+
+async def answer_precomputed(chat_query: ChatQuery, game_id: str, user_id: Optional[str], precomputed: dict, start_time: float) -> StructuredChatResponse:
+    """Response built from an answer generated ahead of time"""
+    with span("response_build"):
+        structured_response = create_ai_structured_response(
+            {"response": precomputed["response"]}, chat_query.query, game_id, precomputed.get("sources", [])
+        )
+    await record_conversation_turns(chat_query, user_id, game_id, precomputed["response"])
+    log_query(chat_query, game_id, user_id, "precomputed", precomputed.get("sources", []), start_time)
+    return StructuredChatResponse(
+        query=chat_query.query,
+        game_system=game_id,
+        structured_response=structured_response,
+        search_method="precomputed",
+        metadata={
+            "conversation_id": chat_query.conversation_id,
+            "precomputed": {"corpus_version": precomputed.get("corpus_version"), "created_at": precomputed.get("created_at")}
+        }
+    )
+
+async def answer_from_rules(
+    chat_query: ChatQuery,
+    game_id: str,
+    user_id: Optional[str],
+    scored_rules: List,
+    start_time: float,
+    retrieval: str = "full",
+    corrections: Optional[List[dict]] = None
+) -> StructuredChatResponse:
+    """Answer the query from its ranked rules: the LLM when available, else the template"""
+    # Take top 5 most relevant rules for sources and the template answer;
+    # the LLM gets a wider candidate set packed into its token budget
+    rules = scored_rules[:5]
+    context_candidates = scored_rules[:settings.context_candidate_rules]
+
+    if not rules:
+        log_query(chat_query, game_id, user_id, "no_results", [], start_time)
+        return create_structured_no_results_response(chat_query.query, game_id)
+
+    # Try AI-powered response first, fallback to template-based response.
+    # The guarded call enforces the latency budget and skips the LLM
+    # entirely while the circuit breaker is open or the request is over budget.
+    history = await load_conversation_history(chat_query, user_id)
+    metadata = {
+        "conversation_id": chat_query.conversation_id,
+        "history_messages": len(history),
+        "retrieval": retrieval
+    } if chat_query.conversation_id else {}
+    if corrections:
+        metadata["corrections"] = corrections
+    ai_result = {}
+    try:
+        ai_result = await ai_chat_service.generate_rule_response_guarded(
+            query=chat_query.query,
+            game_id=game_id, 
+            rules_context=context_candidates,
+            history=history
+        )
+    
+        if not ai_result.get("error") and ai_result.get("ai_powered"):
+            # Create structured response from AI output
+            with span("response_build"):
+                structured_response = create_ai_structured_response(
+                    ai_result, chat_query.query, game_id, rules
+                )
+            await record_conversation_turns(chat_query, user_id, game_id, ai_result.get("response", ""))
+            log_query(chat_query, game_id, user_id, "llm", rules, start_time)
+        
+            return StructuredChatResponse(
+                query=chat_query.query,
+                game_system=game_id,
+                structured_response=structured_response,
+                search_method="ai_powered_gpt4o_mini",
+                metadata={**metadata, "context": ai_result.get("context", {}), "budget": ai_result.get("budget", {})}
+            )
+        else:
+            # AI failed, use fallback
+            print(f"AI service failed: {ai_result.get('error', 'Unknown error')}, using fallback")
+        
+    except Exception as e:
+        print(f"AI service exception: {e}, using fallback")
+
+    # Fallback to existing template-based response
+    with span("response_build"):
+        structured_response = create_structured_gaming_response(rules, chat_query.query, game_id)
+    await record_conversation_turns(chat_query, user_id, game_id, structured_response.content["summary"]["text"])
+    log_query(chat_query, game_id, user_id, "template", rules, start_time)
+    if ai_result.get("budget"):
+        metadata["budget"] = ai_result["budget"]
+
+    return StructuredChatResponse(
+        query=chat_query.query,
+        game_system=game_id,
+        structured_response=structured_response,
+        search_method="enhanced_scoring_fallback",
+        metadata=metadata
+    )
+
 @router.post("/query")
 async def query_rules(
     chat_query: ChatQuery,
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: Optional[dict] = Depends(get_optional_user)
 ):
     """Query game rules using natural language."""
+    start_time = time.perf_counter()
+    # Only a conversation needs an owner; one-off questions stay cookie-free
+    if chat_query.conversation_id:
+        user_id = resolve_conversation_owner(request, current_user)
+    else:
+        user_id = current_user["username"] if current_user else None
     try:
         query_text = chat_query.query.lower()
         game_id = chat_query.game_system.lower()
         
-        # Get all rules for the game first
-        all_rules = await db.content_chunks.find({
-            "game_id": game_id
-        }).to_list(length=50)
+        cache_key = (user_id, chat_query.conversation_id)
+        cached = retrieval_cache.get(cache_key, game_id) if chat_query.conversation_id else None
+        if cached and not is_followup(cached, query_text):
+            cached = None  # A new topic in the same conversation gets a fresh search
         
-        if not all_rules:
-            return create_structured_no_results_response(chat_query.query, game_id)
+        # Top questions are answered ahead of time; follow-ups need their conversation's context
+        precomputed = None if cached else await lookup_precomputed(db, game_id, chat_query.query)
+        if precomputed:
+            return serialize_response(await answer_precomputed(chat_query, game_id, user_id, precomputed, start_time))
         
-        # Improved search with relevance scoring
-        scored_rules = score_rules_for_query(all_rules, query_text)
+        try:
+            boosts = await boost_registry.refresh(db, game_id)
+        except Exception as e:
+            print(f"Could not refresh boost rules for {game_id}: {e}")
+            boosts = boost_registry.get(game_id)
         
-        # Take top 5 most relevant rules
-        rules = scored_rules[:5]
+        # Misspelled game terms ("vagabnd") match nothing; retrieve with the corrected words
+        corrections = []
+        try:
+            query_text, corrections = await spelling_indexes.correct(db, game_id, query_text)
+        except Exception as e:
+            print(f"Could not correct spelling for {game_id}: {e}")
         
-        if not rules:
-            return create_structured_no_results_response(chat_query.query, game_id)
+        if cached:
+            # Follow-up: re-rank the conversation's candidates plus a small fresh retrieval
+            with span("scoring"):
+                fresh_rules = await keyword_candidates(db, game_id, query_text, settings.followup_fresh_rules)
+                scored_rules = rerank_followup(cached, fresh_rules, query_text, boosts)
+            if not scored_rules:
+                cached = None  # Nothing in the pool fits the follow-up; search the whole game
+        if not cached:
+            # Get all rules for the game first; served from memory once the game is warm
+            all_rules = await corpus_cache.get_rules(db, game_id, limit=settings.corpus_cache_max_rules)
+            
+            if not all_rules:
+                log_query(chat_query, game_id, user_id, "no_results", [], start_time)
+                return serialize_response(create_structured_no_results_response(chat_query.query, game_id))
+            
+            # Improved search with relevance scoring
+            with span("scoring"):
+                scored_rules = score_rules_for_query(all_rules, query_text, boosts)
         
-        # Try AI-powered response first, fallback to template-based response
+        if chat_query.conversation_id and scored_rules:
+            retrieval_cache.put(cache_key, game_id, query_text, scored_rules[:settings.retrieval_cache_candidates])
+        
+        return serialize_response(await answer_from_rules(
+            chat_query, game_id, user_id, scored_rules, start_time,
+            retrieval="followup_cache" if cached else "full", corrections=corrections
+        ))
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+
+async def prepare_batch(db: AsyncIOMotorDatabase, questions: List[BatchQuestion], user_id: Optional[str], start_time: float) -> List:
+    """One answer coroutine factory per question, with retrieval already done.
+    
+    Questions are grouped by game so each corpus is loaded, and its boosts
+    refreshed, once; all of a game's questions are then ranked in a single
+    pass over its rules. Precomputed answers skip retrieval entirely.
+    """
+    jobs = [None] * len(questions)
+    by_game = {}
+    for index, question in enumerate(questions):
+        by_game.setdefault(question.game_system.lower(), []).append(index)
+    
+    for game_id, indexes in by_game.items():
+        all_rules = await corpus_cache.get_rules(db, game_id, limit=settings.corpus_cache_max_rules)
         try:
-            ai_result = await ai_chat_service.generate_rule_response(
-                query=chat_query.query,
-                game_id=game_id, 
-                rules_context=rules
-            )
-            
-            if not ai_result.get("error") and ai_result.get("ai_powered"):
-                # Create structured response from AI output
-                structured_response = create_ai_structured_response(
-                    ai_result, chat_query.query, game_id, rules
-                )
-                
-                return StructuredChatResponse(
-                    query=chat_query.query,
-                    game_system=game_id,
-                    structured_response=structured_response,
-                    search_method="ai_powered_gpt4o_mini"
-                )
-            else:
-                # AI failed, use fallback
-                print(f"AI service failed: {ai_result.get('error', 'Unknown error')}, using fallback")
-                
+            boosts = await boost_registry.refresh(db, game_id)
         except Exception as e:
-            print(f"AI service exception: {e}, using fallback")
+            print(f"Could not refresh boost rules for {game_id}: {e}")
+            boosts = boost_registry.get(game_id)
         
-        # Fallback to existing template-based response
-        structured_response = create_structured_gaming_response(rules, chat_query.query, game_id)
+        pending = []
+        for index in indexes:
+            chat_query = ChatQuery(query=questions[index].query, game_system=game_id)
+            precomputed = await lookup_precomputed(db, game_id, chat_query.query)
+            if precomputed:
+                jobs[index] = (False, partial(answer_precomputed, chat_query, game_id, user_id, precomputed, start_time))
+                continue
+            query_text, corrections = chat_query.query.lower(), []
+            try:
+                query_text, corrections = await spelling_indexes.correct(db, game_id, query_text)
+            except Exception as e:
+                print(f"Could not correct spelling for {game_id}: {e}")
+            pending.append((index, chat_query, query_text, corrections))
         
-        return StructuredChatResponse(
-            query=chat_query.query,
-            game_system=game_id,
-            structured_response=structured_response,
-            search_method="enhanced_scoring_fallback"
-        )
+        if not pending:
+            continue
+        with span("scoring"):
+            rankings = score_rules_for_queries(all_rules, [text for _, _, text, _ in pending], boosts) if all_rules else [[] for _ in pending]
+        for (index, chat_query, _, corrections), scored_rules in zip(pending, rankings):
+            jobs[index] = (True, partial(answer_from_rules, chat_query, game_id, user_id, scored_rules, start_time, corrections=corrections))
+    return jobs
+
+@router.post("/batch")
+async def batch_query_rules(
+    batch: BatchQuery,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: Optional[dict] = Depends(get_optional_user)
+):
+    """Answer many questions in one request, streamed back as NDJSON.
+    
+    Retrieval for the whole batch happens up front; answers are generated
+    with at most `concurrency` LLM calls in flight and each is written as
+    a line as soon as it is ready, so lines arrive in completion order and
+    carry the question's `index` and `id`. A last line summarises the batch.
+    """
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="Batch contains no questions")
+    if len(batch.questions) > settings.batch_max_questions:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {settings.batch_max_questions} questions")
+    
+    start_time = time.perf_counter()
+    user_id = current_user["username"] if current_user else None  # Batch questions carry no conversation
+    concurrency = max(1, min(batch.concurrency or settings.batch_llm_concurrency, settings.batch_llm_concurrency))
+    try:
+        jobs = await prepare_batch(db, batch.questions, user_id, start_time)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch query failed: {str(e)}")
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def answer(index: int) -> dict:
+        needs_llm, make_answer = jobs[index]
+        line = {"index": index, "id": batch.questions[index].id}
+        try:
+            if needs_llm:
+                async with semaphore:
+                    response = await make_answer()
+            else:
+                response = await make_answer()
+            line.update(jsonable_encoder(response))
+        except Exception as e:
+            print(f"Batch question {index} failed: {e}")
+            line["error"] = str(e)
+        return line
+    
+    async def stream():
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(jobs))]
+        errors = 0
+        try:
+            for next_line in asyncio.as_completed(tasks):
+                line = await next_line
+                errors += "error" in line
+                yield json.dumps(line) + "\n"
+            yield json.dumps({
+                "done": True,
+                "count": len(jobs),
+                "errors": errors,
+                "duration_ms": round((time.perf_counter() - start_time) * 1000, 1)
+            }) + "\n"
+        finally:
+            # The client went away mid-stream; stop spending LLM calls on it
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/conversations/{conversation_id}/turns")
+async def get_conversation_turns(
+    conversation_id: str,
+    before: Optional[int] = Query(None, ge=1, description="Return turns older than this sequence number"),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_conversation_owner)
+):
+    """Page through a conversation, newest turns first (keyset pagination on seq)"""
+    try:
+        conversation = await conversation_service.get_conversation(conversation_id, user_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail=f"Conversation '{conversation_id}' not found")
         
+        turns, next_before = await conversation_service.get_turns_page(conversation_id, user_id, before=before, limit=limit)
+        return {
+            "conversation_id": conversation_id,
+            "game_id": conversation.get("game_id"),
+            "turn_count": conversation.get("turn_count", 0),
+            "turns": turns,
+            "next_before": next_before
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load conversation: {str(e)}")
 
 @router.get("/ai-usage")
-async def get_ai_usage():
+async def get_ai_usage(db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get AI usage statistics for monitoring"""
     try:
         usage_summary = ai_chat_service.get_usage_summary()
+        resilience = ai_chat_service.get_resilience_summary()
         return {
             "ai_service": "openai_gpt4o_mini",
             "usage": usage_summary,
-            "status": "active"
+            "fleet_usage": await ai_chat_service.usage.fleet_summary(db),
+            "resilience": resilience,
+            "status": "degraded" if resilience["circuit_breaker"]["state"] != "closed" else "active"
         }
     except Exception as e:
         return {
@@ -546,42 +742,107 @@ async def test_ai_connection():
             "error_type": type(e).__name__
         }
 
+def format_search_hit(hit: dict) -> dict:
+    rule = hit["rule"]
+    return {
+        "title": rule["title"],
+        "content_preview": rule.get("preview") or rule["content"][:150] + ("..." if len(rule["content"]) > 150 else ""),
+        "category": rule.get("category_id", "general"),
+        "score": hit["score"],
+        "title_highlight": highlight(rule["title"], hit["matches"].get("title", [])),
+        "highlight": highlight(rule["content"], hit["matches"].get("content", []), max_chars=SNIPPET_CHARS)
+    }
+
+@router.get("/search")
+async def search_all_games(
+    q: str = Query(..., description='Search query: words, "quoted phrases" and prefix* terms'),
+    limit: int = Query(10, ge=1, le=50),
+    games: Optional[str] = Query(None, description="Comma-separated game ids, e.g. a user's library"),
+    complexity: Optional[str] = Query(None),
+    tags: Optional[List[str]] = Query(None, description="Games with any of these ai_tags"),
+    players: Optional[int] = Query(None, ge=1, description="Games playable with this many players"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Keyword search across games, merged into one relevance-ranked list."""
+    try:
+        game_filter = {}
+        if games:
+            game_filter["game_id"] = {"$in": [g.strip().lower() for g in games.split(",") if g.strip()]}
+        if complexity:
+            game_filter["complexity"] = complexity.lower()
+        if tags:
+            game_filter["ai_tags"] = {"$in": tags}
+        if players:
+            game_filter["min_players"] = {"$lte": players}
+            game_filter["max_players"] = {"$gte": players}
+        
+        with span("mongo_read"):
+            matching_games = await db.games.find(
+                game_filter, {"game_id": 1, "name": 1}
+            ).to_list(length=settings.federated_search_max_games)
+        names = {game["game_id"]: game.get("name", game["game_id"]) for game in matching_games}
+        
+        with span("keyword_search"):
+            merged = await federated_search(
+                db, list(names), q, limit=limit, timeout=settings.federated_search_timeout_seconds
+            )
+        
+        return {
+            "query": q,
+            "games_searched": len(names),
+            "results": [
+                {"game_id": hit["game_id"], "game_name": names[hit["game_id"]], **format_search_hit(hit)}
+                for hit in merged["hits"]
+            ],
+            "total_found": merged["total_found"],
+            "per_game": merged["per_game"],
+            "failed_games": merged["failed"]
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
 @router.get("/search/{game_id}")
 async def keyword_search(
     game_id: str,
-    q: str = Query(..., description="Search query"),
+    q: str = Query(..., description='Search query: words, "quoted phrases" and prefix* terms'),
+    limit: int = Query(10, ge=1, le=50),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Simple keyword search for rules."""
+    """Keyword search for rules, ranked by relevance with matches highlighted."""
     try:
-        # Create search pattern
-        search_pattern = re.escape(q.lower())
+        index = await search_indexes.get(db, game_id)
+        with span("keyword_search"):
+            total_found, hits = index.search(q, limit=limit)
         
-        # Search for rules
-        rules = await db.content_chunks.find({
+        return {
             "game_id": game_id,
-            "$or": [
-                {"title": {"$regex": search_pattern, "$options": "i"}},
-                {"content": {"$regex": search_pattern, "$options": "i"}}
-            ]
-        }).limit(10).to_list(length=10)
+            "query": q,
+            "results": [format_search_hit(hit) for hit in hits],
+            "total_found": total_found
+        }
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@router.get("/suggest/{game_id}")
+async def suggest(
+    game_id: str,
+    q: str = Query(..., min_length=1, description="Text typed so far"),
+    limit: int = Query(8, ge=1, le=20),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Autocomplete the end of a question with rule titles, headings and key terms."""
+    try:
+        index = await typeahead_indexes.get(db, game_id)
         return {
             "game_id": game_id,
             "query": q,
-            "results": [
-                {
-                    "title": rule["title"],
-                    "content_preview": rule["content"][:150] + ("..." if len(rule["content"]) > 150 else ""),
-                    "category": rule.get("category_id", "general")
-                }
-                for rule in rules
-            ],
-            "total_found": len(rules)
+            "suggestions": index.complete(q, limit=limit)
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Suggest failed: {str(e)}")
 
 @router.get("/games/{game_id}/rules")
 async def get_all_game_rules(
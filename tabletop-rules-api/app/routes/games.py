@@ -3,10 +3,17 @@
 from fastapi import APIRouter, Depends, HTTPException
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.database import get_database
+from app.config import settings
+from app.services.corpus_cache import corpus_cache, warm_game
+from app.services.precompute_service import precompute_service
+from collections import deque
 from typing import List, Optional
+import time
 
 router = APIRouter(prefix="/api/games", tags=["games"])
 
+_cold_prepares = deque()  # Monotonic times of recent cold game preparations in this worker
+
 @router.get("/")
 async def list_games(db: AsyncIOMotorDatabase = Depends(get_database)):
     """List all available games."""
@@ -98,4 +105,35 @@ async def get_game_stats(
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch game stats: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to fetch game stats: {str(e)}")
+
+@router.post("/{game_id}/prepare")
+async def prepare_game(
+    game_id: str,
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Warm a game's rules and precomputed answers; clients call this when a game is selected.
+    
+    Games that are already warm return at once. Loading cold games is
+    limited per worker, since anyone can call this and each load reads
+    the game's rules and builds its indexes.
+    """
+    try:
+        game = await db.games.find_one({"game_id": game_id}, {"game_id": 1})
+        if not game:
+            raise HTTPException(status_code=404, detail="Game not found")
+        
+        if not (corpus_cache.is_warm(game_id) and precompute_service.is_warm(game_id)):
+            now = time.monotonic()
+            while _cold_prepares and now - _cold_prepares[0] > 60:
+                _cold_prepares.popleft()
+            if len(_cold_prepares) >= settings.prepare_max_cold_per_minute:
+                raise HTTPException(status_code=429, detail="Too many games being prepared; try again shortly")
+            _cold_prepares.append(now)
+        
+        return await warm_game(db, game_id)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to prepare game: {str(e)}")
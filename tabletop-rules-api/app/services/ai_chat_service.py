@@ -1,15 +1,47 @@
 # app/services/ai_chat_service.py - GPT-4o-mini Integration for Rule Responses
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from collections import deque
+import asyncio
 import json
 import time
 from datetime import datetime
-from openai import AsyncOpenAI
 from app.config import settings
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.context_packer import context_packer
+from app.services.metrics import metrics
+from app.services.profiling import span
+from app.services.usage_tracker import UsageTracker
+from app.services.tokenizer import count_tokens
+
+AsyncOpenAI = None  # openai takes ~0.5s to import, so it is loaded with the first client
 
 class AIChatService:
     def __init__(self):
         self.client = None
-        self.usage_log = []
+        self.usage = UsageTracker(recent_size=100)
+        self.breaker = CircuitBreaker(
+            "openai_chat",
+            window_size=settings.breaker_window_size,
+            min_requests=settings.breaker_min_requests,
+            error_rate_threshold=settings.breaker_error_rate_threshold,
+            slow_call_rate_threshold=settings.breaker_slow_call_rate_threshold,
+            slow_call_seconds=settings.breaker_slow_call_seconds,
+            open_seconds=settings.breaker_open_seconds
+        )
+        self.latency_samples = deque(maxlen=200)  # Successful LLM call durations
+        self.guard_stats = {"timeouts": 0, "hedges_launched": 0, "hedge_wins": 0}
+        self.context_token_budget = settings.context_token_budget
+        self.context_savings = {"requests": 0, "tokens_saved": 0}
+        self.max_prompt_tokens = settings.llm_max_prompt_tokens
+        self.max_output_tokens = settings.llm_max_output_tokens
+        self.min_output_tokens = settings.llm_min_output_tokens
+        self.max_cost_per_request = settings.llm_max_cost_per_request
+        self.target_latency_seconds = settings.llm_target_latency_seconds
+        self.latency_probe_seconds = settings.llm_latency_probe_seconds
+        self.call_overhead_seconds = None  # Moving average of time to first token (queueing and prompt processing)
+        self.seconds_per_output_token = None  # Moving average of generation time per completion token after the first
+        self.latency_measured_at = None  # Monotonic time of the last latency sample or probe
+        self.budget_stats = {"context_shrunk": 0, "max_tokens_reduced": 0, "template_fallbacks": 0, "latency_probes": 0}
     
     def _ensure_client(self):
         """Initialize OpenAI client with proper error handling"""
@@ -17,23 +49,39 @@ class AIChatService:
             if not settings.openai_api_key or settings.openai_api_key == "your-openai-api-key-here":
                 raise ValueError("OpenAI API key not configured. Set OPENAI_API_KEY environment variable.")
             
-            self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+            global AsyncOpenAI
+            if AsyncOpenAI is None:
+                from openai import AsyncOpenAI
+            
+            client_kwargs = {"api_key": settings.openai_api_key}
+            if settings.openai_base_url:
+                client_kwargs["base_url"] = settings.openai_base_url
+            
+            self.client = AsyncOpenAI(**client_kwargs)
+    
+    @property
+    def usage_log(self) -> List[Dict[str, Any]]:
+        """Most recent usage entries (oldest first)"""
+        return list(self.usage.recent)
+    
+    @usage_log.setter
+    def usage_log(self, entries: List[Dict[str, Any]]):
+        self.usage.reset(entries)
     
-    def _log_usage(self, model: str, input_tokens: int, output_tokens: int, cost_estimate: float):
+    def _log_usage(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost_estimate: float,
+        game_id: Optional[str] = None,
+        latency: Optional[float] = None
+    ):
         """Log API usage for cost monitoring"""
-        usage_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "model": model,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "total_tokens": input_tokens + output_tokens,
-            "estimated_cost": cost_estimate
-        }
-        self.usage_log.append(usage_entry)
-        
-        # Keep only last 100 entries to prevent memory issues
-        if len(self.usage_log) > 100:
-            self.usage_log = self.usage_log[-100:]
+        # Counters and the ring buffer are O(1); rollups are flushed to Mongo in the background
+        self.usage.record(model, input_tokens, output_tokens, cost_estimate, game_id=game_id, latency=latency)
+        metrics.inc("llm_tokens_total", input_tokens, model=model, direction="input")
+        metrics.inc("llm_tokens_total", output_tokens, model=model, direction="output")
     
     def _calculate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost based on GPT-4o-mini pricing"""
@@ -44,28 +92,31 @@ class AIChatService:
             return input_cost + output_cost
         return 0.0
     
+    def _build_rules_context(
+        self,
+        rules: List[Dict[str, Any]],
+        query: str,
+        game_id: str,
+        budget_tokens: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Pack rules into the prompt-token budget; returns (context, packing stats)"""
+        if not rules:
+            return f"No specific rules found in the {game_id} rulebook for this query.", {}
+
+        with span("context_build"):
+            budget = budget_tokens if budget_tokens is not None else self.context_token_budget
+            packed, stats = context_packer.pack(rules, budget)
+
+            context_parts = [f"Game: {game_id.title()}", f"User Query: {query}", "", "Relevant Rules:"]
+
+            for i, rule in enumerate(packed, 1):
+                context_parts.append(f"{i}. {rule['prompt_text']}\n")
+
+            return "\n".join(context_parts), stats
+
     def _format_rules_context(self, rules: List[Dict[str, Any]], query: str, game_id: str) -> str:
         """Format rules as context for AI consumption"""
-        if not rules:
-            return f"No specific rules found in the {game_id} rulebook for this query."
-        
-        context_parts = [f"Game: {game_id.title()}", f"User Query: {query}", "", "Relevant Rules:"]
-        
-        for i, rule in enumerate(rules[:5], 1):  # Limit to top 5 rules
-            title = rule.get("title", f"Rule {i}")
-            content = rule.get("content", "")
-            category = rule.get("category_id", "general")
-            
-            # Clean and truncate content to prevent token bloat
-            clean_content = content.replace('\n\n', ' ').strip()
-            if len(clean_content) > 500:
-                clean_content = clean_content[:500] + "..."
-            
-            context_parts.append(f"{i}. **{title}** (Category: {category})")
-            context_parts.append(f"   {clean_content}")
-            context_parts.append("")
-        
-        return "\n".join(context_parts)
+        return self._build_rules_context(rules, query, game_id)[0]
     
     def _create_system_prompt(self, game_id: str) -> str:
         """Create game-specific system prompt"""
@@ -93,48 +144,174 @@ Example format:
 • **Rule Name**: Brief description
 • **Rule Name**: Brief description"""
     
+    def _build_messages(
+        self,
+        formatted_context: str,
+        query: str,
+        game_id: str,
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": self._create_system_prompt(game_id)},
+            *(history or []),
+            {"role": "user", "content": f"Context:\n{formatted_context}\n\nQuestion: {query}"}
+        ]
+    
+    def _count_prompt_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Prompt tokens as the API will bill them (content plus per-message framing)"""
+        return sum(count_tokens(m["content"]) + 4 for m in messages) + 3
+    
+    def _plan_output_budget(self, model: str, prompt_tokens: int) -> Dict[str, Any]:
+        """Largest max_tokens that fits the cost and latency budgets for this prompt"""
+        max_tokens = self.max_output_tokens
+        limited_by = []
+        
+        if self.max_cost_per_request:
+            cost_per_output_token = self._calculate_cost(model, 0, 1_000_000) / 1_000_000
+            remaining = self.max_cost_per_request - self._calculate_cost(model, prompt_tokens, 0)
+            if cost_per_output_token > 0:
+                affordable = int(remaining / cost_per_output_token)
+                if affordable < max_tokens:
+                    max_tokens = affordable
+                    limited_by.append("cost")
+        
+        if self.target_latency_seconds and self.seconds_per_output_token:
+            generation_seconds = self.target_latency_seconds - (self.call_overhead_seconds or 0.0)
+            within_latency = max(0, int(generation_seconds / self.seconds_per_output_token))
+            if within_latency < self.min_output_tokens and self._latency_probe_due():
+                # Without a call the estimate never changes, so let one through at the minimum size
+                within_latency = self.min_output_tokens
+                self.latency_measured_at = time.monotonic()
+                self.budget_stats["latency_probes"] += 1
+                limited_by.append("latency_probe")
+            if within_latency < max_tokens:
+                max_tokens = within_latency
+                limited_by.append("latency")
+        
+        return {
+            "max_tokens": max(0, max_tokens),
+            "limited_by": limited_by,
+            "estimated_max_cost": round(self._calculate_cost(model, prompt_tokens, max(0, max_tokens)), 6)
+        }
+    
+    def _latency_probe_due(self) -> bool:
+        """Whether the latency estimate is old enough that a call should be sent to re-measure it"""
+        return self.latency_measured_at is None or time.monotonic() - self.latency_measured_at >= self.latency_probe_seconds
+    
+    def _record_latency(self, first_token_seconds: float, generation_seconds: float, output_tokens: int):
+        """Update the per-call overhead and per-token estimates from one streamed call"""
+        previous = self.call_overhead_seconds
+        self.call_overhead_seconds = first_token_seconds if previous is None else 0.8 * previous + 0.2 * first_token_seconds
+        if output_tokens > 1 and generation_seconds > 0:
+            per_token = generation_seconds / (output_tokens - 1)
+            previous = self.seconds_per_output_token
+            self.seconds_per_output_token = per_token if previous is None else 0.8 * previous + 0.2 * per_token
+        self.latency_measured_at = time.monotonic()
+    
+    def _prepare_request(
+        self,
+        query: str,
+        game_id: str,
+        rules_context: List[Dict[str, Any]],
+        model: str = "gpt-4o-mini",
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any], Dict[str, Any]]:
+        """Build the prompt and fit it to the token, cost and latency budgets.
+
+        Counts the prompt locally before sending. An oversized prompt gets a
+        smaller context budget; max_tokens is lowered to stay within the cost
+        and latency targets. The returned budget's decision is "template"
+        when no useful answer fits, so the caller can skip the LLM.
+        """
+        formatted_context, context_stats = self._build_rules_context(rules_context, query, game_id)
+        messages = self._build_messages(formatted_context, query, game_id, history)
+        prompt_tokens = self._count_prompt_tokens(messages)
+        budget = {"prompt_tokens": prompt_tokens, "max_prompt_tokens": self.max_prompt_tokens, "context_shrunk": False}
+        
+        overshoot = prompt_tokens - self.max_prompt_tokens
+        if overshoot > 0 and context_stats:
+            context_budget = context_stats["packed_tokens"] - overshoot
+            if context_budget > 0:
+                formatted_context, context_stats = self._build_rules_context(rules_context, query, game_id, budget_tokens=context_budget)
+                messages = self._build_messages(formatted_context, query, game_id, history)
+                prompt_tokens = self._count_prompt_tokens(messages)
+                budget.update(prompt_tokens=prompt_tokens, context_shrunk=True)
+                self.budget_stats["context_shrunk"] += 1
+        
+        budget.update(self._plan_output_budget(model, prompt_tokens))
+        if prompt_tokens > self.max_prompt_tokens or budget["max_tokens"] < self.min_output_tokens:
+            budget["decision"] = "template"
+            self.budget_stats["template_fallbacks"] += 1
+        else:
+            budget["decision"] = "llm"
+            if budget["limited_by"]:
+                self.budget_stats["max_tokens_reduced"] += 1
+        return messages, context_stats, budget
+    
     async def generate_rule_response(
         self, 
         query: str, 
         game_id: str, 
-        rules_context: List[Dict[str, Any]]
+        rules_context: List[Dict[str, Any]],
+        history: Optional[List[Dict[str, str]]] = None
     ) -> Dict[str, Any]:
         """Generate AI-powered rule response using GPT-4o-mini"""
         
         try:
             self._ensure_client()
             
-            # Format context for AI
-            formatted_context = self._format_rules_context(rules_context, query, game_id)
-            system_prompt = self._create_system_prompt(game_id)
+            # Build the prompt and fit it to the budgets before anything is sent
+            messages, context_stats, budget = self._prepare_request(query, game_id, rules_context, history=history)
+            if context_stats:
+                self.context_savings["requests"] += 1
+                self.context_savings["tokens_saved"] += context_stats["tokens_saved"]
+            if budget["decision"] == "template":
+                return {
+                    "error": f"Request does not fit the LLM budget ({budget['prompt_tokens']} prompt tokens, max_tokens {budget['max_tokens']})",
+                    "ai_powered": False,
+                    "fallback_required": True,
+                    "error_type": "BudgetExceeded",
+                    "budget": budget
+                }
             
-            # Create messages
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Context:\n{formatted_context}\n\nQuestion: {query}"}
-            ]
-            
-            # Make API call to GPT-4o-mini
+            # Make API call to GPT-4o-mini, streamed so time to first token and generation time are measured apart
             start_time = time.time()
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                max_tokens=800,  # Limit response length for cost control
-                temperature=0.1,  # Low temperature for consistent rule explanations
-                top_p=0.9
-            )
+            first_token_time = None
+            parts = []
+            usage = None
+            with span("llm_call"), metrics.track_in_flight("llm_requests_in_flight", model="gpt-4o-mini"):
+                stream = await self.client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=budget["max_tokens"],  # Limit response length for cost and latency control
+                    temperature=0.1,  # Low temperature for consistent rule explanations
+                    top_p=0.9,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token_time is None:
+                            first_token_time = time.time()
+                        parts.append(chunk.choices[0].delta.content)
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
             
             # Extract response data
-            ai_response = response.choices[0].message.content
-            usage = response.usage
-            response_time = time.time() - start_time
+            if not parts:
+                raise ValueError("Model returned an empty response")
+            ai_response = "".join(parts)
+            end_time = time.time()
+            response_time = end_time - start_time
             
             # Calculate and log costs
             input_tokens = usage.prompt_tokens if usage else 0
             output_tokens = usage.completion_tokens if usage else 0
             cost_estimate = self._calculate_cost("gpt-4o-mini", input_tokens, output_tokens)
             
-            self._log_usage("gpt-4o-mini", input_tokens, output_tokens, cost_estimate)
+            self._log_usage("gpt-4o-mini", input_tokens, output_tokens, cost_estimate, game_id=game_id, latency=response_time)
+            if isinstance(output_tokens, int) and output_tokens > 0:
+                self._record_latency(first_token_time - start_time, end_time - first_token_time, output_tokens)
             
             return {
                 "response": ai_response,
@@ -147,7 +324,9 @@ Example format:
                     "total_tokens": input_tokens + output_tokens,
                     "estimated_cost": cost_estimate
                 },
-                "rules_used": len(rules_context),
+                "rules_used": context_stats.get("chunks_packed", 0),
+                "context": context_stats,
+                "budget": budget,
                 "confidence": "high" if rules_context else "low"
             }
             
@@ -160,6 +339,139 @@ Example format:
                 "error_type": type(e).__name__
             }
     
+    def _latency_percentile(self, percentile: float) -> Optional[float]:
+        """Percentile of recent successful LLM call durations"""
+        if not self.latency_samples:
+            return None
+        ordered = sorted(self.latency_samples)
+        index = min(len(ordered) - 1, int(percentile * len(ordered)))
+        return ordered[index]
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Delay before launching a hedged request, or None if hedging is off"""
+        if not settings.llm_hedge_enabled or len(self.latency_samples) < settings.llm_hedge_min_samples:
+            return None
+        return self._latency_percentile(settings.llm_hedge_percentile)
+
+    async def generate_rule_response_guarded(
+        self,
+        query: str,
+        game_id: str,
+        rules_context: List[Dict[str, Any]],
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """generate_rule_response under the latency budget, hedging and circuit breaker.
+
+        Returns the same shape as generate_rule_response. When the breaker is
+        open the LLM is not called at all, so the caller can serve its
+        template fallback immediately.
+        """
+        if not self.breaker.allow_request():
+            return {
+                "error": f"Circuit breaker open ({self.breaker.last_trip_reason})",
+                "ai_powered": False,
+                "fallback_required": True,
+                "error_type": "CircuitOpen"
+            }
+
+        start_time = time.monotonic()
+        try:
+            result = await self._call_with_deadline(query, game_id, rules_context, history)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()  # The caller went away; no verdict on the provider
+            raise
+        elapsed = time.monotonic() - start_time
+
+        if result.get("ai_powered") and not result.get("error"):
+            self.breaker.record_success(elapsed)
+            self.latency_samples.append(elapsed)
+        elif result.get("error_type") == "BudgetExceeded":
+            self.breaker.release_probe()  # Skipped on purpose, says nothing about the provider's health
+        else:
+            self.breaker.record_failure(elapsed)
+
+        return result
+
+    async def _call_with_deadline(
+        self,
+        query: str,
+        game_id: str,
+        rules_context: List[Dict[str, Any]],
+        history: Optional[List[Dict[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """Run the LLM call with a hard deadline, hedging once it outlives the recent p95"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.llm_timeout_seconds
+        hedge_delay = self._hedge_delay()
+        hedges_left = settings.llm_max_hedged_requests if hedge_delay is not None else 0
+
+        def launch():
+            return asyncio.create_task(self.generate_rule_response(query, game_id, rules_context, history=history))
+
+        first_attempt = launch()
+        pending = {first_attempt}
+        next_hedge_at = loop.time() + hedge_delay if hedges_left else None
+        last_result = None
+
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    break
+
+                wait_until = deadline if next_hedge_at is None else min(deadline, next_hedge_at)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    last_result = task.result()
+                    if last_result.get("ai_powered") and not last_result.get("error"):
+                        if task is not first_attempt:
+                            self.guard_stats["hedge_wins"] += 1
+                        return last_result
+
+                if next_hedge_at is not None and loop.time() >= next_hedge_at and pending:
+                    pending.add(launch())
+                    self.guard_stats["hedges_launched"] += 1
+                    hedges_left -= 1
+                    next_hedge_at = loop.time() + hedge_delay if hedges_left else None
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if pending or last_result is None:
+            self.guard_stats["timeouts"] += 1
+            return {
+                "error": f"LLM call exceeded {settings.llm_timeout_seconds}s latency budget",
+                "ai_powered": False,
+                "fallback_required": True,
+                "error_type": "TimeoutError"
+            }
+
+        return last_result
+
+    def get_resilience_summary(self) -> Dict[str, Any]:
+        """Get latency budget, hedging and breaker statistics for monitoring"""
+        p95 = self._latency_percentile(0.95)
+        return {
+            "circuit_breaker": self.breaker.get_status(),
+            "timeout_seconds": settings.llm_timeout_seconds,
+            "hedging_enabled": settings.llm_hedge_enabled,
+            "current_hedge_delay": self._hedge_delay(),
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "budget": {
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "max_output_tokens": self.max_output_tokens,
+                "max_cost_per_request": self.max_cost_per_request,
+                "target_latency_seconds": self.target_latency_seconds,
+                "call_overhead_seconds": round(self.call_overhead_seconds, 3) if self.call_overhead_seconds is not None else None,
+                "seconds_per_output_token": round(self.seconds_per_output_token, 5) if self.seconds_per_output_token else None,
+                **self.budget_stats
+            },
+            **self.guard_stats
+        }
+
     async def test_connection(self) -> Dict[str, Any]:
         """Test OpenAI connection with minimal cost"""
         try:
@@ -193,24 +505,9 @@ Example format:
     
     def get_usage_summary(self) -> Dict[str, Any]:
         """Get usage statistics for monitoring"""
-        if not self.usage_log:
-            return {
-                "total_requests": 0, 
-                "total_cost": 0.0, 
-                "total_tokens": 0,
-                "average_cost_per_request": 0
-            }
-        
-        total_cost = sum(entry["estimated_cost"] for entry in self.usage_log)
-        total_tokens = sum(entry["total_tokens"] for entry in self.usage_log)
-        total_requests = len(self.usage_log)
-        
         return {
-            "total_requests": total_requests,
-            "total_cost": round(total_cost, 4),
-            "total_tokens": total_tokens,
-            "average_cost_per_request": round(total_cost / total_requests, 4) if total_requests > 0 else 0,
-            "last_24h": len([e for e in self.usage_log if (datetime.now() - datetime.fromisoformat(e["timestamp"])).total_seconds() < 86400])
+            **self.usage.summary(),
+            "prompt_tokens_saved": self.context_savings["tokens_saved"]
         }
     
     async def close(self):
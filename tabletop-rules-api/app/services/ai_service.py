@@ -1,6 +1,7 @@
 # app/services/ai_service.py - Clean OpenAI integration
 from typing import List
 from app.config import settings
+from app.services.metrics import metrics
 
 class AIService:
     def __init__(self):
@@ -14,8 +15,12 @@ class AIService:
             
             from openai import AsyncOpenAI
             
-            # Create client with only the API key - no other parameters
-            self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+            # Create client with the API key and, if configured, an alternate endpoint
+            client_kwargs = {"api_key": settings.openai_api_key}
+            if settings.openai_base_url:
+                client_kwargs["base_url"] = settings.openai_base_url
+            
+            self.client = AsyncOpenAI(**client_kwargs)
 
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embeddings for text using OpenAI"""
@@ -25,6 +30,8 @@ class AIService:
             model="text-embedding-3-small",
             input=text
         )
+        if response.usage:
+            metrics.inc("embedding_tokens_total", response.usage.total_tokens, model="text-embedding-3-small")
         return response.data[0].embedding
 
     async def test_connection(self) -> bool:
@@ -0,0 +1,206 @@
+# app/services/answer_registry.py - Precomputed per-game answers keyed by normalized intent
+"""Canonical answers for the template (no-LLM) response path.
+
+Each answer is stored under an intent key "<intent>:<subject>", e.g.
+"move:pawn" for "How do pawns move?" or "about:checkmate" for any other
+question about checkmate. Bundled answers live in
+rules_data/{game_id}_answers.yaml; admin edits are stored in the
+`answers` collection and override bundled entries with the same key:
+
+    - intent: move
+      subject: pawn
+      aliases: [pawns]
+      summary: "**Pawns move one square forward...**"
+      explanation: "Pawns are unique pieces..."
+      related:
+        - "**En Passant**: Special pawn capture rule..."
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+from datetime import datetime
+import asyncio
+import re
+
+RULES_DATA_DIR = Path(__file__).resolve().parent.parent.parent / "rules_data"
+
+INTENTS = ("move", "what", "can", "about")
+ANSWER_FIELDS = ("summary", "explanation", "related")
+
+MOVE_WORDS = {"move", "moves", "movement", "moving"}
+WHAT_WORDS = {"what", "whats", "define", "explain", "meaning"}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+def normalize_query(query: str) -> List[str]:
+    """Lower-cased words without punctuation ("What's" -> "whats")"""
+    return [word.replace("'", "") for word in _WORD_PATTERN.findall(query.lower())]
+
+def detect_intent(words: List[str]) -> str:
+    if MOVE_WORDS.intersection(words):
+        return "move"
+    if words and words[0] == "can":
+        return "can"
+    if WHAT_WORDS.intersection(words[:2]):
+        return "what"
+    return "about"
+
+def intent_key(intent: str, subject: str) -> str:
+    return f"{intent}:{subject.lower()}"
+
+def validate_answer(intent: str, subject: str, answer: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized answer document; raises ValueError"""
+    if intent not in INTENTS:
+        raise ValueError(f"Unknown intent '{intent}'; expected one of {', '.join(INTENTS)}")
+    if not subject or not subject.strip():
+        raise ValueError("subject is required")
+    if not any(answer.get(field) for field in ANSWER_FIELDS):
+        raise ValueError(f"An answer needs at least one of {', '.join(ANSWER_FIELDS)}")
+    related = answer.get("related") or []
+    if not isinstance(related, list) or not all(isinstance(item, str) for item in related):
+        raise ValueError("'related' must be a list of strings")
+    return {
+        "intent": intent,
+        "subject": subject.strip().lower(),
+        "aliases": [alias.lower() for alias in answer.get("aliases", [])],
+        "summary": answer.get("summary"),
+        "explanation": answer.get("explanation"),
+        "related": related
+    }
+
+class GameAnswers:
+    """One game's answers plus the alias table used to find a question's subjects"""
+
+    def __init__(self):
+        self.answers: Dict[str, Dict[str, Any]] = {}
+        self.aliases: Dict[str, str] = {}  # alias (one or more words) -> subject
+        self.max_alias_words = 1
+
+    def add(self, answer: Dict[str, Any], reindex: bool = True):
+        self.answers[intent_key(answer["intent"], answer["subject"])] = answer
+        if reindex:
+            self._index_aliases()
+
+    def remove(self, key: str) -> bool:
+        removed = self.answers.pop(key, None) is not None
+        self._index_aliases()
+        return removed
+
+    def _index_aliases(self):
+        self.aliases = {}
+        for answer in self.answers.values():
+            for alias in [answer["subject"], *answer.get("aliases", [])]:
+                self.aliases[" ".join(normalize_query(alias))] = answer["subject"]
+        self.max_alias_words = max((alias.count(" ") + 1 for alias in self.aliases), default=1)
+
+    def subjects(self, words: List[str]) -> List[str]:
+        """Subjects mentioned in the question, in order; longer aliases win"""
+        found: List[str] = []
+        index = 0
+        while index < len(words):
+            for size in range(min(self.max_alias_words, len(words) - index), 0, -1):
+                subject = self.aliases.get(" ".join(words[index:index + size]))
+                if subject is not None:
+                    if subject not in found:
+                        found.append(subject)
+                    index += size
+                    break
+            else:
+                index += 1
+        return found
+
+    def match(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(intent key, answer) for the question, trying its intent before 'about'"""
+        words = normalize_query(query)
+        subjects = self.subjects(words)
+        if not subjects:
+            return None
+        intent = detect_intent(words)
+        for candidate_intent in dict.fromkeys((intent, "about")):
+            for subject in subjects:
+                key = intent_key(candidate_intent, subject)
+                answer = self.answers.get(key)
+                if answer is not None:
+                    return key, answer
+        return None
+
+class AnswerRegistry:
+    """Precomputed answers for every game, held in memory.
+
+    Bundled answers are read once; stored answers are loaded at startup and
+    reloaded periodically so admin edits made on one worker reach the
+    others. Matching a question is a dictionary lookup per subject word.
+    """
+
+    def __init__(self, data_dir: Path = RULES_DATA_DIR):
+        self.data_dir = data_dir
+        self.games: Dict[str, GameAnswers] = {}
+        self.bundled: Dict[str, List[Dict[str, Any]]] = {}
+        self.loaded_at: Optional[datetime] = None
+        self.load_bundled()
+
+    def load_bundled(self):
+        import yaml
+        self.bundled = {}
+        for path in sorted(self.data_dir.glob("*_answers.yaml")):
+            game_id = path.name[:-len("_answers.yaml")]
+            entries = yaml.safe_load(path.read_text(encoding="utf-8")) or []
+            self.bundled[game_id] = [validate_answer(e.get("intent", ""), e.get("subject", ""), e) for e in entries]
+        self._rebuild([])
+
+    async def ensure_indexes(self, db):
+        await db.answers.create_index([("game_id", 1), ("intent", 1), ("subject", 1)], unique=True)
+
+    async def load(self, db):
+        """Bundled answers overlaid with every stored answer"""
+        if db is None:
+            return
+        stored = await db.answers.find({}, {"_id": 0}).to_list(length=None)
+        self._rebuild(stored)
+        self.loaded_at = datetime.utcnow()
+
+    def _rebuild(self, stored: List[Dict[str, Any]]):
+        games: Dict[str, GameAnswers] = {}
+        for game_id, entries in self.bundled.items():
+            for entry in entries:
+                games.setdefault(game_id, GameAnswers()).add(entry, reindex=False)
+        for entry in stored:
+            games.setdefault(entry["game_id"], GameAnswers()).add(entry, reindex=False)
+        for game in games.values():
+            game._index_aliases()
+        self.games = games
+
+    async def reload_periodically(self, get_db, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(get_db())
+            except Exception as e:
+                print(f"Failed to reload answer registry: {e}")
+
+    def match(self, game_id: str, query: str) -> Optional[Dict[str, Any]]:
+        game = self.games.get(game_id)
+        if game is None:
+            return None
+        matched = game.match(query)
+        return {**matched[1], "intent_key": matched[0]} if matched else None
+
+    def list(self, game_id: str) -> List[Dict[str, Any]]:
+        game = self.games.get(game_id)
+        if game is None:
+            return []
+        return [{**answer, "intent_key": key} for key, answer in sorted(game.answers.items())]
+
+    def put(self, game_id: str, answer: Dict[str, Any]):
+        self.games.setdefault(game_id, GameAnswers()).add(answer)
+
+    def remove(self, game_id: str, key: str):
+        """Drop a stored answer, falling back to the bundled one with the same key"""
+        game = self.games.get(game_id)
+        if game is None:
+            return
+        game.remove(key)
+        for entry in self.bundled.get(game_id, []):
+            if intent_key(entry["intent"], entry["subject"]) == key:
+                game.add(entry)
+
+answer_registry = AnswerRegistry()
@@ -1,11 +1,13 @@
 # app/services/auth_service.py - Complete version with all required functions
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordBearer
+import hashlib
+import hmac
 import os
+import secrets
 from typing import Optional
 
 # Configuration
@@ -13,19 +15,34 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Anonymous callers own their conversations through a signed visitor ID cookie
+VISITOR_COOKIE = "visitor_id"
+VISITOR_COOKIE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Password context for hashing; passlib is loaded on the first login or registration
+_pwd_context = None
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+def get_pwd_context():
+    """Create the bcrypt password context once."""
+    global _pwd_context
+    
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    
+    return _pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password for storing."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
@@ -118,6 +135,52 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[dict]:
+    """Current user if a valid token was sent, None for anonymous requests.
+    
+    Chat is open to everyone, and clients keep sending a session token
+    after it expires, so an invalid or expired token counts as anonymous
+    instead of locking the caller out.
+    """
+    if not token:
+        return None
+    try:
+        username = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+    return {"username": username} if username else None
+
+def sign_visitor_id(visitor_id: str) -> str:
+    """Cookie value for a visitor ID: the ID and its HMAC."""
+    signature = hmac.new(SECRET_KEY.encode(), visitor_id.encode(), hashlib.sha256).hexdigest()
+    return f"{visitor_id}.{signature}"
+
+def verify_visitor_cookie(value: Optional[str]) -> Optional[str]:
+    """Visitor ID from a signed cookie value, None if it is missing or forged."""
+    if not value or "." not in value:
+        return None
+    visitor_id = value.rsplit(".", 1)[0]
+    return visitor_id if hmac.compare_digest(sign_visitor_id(visitor_id), value) else None
+
+def resolve_conversation_owner(request: Request, current_user: Optional[dict]) -> str:
+    """Namespace that owns the caller's conversations.
+    
+    Signed-in users own theirs by username. Anonymous callers get a random
+    visitor ID issued by the server in a signed cookie, so knowing a
+    conversation ID is not enough to read or extend someone else's thread.
+    """
+    if current_user:
+        return current_user["username"]
+    visitor_id = verify_visitor_cookie(request.cookies.get(VISITOR_COOKIE))
+    if visitor_id is None:
+        visitor_id = secrets.token_urlsafe(16)
+        request.state.visitor_cookie = sign_visitor_id(visitor_id)  # Set on the response by the visitor cookie middleware
+    return f"visitor:{visitor_id}"
+
+async def get_conversation_owner(request: Request, current_user: Optional[dict] = Depends(get_optional_user)) -> str:
+    """resolve_conversation_owner as a dependency, for endpoints that always address a conversation"""
+    return resolve_conversation_owner(request, current_user)
+
 # Admin dependency
 async def get_admin_user(current_user: dict = Depends(get_current_user)):
     """Ensure the current user has admin privileges."""
@@ -0,0 +1,315 @@
+# app/services/boost_rules.py - Per-game relevance boosts compiled into a multi-pattern matcher
+"""Per-game boost rules for score_rules_for_query.
+
+Boost rules come from the `boost_rules` key of a rulebook's frontmatter
+(stored on the game document at upload) or from
+PUT /api/admin/games/{game_id}/boost-rules:
+
+    boost_rules:
+      entities:            # Things players ask about; rules about them rank higher
+        - term: pawn
+          synonyms: [pawns]
+          phrases: ["pawn movement"]
+      keywords:            # Topics that add a flat boost when asked and present
+        - term: castling
+          synonyms: [castle]
+      penalty_terms: [illegal, penalty]   # Demote these titles when an entity is asked
+      demote:              # Demote these titles unless the question mentions them
+        - term: overview
+          weight: -5
+
+Like the if/elif chain these rules replaced, only the first entity or
+keyword a question asks about is applied: entities before keywords, each
+in the order listed. Demotes always apply.
+
+Every term of a game is compiled into one Aho-Corasick automaton, so a
+rule's title, content and category are each scanned once no matter how
+many boost rules the game has. Terms match whole words only, so "cat"
+does not fire inside "location".
+"""
+from typing import Dict, Any, List, Optional, Set, Tuple
+from collections import deque, OrderedDict
+from pathlib import Path
+import time
+
+RULES_DATA_DIR = Path(__file__).resolve().parent.parent.parent / "rules_data"
+
+WEIGHTS = {
+    "phrase": 25,     # Entity phrase ("pawn movement") in title or content
+    "title": 20,      # Entity in title
+    "content": 15,    # Entity in content only
+    "keyword": 15,
+    "penalty": -10
+}
+
+# Applied to every game, before its own rules
+GLOBAL_BOOST_RULES = {
+    "demote": [
+        {"term": "overview", "weight": -5},
+        {"term": "setup", "weight": -3, "unless": ["start"]}
+    ]
+}
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern occurring as whole words"""
+
+    def __init__(self, patterns: List[str]):
+        self.lengths = [len(pattern) for pattern in patterns]
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = next_node
+            self.output[node] += (pattern_id,)
+
+        # Breadth-first failure links; outputs inherit those of their fail node
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] += self.output[self.fail[child]]
+
+    def scan(self, text: str) -> Set[int]:
+        """Ids of all patterns occurring in text on word boundaries ("cat" is not found in "location")"""
+        goto, fail, output, lengths = self.goto, self.fail, self.output, self.lengths
+        found: Set[int] = set()
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if not output[node] or (end < len(text) and _is_word_char(text[end])):
+                continue
+            for pattern_id in output[node]:
+                start = end - lengths[pattern_id]
+                if start == 0 or not _is_word_char(text[start - 1]):
+                    found.add(pattern_id)
+        return found
+
+class CompiledBoosts:
+    """A game's boost rules with all their terms in one automaton"""
+
+    def __init__(self, boost_rules: Optional[Dict[str, Any]] = None, scan_cache_size: int = 4096):
+        config = merge_boost_rules(GLOBAL_BOOST_RULES, boost_rules or {})
+        self.patterns: List[str] = []
+        self._pattern_ids: Dict[str, int] = {}
+
+        # Each entity: (ids of its words, ids of its phrases); asked via any of its words
+        self.entities: List[Tuple[Set[int], Set[int]]] = []
+        self.query_words: Dict[str, List[Tuple[str, int]]] = {}  # query word -> [(kind, index)]
+        self.query_phrases: List[Tuple[str, str, int]] = []  # (phrase, kind, index)
+
+        for index, entity in enumerate(config.get("entities", [])):
+            words = [entity["term"], *entity.get("synonyms", [])]
+            phrases = entity.get("phrases", [])
+            self.entities.append(({self._pattern(w) for w in words}, {self._pattern(p) for p in phrases}))
+            for word in words:
+                self._register_query_term(word, "entity", index)
+
+        self.keywords: List[Tuple[Set[int], int]] = []
+        for index, keyword in enumerate(config.get("keywords", [])):
+            words = [keyword["term"], *keyword.get("synonyms", [])]
+            self.keywords.append(({self._pattern(w) for w in words}, keyword.get("weight", WEIGHTS["keyword"])))
+            for word in words:
+                self._register_query_term(word, "keyword", index)
+
+        self.penalty_ids = {self._pattern(term) for term in config.get("penalty_terms", [])}
+        self.penalty_weight = config.get("penalty_weight", WEIGHTS["penalty"])
+
+        self.demotes: List[Tuple[int, int, Set[str]]] = [
+            (self._pattern(d["term"]), d.get("weight", -5), {d["term"].lower(), *[u.lower() for u in d.get("unless", [])]})
+            for d in config.get("demote", [])
+        ]
+
+        self.matcher = AhoCorasick(self.patterns)
+        self._scan_cache: "OrderedDict[str, Set[int]]" = OrderedDict()
+        self._scan_cache_size = scan_cache_size
+
+    def _pattern(self, term: str) -> int:
+        term = term.lower()
+        if term not in self._pattern_ids:
+            self._pattern_ids[term] = len(self.patterns)
+            self.patterns.append(term)
+        return self._pattern_ids[term]
+
+    def _register_query_term(self, term: str, kind: str, index: int):
+        term = term.lower()
+        if " " in term:
+            self.query_phrases.append((term, kind, index))
+        else:
+            self.query_words.setdefault(term, []).append((kind, index))
+
+    def scan(self, text: str) -> Set[int]:
+        """Patterns in an already lower-cased field; recent results are memoized"""
+        if not text:
+            return set()
+        found = self._scan_cache.get(text)
+        if found is None:
+            found = self.matcher.scan(text)
+            self._scan_cache[text] = found
+            if len(self._scan_cache) > self._scan_cache_size:
+                self._scan_cache.popitem(last=False)
+        else:
+            self._scan_cache.move_to_end(text)
+        return found
+
+    def plan(self, query_text: str, query_terms: List[str]) -> Dict[str, Any]:
+        """The first entity, or failing that the first keyword, the question asks about"""
+        asked = {"entity": set(), "keyword": set()}
+        for term in query_terms:
+            for kind, index in self.query_words.get(term, ()):
+                asked[kind].add(index)
+        for phrase, kind, index in self.query_phrases:
+            if phrase in query_text:
+                asked[kind].add(index)
+        terms = set(query_terms)
+        first_entity = min(asked["entity"], default=None)
+        first_keyword = min(asked["keyword"], default=None) if first_entity is None else None
+        return {
+            "entities": [self.entities[first_entity]] if first_entity is not None else [],
+            "keywords": [self.keywords[first_keyword]] if first_keyword is not None else [],
+            "demotes": [(pattern_id, weight) for pattern_id, weight, exempt in self.demotes if not exempt & terms]
+        }
+
+    def score(self, plan: Dict[str, Any], title: str, content: str, category: str) -> int:
+        """Boost for one rule; each field is scanned at most once"""
+        if not (plan["entities"] or plan["keywords"] or plan["demotes"]):
+            return 0
+        title_hits = self.scan(title)
+        score = 0
+
+        if plan["entities"] or plan["keywords"]:
+            content_hits = self.scan(content)
+            for words, phrases in plan["entities"]:
+                if phrases & title_hits or phrases & content_hits:
+                    score += WEIGHTS["phrase"]
+                elif words & title_hits:
+                    score += WEIGHTS["title"]
+                elif words & content_hits:
+                    score += WEIGHTS["content"]
+            if plan["entities"] and self.penalty_ids & title_hits:
+                score += self.penalty_weight
+            if plan["keywords"]:
+                category_hits = self.scan(category)
+                for words, weight in plan["keywords"]:
+                    if words & title_hits or words & content_hits or words & category_hits:
+                        score += weight
+
+        for pattern_id, weight in plan["demotes"]:
+            if pattern_id in title_hits:
+                score += weight
+        return score
+
+def merge_boost_rules(*configs: Dict[str, Any]) -> Dict[str, Any]:
+    """Concatenate the lists of several boost rule configs"""
+    merged: Dict[str, Any] = {}
+    for config in configs:
+        for key, value in config.items():
+            if isinstance(value, list):
+                merged[key] = merged.get(key, []) + value
+            else:
+                merged[key] = value
+    return merged
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _is_string_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) and item.strip() for item in value)
+
+def validate_boost_rules(boost_rules: Dict[str, Any]) -> Dict[str, Any]:
+    """Check the shape of a boost rule config; raises ValueError"""
+    if not isinstance(boost_rules, dict):
+        raise ValueError("boost_rules must be a mapping")
+    for section in ("entities", "keywords", "demote"):
+        items = boost_rules.get(section, [])
+        if not isinstance(items, list):
+            raise ValueError(f"'{section}' must be a list")
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("term"), str) or not item["term"].strip():
+                raise ValueError(f"Every entry in '{section}' needs a non-empty 'term'")
+            if "weight" in item and not _is_number(item["weight"]):
+                raise ValueError(f"'weight' of '{item['term']}' in '{section}' must be a number")
+            for key in ("synonyms", "phrases", "unless"):
+                if key in item and not _is_string_list(item[key]):
+                    raise ValueError(f"'{key}' of '{item['term']}' in '{section}' must be a list of non-empty strings")
+    if not _is_string_list(boost_rules.get("penalty_terms", [])):
+        raise ValueError("'penalty_terms' must be a list of non-empty strings")
+    if "penalty_weight" in boost_rules and not _is_number(boost_rules["penalty_weight"]):
+        raise ValueError("'penalty_weight' must be a number")
+    CompiledBoosts(boost_rules)  # Compiles, or raises on bad values
+    return boost_rules
+
+class BoostRegistry:
+    """Compiled boost rules per game.
+
+    Stored rules (game document) are refreshed at most every
+    `ttl_seconds`; games without stored rules fall back to the bundled
+    rulebook's frontmatter in rules_data/, then to the global rules.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[str, Dict[str, Any]] = {}  # game_id -> boosts, config, checked_at
+        self._bundled: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def get(self, game_id: Optional[str]) -> CompiledBoosts:
+        """Compiled rules for a game without touching the database"""
+        entry = self.entries.get(game_id or "")
+        if entry is None:
+            entry = self._store(game_id or "", self._bundled_rules(game_id), checked_at=0.0)
+        return entry["boosts"]
+
+    async def refresh(self, db, game_id: str) -> CompiledBoosts:
+        """Pick up the game's stored boost rules once the cached copy is older than the TTL"""
+        entry = self.entries.get(game_id)
+        now = time.monotonic()
+        if entry is not None and now - entry["checked_at"] < self.ttl_seconds:
+            return entry["boosts"]
+        game = await db.games.find_one({"game_id": game_id}, {"boost_rules": 1})
+        config = (game or {}).get("boost_rules") or self._bundled_rules(game_id)
+        if entry is not None and entry["config"] == config:
+            entry["checked_at"] = now  # Unchanged; keep the compiled automaton and its scan cache
+            return entry["boosts"]
+        return self._store(game_id, config, checked_at=now)["boosts"]
+
+    def _store(self, game_id: str, config: Optional[Dict[str, Any]], checked_at: float) -> Dict[str, Any]:
+        entry = {"boosts": CompiledBoosts(config), "config": config, "checked_at": checked_at}
+        self.entries[game_id] = entry
+        return entry
+
+    def invalidate(self, game_id: str):
+        self.entries.pop(game_id, None)
+
+    def _bundled_rules(self, game_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not game_id:
+            return None
+        if game_id not in self._bundled:
+            path = RULES_DATA_DIR / f"{game_id}_rules.md"
+            rules = None
+            if path.exists():
+                import frontmatter
+                rules = frontmatter.loads(path.read_text(encoding="utf-8")).metadata.get("boost_rules")
+            self._bundled[game_id] = rules
+        return self._bundled[game_id]
+
+boost_registry = BoostRegistry()
@@ -0,0 +1,149 @@
+# app/services/circuit_breaker.py - Rolling-window circuit breaker for the LLM path
+from collections import deque
+from typing import Dict, Any, Optional
+import time
+
+class CircuitBreaker:
+    """Trip open when too many recent calls fail or run slow.
+
+    While open, callers skip the protected call entirely and serve their
+    fallback. After `open_seconds` a single probe is let through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_requests: int = 5,
+        error_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0
+    ):
+        self.name = name
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self.outcomes = deque(maxlen=window_size)  # (failed, slow) per call
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.trip_count = 0
+        self.short_circuited = 0
+        self.last_trip_reason: Optional[str] = None
+        self.last_trip_at: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        """Return True if the protected call may be attempted now"""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            else:
+                self.short_circuited += 1
+                return False
+
+        # Half-open: only one probe at a time
+        if self.probe_in_flight:
+            self.short_circuited += 1
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def record_success(self, duration: float):
+        """Record a completed call; slow successes still count against the breaker"""
+        slow = duration >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if slow:
+                self._trip("half-open probe was slow")
+            else:
+                self._close()
+            return
+
+        self.outcomes.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self, duration: float = 0.0):
+        """Record a failed or timed-out call"""
+        if self.state == self.HALF_OPEN:
+            self._trip("half-open probe failed")
+            return
+
+        self.outcomes.append((True, duration >= self.slow_call_seconds))
+        self._evaluate()
+
+    def release_probe(self):
+        """Give back a half-open probe that never reached the provider, recording no outcome"""
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+
+    def _evaluate(self):
+        total = len(self.outcomes)
+        if self.state != self.CLOSED or total < self.min_requests:
+            return
+
+        error_rate = sum(1 for failed, _ in self.outcomes if failed) / total
+        slow_rate = sum(1 for _, slow in self.outcomes if slow) / total
+
+        if error_rate >= self.error_rate_threshold:
+            self._trip(f"error rate {error_rate:.0%} over last {total} calls")
+        elif slow_rate >= self.slow_call_rate_threshold:
+            self._trip(f"slow-call rate {slow_rate:.0%} over last {total} calls")
+
+    def _trip(self, reason: str):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+        self.trip_count += 1
+        self.last_trip_reason = reason
+        self.last_trip_at = time.time()
+        self.outcomes.clear()
+        print(f"Circuit breaker '{self.name}' opened: {reason}")
+
+    def _close(self):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.outcomes.clear()
+        print(f"Circuit breaker '{self.name}' closed")
+
+    def reset(self):
+        """Force the breaker closed and clear its counters"""
+        self._close()
+        self.trip_count = 0
+        self.short_circuited = 0
+        self.last_trip_reason = None
+        self.last_trip_at = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get breaker state for monitoring"""
+        total = len(self.outcomes)
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+        return {
+            "name": self.name,
+            "state": self.state,
+            "trip_count": self.trip_count,
+            "short_circuited_requests": self.short_circuited,
+            "last_trip_reason": self.last_trip_reason,
+            "last_trip_at": self.last_trip_at,
+            "retry_in_seconds": round(retry_in, 2) if retry_in is not None else None,
+            "window": {
+                "calls": total,
+                "errors": sum(1 for failed, _ in self.outcomes if failed),
+                "slow_calls": sum(1 for _, slow in self.outcomes if slow)
+            }
+        }
@@ -0,0 +1,268 @@
+# app/services/context_packer.py - Token-budget-aware packing of rule chunks into prompt context
+from typing import List, Dict, Any, Tuple, Optional
+import hashlib
+import re
+from app.services.tokenizer import CHARS_PER_TOKEN, estimate_tokens, count_tokens
+
+PART_TITLE_PATTERN = re.compile(r'^(?P<base>.*?)\s*\(Part (?P<part>\d+)\)$')
+MIN_TRUNCATED_TOKENS = 50  # Don't bother packing a truncated fragment smaller than this
+PREVIEW_LENGTH = 150
+
+def _stored_tokens(rule: Dict[str, Any]) -> Optional[int]:
+    tokens = (rule.get("chunk_metadata") or {}).get("tokens")
+    return tokens if isinstance(tokens, int) and tokens > 0 else None
+
+def paragraph_hash(paragraph: str) -> str:
+    """Short, whitespace- and case-insensitive hash used to spot repeated paragraphs"""
+    normalized = " ".join(paragraph.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
+def _split_paragraphs(content: str) -> List[str]:
+    return [p for p in content.split("\n\n") if p.strip()]
+
+def render_prompt_text(title: str, category: str, content: str) -> str:
+    """Render a rule the way it appears in the prompt context (without its list number)"""
+    clean_content = content.replace('\n\n', ' ').strip()
+    return f"**{title}** (Category: {category})\n   {clean_content}"
+
+def prepare_chunk_for_prompt(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Store the prompt-ready rendering of a chunk alongside it.
+
+    Called at ingest and whenever a chunk is edited so query-time context
+    assembly is a string join: prompt_text is the rendered rule,
+    chunk_metadata.prompt_tokens its exact token count, and
+    chunk_metadata.paragraph_hashes lets the packer spot duplicates
+    without re-reading the content.
+    """
+    title = chunk.get("title") or "Untitled"
+    content = chunk.get("content") or ""
+    prompt_text = render_prompt_text(title, chunk.get("category_id", "general"), content)
+
+    metadata = chunk.setdefault("chunk_metadata", {})
+    metadata["tokens"] = count_tokens(content)
+    metadata["prompt_tokens"] = count_tokens(prompt_text)
+    metadata["paragraph_hashes"] = [paragraph_hash(p) for p in _split_paragraphs(content)]
+
+    chunk["prompt_text"] = prompt_text
+    chunk["preview"] = content[:PREVIEW_LENGTH] + ("..." if len(content) > PREVIEW_LENGTH else "")
+    return chunk
+
+def prompt_fields(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields prepare_chunk_for_prompt sets, flattened for a Mongo $set"""
+    prepared = prepare_chunk_for_prompt({
+        "title": chunk.get("title"),
+        "content": chunk.get("content"),
+        "category_id": chunk.get("category_id", "general"),
+        "chunk_metadata": {}
+    })
+    return {
+        "prompt_text": prepared["prompt_text"],
+        "preview": prepared["preview"],
+        **{f"chunk_metadata.{key}": value for key, value in prepared["chunk_metadata"].items()}
+    }
+
+def _section_key(rule: Dict[str, Any], base_title: str) -> Tuple:
+    metadata = rule.get("chunk_metadata") or {}
+    if "section_index" in metadata:
+        return (rule.get("game_id"), metadata.get("source_file"), metadata["section_index"])
+    return (rule.get("game_id"), rule.get("category_id"), base_title)
+
+def merge_part_chunks(rules: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Merge "(Part N)" chunks of the same section into one entry.
+
+    Entries keep the relevance position of their best-ranked part and the
+    parts are joined in document order. Returns (entries, parts_merged).
+    """
+    entries = []
+    sections = {}
+    parts_merged = 0
+
+    for rule in rules:
+        title = rule.get("title") or f"Rule {len(entries) + 1}"
+        content = rule.get("content") or ""
+        match = PART_TITLE_PATTERN.match(title)
+        entry_part = {
+            "part": int(match.group("part")) if match else 0,
+            "content": content,
+            "tokens": _stored_tokens(rule) or estimate_tokens(content),
+            "rule": rule
+        }
+
+        if not match:
+            entries.append({
+                "title": title,
+                "category": rule.get("category_id", "general"),
+                "parts": [entry_part]
+            })
+            continue
+
+        base_title = match.group("base")
+        key = _section_key(rule, base_title)
+        if key in sections:
+            sections[key]["parts"].append(entry_part)
+            parts_merged += 1
+            continue
+
+        entry = {
+            "title": base_title,
+            "category": rule.get("category_id", "general"),
+            "parts": [entry_part]
+        }
+        sections[key] = entry
+        entries.append(entry)
+
+    for entry in entries:
+        entry["parts"].sort(key=lambda p: p["part"])
+
+    return entries, parts_merged
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Prefer to cut on a word boundary
+    if " " in cut[-40:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "..."
+
+class ContextPacker:
+    """Fill a prompt-token budget with rule chunks in relevance order.
+
+    Uses the token counts stored at ingest (chunk_metadata.tokens), merges
+    split "(Part N)" chunks back into their section, and drops paragraphs
+    already present in higher-ranked chunks. Chunks that do not fit are
+    skipped so lower-ranked but shorter chunks can still use the budget;
+    only the top-ranked chunk is ever truncated.
+    """
+
+    def pack(self, rules: List[Dict[str, Any]], budget_tokens: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        candidate_tokens = sum(_stored_tokens(r) or estimate_tokens(r.get("content") or "") for r in rules)
+        entries, parts_merged = merge_part_chunks(rules)
+
+        seen_paragraphs = set()
+        packed = []
+        used_tokens = 0
+        chunks_packed = 0
+        duplicates_removed = 0
+        truncated = 0
+
+        for entry in entries:
+            remaining = budget_tokens - used_tokens
+            prepared = self._prepared_text(entry, seen_paragraphs)
+
+            if prepared is not None:
+                # Fast path: stored rendering, nothing to merge or dedupe
+                prompt_text, total, hashes = prepared
+                if total > remaining:
+                    if packed or remaining < MIN_TRUNCATED_TOKENS:
+                        continue
+                    prompt_text = _truncate_to_tokens(prompt_text, remaining)
+                    total = remaining
+                    truncated += 1
+                seen_paragraphs.update(hashes)
+                packed.append({
+                    "title": entry["title"],
+                    "category": entry["category"],
+                    "prompt_text": prompt_text,
+                    "tokens": total
+                })
+                used_tokens += total
+                chunks_packed += 1
+                continue
+
+            # Drop paragraphs already sent in a higher-ranked chunk
+            kept_parts = []
+            entry_seen = set()
+            entry_duplicates = 0
+            entry_tokens = 0
+            for part in entry["parts"]:
+                paragraphs = _split_paragraphs(part["content"])
+                kept = []
+                for paragraph in paragraphs:
+                    key = paragraph_hash(paragraph)
+                    if key in seen_paragraphs or key in entry_seen:
+                        entry_duplicates += 1
+                        continue
+                    entry_seen.add(key)
+                    kept.append(paragraph)
+                if not kept:
+                    continue
+                kept_text = "\n\n".join(kept)
+                if len(kept) == len(paragraphs):
+                    tokens = part["tokens"]
+                else:
+                    tokens = max(1, round(part["tokens"] * len(kept_text) / max(1, len(part["content"]))))
+                kept_parts.append((part, kept, kept_text))
+                entry_tokens += tokens
+
+            if not kept_parts:
+                # Entirely covered by higher-ranked chunks
+                duplicates_removed += entry_duplicates
+                continue
+
+            text = " [...] ".join(self._join_parts(kept_parts))
+            prompt_text = render_prompt_text(entry["title"], entry["category"], text)
+            header_tokens = estimate_tokens(f"**{entry['title']}** (Category: {entry['category']})")
+            total = entry_tokens + header_tokens
+
+            if total > remaining:
+                if packed or remaining - header_tokens < MIN_TRUNCATED_TOKENS:
+                    continue
+                prompt_text = _truncate_to_tokens(prompt_text, remaining)
+                total = remaining
+                truncated += 1
+
+            seen_paragraphs.update(entry_seen)
+            duplicates_removed += entry_duplicates
+
+            packed.append({
+                "title": entry["title"],
+                "category": entry["category"],
+                "prompt_text": prompt_text,
+                "tokens": total
+            })
+            used_tokens += total
+            chunks_packed += len(kept_parts)
+
+        stats = {
+            "budget_tokens": budget_tokens,
+            "candidate_chunks": len(rules),
+            "chunks_packed": chunks_packed,
+            "parts_merged": parts_merged,
+            "duplicate_paragraphs_removed": duplicates_removed,
+            "truncated_chunks": truncated,
+            "candidate_tokens": candidate_tokens,
+            "packed_tokens": used_tokens,
+            "tokens_saved": max(0, candidate_tokens - used_tokens)
+        }
+        return packed, stats
+
+    def _prepared_text(self, entry: Dict[str, Any], seen_paragraphs: set) -> Optional[Tuple[str, int, List[str]]]:
+        """Stored (prompt_text, prompt_tokens, paragraph_hashes) if the entry can use them as-is"""
+        if len(entry["parts"]) != 1:
+            return None
+        rule = entry["parts"][0]["rule"]
+        metadata = rule.get("chunk_metadata") or {}
+        prompt_text = rule.get("prompt_text")
+        prompt_tokens = metadata.get("prompt_tokens")
+        hashes = metadata.get("paragraph_hashes")
+        if not prompt_text or not prompt_tokens or hashes is None:
+            return None
+        if len(set(hashes)) != len(hashes) or any(h in seen_paragraphs for h in hashes):
+            return None
+        return prompt_text, prompt_tokens, hashes
+
+    def _join_parts(self, kept_parts) -> List[str]:
+        """Join consecutive parts directly; mark gaps between non-adjacent parts"""
+        runs = []
+        previous = None
+        for part, _, kept_text in kept_parts:
+            if runs and previous is not None and part["part"] == previous + 1:
+                runs[-1] += "\n\n" + kept_text
+            else:
+                runs.append(kept_text)
+            previous = part["part"]
+        return runs
+
+context_packer = ContextPacker()
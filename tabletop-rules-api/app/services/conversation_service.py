@@ -0,0 +1,149 @@
+# app/services/conversation_service.py - Server-side conversations with append-only turns
+from typing import Dict, List, Any, Optional, Tuple
+from app.database import get_database
+from app.config import settings
+from app.services.tokenizer import count_tokens
+from datetime import datetime
+from pymongo import ReturnDocument
+
+class ConversationService:
+    """Conversations keyed by (user_id, conversation_id).
+
+    user_id is the owner namespace from get_conversation_owner: a username,
+    or a server-issued visitor ID for anonymous callers.
+
+    A conversation document holds the turn counter; each question and
+    answer is appended to `conversation_turns` with a per-conversation
+    sequence number, so both the prompt window and the history pages are
+    index range scans on (user_id, conversation_id, seq).
+    """
+
+    def __init__(self):
+        self.conversations_collection = "conversations"
+        self.turns_collection = "conversation_turns"
+
+    async def ensure_indexes(self):
+        db = get_database()
+        await db[self.conversations_collection].create_index([("user_id", 1), ("conversation_id", 1)], unique=True)
+        await db[self.conversations_collection].create_index([("user_id", 1), ("updated_at", -1)])
+        await db[self.turns_collection].create_index([("user_id", 1), ("conversation_id", 1), ("seq", -1)], unique=True)
+
+    async def get_conversation(self, conversation_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        db = get_database()
+        return await db[self.conversations_collection].find_one(
+            {"user_id": user_id, "conversation_id": conversation_id}, {"_id": 0}
+        )
+
+    async def append_turns(
+        self,
+        conversation_id: str,
+        user_id: str,
+        game_id: str,
+        turns: List[Dict[str, str]]
+    ) -> int:
+        """Append turns ({"role", "content"}) in order; returns the last sequence number"""
+        db = get_database()
+        now = datetime.utcnow()
+
+        # Reserve sequence numbers atomically so concurrent requests never collide
+        conversation = await db[self.conversations_collection].find_one_and_update(
+            {"user_id": user_id, "conversation_id": conversation_id},
+            {
+                "$inc": {"turn_count": len(turns)},
+                "$set": {"updated_at": now, "game_id": game_id},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        first_seq = conversation["turn_count"] - len(turns) + 1
+
+        await db[self.turns_collection].insert_many([
+            {
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "seq": first_seq + i,
+                "role": turn["role"],
+                "content": turn["content"],
+                "game_id": game_id,
+                "tokens": count_tokens(turn["content"]),
+                "created_at": now
+            }
+            for i, turn in enumerate(turns)
+        ])
+        return conversation["turn_count"]
+
+    async def load_window(self, conversation_id: str, user_id: str, window: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The newest `window` turns, oldest first; reads at most `window` documents"""
+        db = get_database()
+        limit = window or settings.conversation_window_turns
+        turns = await db[self.turns_collection].find(
+            {"user_id": user_id, "conversation_id": conversation_id},
+            {"_id": 0, "seq": 1, "role": 1, "content": 1, "tokens": 1}
+        ).sort("seq", -1).limit(limit).to_list(length=limit)
+        turns.reverse()
+        return turns
+
+    def build_history(self, turns: List[Dict[str, Any]], budget_tokens: Optional[int] = None) -> List[Dict[str, str]]:
+        """Prompt messages for the newest turns that fit the token budget.
+
+        Turns that don't fit are summarized as a single line listing the
+        earlier questions, so the model keeps the thread of the conversation
+        without paying for the old answers.
+        """
+        budget = budget_tokens if budget_tokens is not None else settings.conversation_history_tokens
+        kept: List[Dict[str, str]] = []
+        used = 0
+        index = len(turns)
+        while index > 0:
+            turn = turns[index - 1]
+            tokens = turn.get("tokens") or count_tokens(turn["content"])
+            if used + tokens > budget:
+                break
+            kept.append({"role": turn["role"], "content": turn["content"]})
+            used += tokens
+            index -= 1
+        kept.reverse()
+
+        earlier_questions = [t["content"] for t in turns[:index] if t["role"] == "user"]
+        if earlier_questions:
+            summary = _summarize_questions(earlier_questions, max(0, budget - used))
+            if summary:
+                kept.insert(0, {"role": "system", "content": summary})
+        return kept
+
+    async def get_history(self, conversation_id: str, user_id: str) -> List[Dict[str, str]]:
+        return self.build_history(await self.load_window(conversation_id, user_id))
+
+    async def get_turns_page(
+        self,
+        conversation_id: str,
+        user_id: str,
+        before: Optional[int] = None,
+        limit: int = 20
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of turns, newest first, and the cursor for the next (older) page"""
+        db = get_database()
+        query: Dict[str, Any] = {"user_id": user_id, "conversation_id": conversation_id}
+        if before is not None:
+            query["seq"] = {"$lt": before}
+        turns = await db[self.turns_collection].find(query, {"_id": 0, "user_id": 0, "conversation_id": 0}).sort("seq", -1).limit(limit).to_list(length=limit)
+        next_before = turns[-1]["seq"] if len(turns) == limit and turns[-1]["seq"] > 1 else None
+        return turns, next_before
+
+def _summarize_questions(questions: List[str], budget_tokens: int) -> Optional[str]:
+    """'Earlier in this conversation the user asked: ...', newest questions kept first"""
+    prefix = "Earlier in this conversation the user asked: "
+    used = count_tokens(prefix)
+    kept = []
+    for question in reversed(questions):
+        tokens = count_tokens(question) + 1
+        if used + tokens > budget_tokens:
+            break
+        kept.append(question.strip())
+        used += tokens
+    if not kept:
+        return None
+    return prefix + "; ".join(reversed(kept))
+
+conversation_service = ConversationService()
@@ -0,0 +1,117 @@
+# app/services/corpus_cache.py - Per-game rule corpora held in memory, plus cache warming
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+import time
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.profiling import span
+
+class CorpusCache:
+    """Each recently queried game's rules, so queries skip the Mongo read.
+
+    An entry is trusted for `check_seconds`; after that the game's
+    corpus_version is re-read (one small document) and the rules are
+    reloaded only if an ingest or rule edit changed it. At most
+    `max_games` corpora are kept, least recently used evicted first.
+    Callers that only need the first rules pass `limit`; the cached list
+    itself is shared with the search, typeahead and spelling indexes.
+    """
+
+    def __init__(self, check_seconds: float = 30.0, max_games: int = 50, max_rules: Optional[int] = 50, metric: str = "corpus"):
+        self.check_seconds = check_seconds
+        self.max_games = max_games
+        self.max_rules = max_rules
+        self.metric = metric
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def is_warm(self, game_id: str) -> bool:
+        return game_id in self.entries
+
+    async def get_rules(self, db, game_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        rules = await self._load(db, game_id)
+        return rules if limit is None else rules[:limit]
+
+    async def _load(self, db, game_id: str) -> List[Dict[str, Any]]:
+        entry = self.entries.get(game_id)
+        now = time.monotonic()
+        if entry is not None and now - entry["checked_at"] < self.check_seconds:
+            metrics.record_cache(self.metric, True)
+            self.entries.move_to_end(game_id)
+            return entry["rules"]
+
+        game = await db.games.find_one({"game_id": game_id}, {"corpus_version": 1})
+        version = (game or {}).get("corpus_version", 0)
+        if entry is not None and entry["version"] == version:
+            metrics.record_cache(self.metric, True)
+            entry["checked_at"] = now
+            self.entries.move_to_end(game_id)
+            return entry["rules"]
+
+        metrics.record_cache(self.metric, False)
+        with span("mongo_read"):
+            rules = await db.content_chunks.find(
+                {"game_id": game_id}, {"rule_embedding": 0}
+            ).to_list(length=self.max_rules)
+        self.entries[game_id] = {"rules": rules, "version": version, "checked_at": now, "loaded_at": now}
+        self.entries.move_to_end(game_id)
+        while len(self.entries) > self.max_games:
+            self.entries.popitem(last=False)
+        return rules
+
+    def invalidate(self, game_id: str):
+        self.entries.pop(game_id, None)
+
+    def clear(self):
+        self.entries.clear()
+
+async def warm_game(db, game_id: str) -> Dict[str, Any]:
+    """Load a game's corpus, boost rules, precomputed answers, typeahead and spelling indexes into this worker"""
+    from app.services.boost_rules import boost_registry
+    from app.services.precompute_service import precompute_service
+    from app.services.typeahead import typeahead_indexes
+    from app.services.spelling import spelling_indexes
+
+    start_time = time.perf_counter()
+    already_warm = corpus_cache.is_warm(game_id)
+    if already_warm and precompute_service.is_warm(game_id):
+        # Nothing to load; queries re-validate the cached corpus and answers themselves
+        return {
+            "game_id": game_id,
+            "already_warm": True,
+            "duration_ms": round((time.perf_counter() - start_time) * 1000, 1)
+        }
+    rules = await corpus_cache.get_rules(db, game_id)
+    await boost_registry.refresh(db, game_id)
+    precomputed = await precompute_service.warm(db, game_id)
+    suggestions = await typeahead_indexes.get(db, game_id)
+    vocabulary = await spelling_indexes.get(db, game_id)
+    return {
+        "game_id": game_id,
+        "rules": len(rules),
+        "precomputed_answers": precomputed,
+        "suggestions": len(suggestions),
+        "vocabulary": len(vocabulary),
+        "already_warm": already_warm,
+        "duration_ms": round((time.perf_counter() - start_time) * 1000, 1)
+    }
+
+async def warm_top_games(db, limit: int, days: float = 1) -> List[Dict[str, Any]]:
+    """Warm the games with the most queries in the query log over the last `days`"""
+    from app.services.query_log import latency_by_game
+
+    if db is None or limit <= 0:
+        return []
+    warmed = []
+    for game in (await latency_by_game(db, days))[:limit]:
+        try:
+            warmed.append(await warm_game(db, game["game_id"]))
+        except Exception as e:
+            print(f"Could not warm {game['game_id']}: {e}")
+    return warmed
+
+# The one per-worker copy of each game's rules, for queries and every index
+corpus_cache = CorpusCache(
+    check_seconds=settings.corpus_cache_check_seconds,
+    max_games=settings.corpus_cache_max_games,
+    max_rules=settings.search_index_max_rules
+)
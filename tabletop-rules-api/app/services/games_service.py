@@ -48,6 +48,7 @@ class GamesService:
                 "rule_count": 0,
                 "categories": [],
                 "ai_tags": game_data.get("ai_tags", []),
+                "boost_rules": game_data.get("boost_rules"),
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow(),
                 "auto_registered": True
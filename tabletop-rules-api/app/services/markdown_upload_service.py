@@ -1,20 +1,22 @@
 # app/services/markdown_upload_service.py - Updated with games registry
 import frontmatter
-import markdown
-import tiktoken
 import re
 from typing import Dict, List, Any, Tuple
 from uuid import uuid4
 from datetime import datetime
+from fastapi import UploadFile
 from app.database import get_database
 from app.services.ai_service import ai_service
 from app.services.games_service import games_service
+from app.services.context_packer import prepare_chunk_for_prompt
+from app.services.tokenizer import count_tokens
+from app.services.metrics import metrics
 import asyncio
+import time
 
 class MarkdownUploadService:
     def __init__(self):
         self.upload_tasks = {}  # In production, use Redis or database
-        self.encoding = tiktoken.get_encoding("cl100k_base")  # GPT-4 encoding
 
     async def start_markdown_upload(self, file: UploadFile, user_id: str) -> str:
         """Start background Markdown upload process"""
@@ -63,6 +65,7 @@ class MarkdownUploadService:
     async def _process_markdown_upload(self, task_id: str, file: UploadFile):
         """Background task for processing single Markdown upload"""
         try:
+            start_time = time.perf_counter()
             contents = await file.read()
             markdown_content = contents.decode('utf-8')
             
@@ -84,6 +87,7 @@ class MarkdownUploadService:
             
             # Update game rule count
             await games_service.update_rule_count(game_info["game_id"], len(chunks))
+            metrics.record_ingest("markdown_upload", len(chunks), time.perf_counter() - start_time)
             
             # Mark as completed
             self.upload_tasks[task_id]["status"] = "completed"
@@ -169,7 +173,6 @@ class MarkdownUploadService:
                         f"{game_id}_{rule_info['category'].lower().replace(' ', '_').replace('→', '_')}"
                     ],
                     "chunk_metadata": {
-                        "tokens": len(self.encoding.encode(chunk_content)),
                         "complexity_score": rule_info['complexity_score'],
                         "mandatory": rule_info['mandatory'],
                         "frequently_referenced": rule_info.get('frequently_referenced', False),
@@ -179,7 +182,7 @@ class MarkdownUploadService:
                     },
                     "created_at": datetime.utcnow()
                 }
-                chunks.append(chunk)
+                chunks.append(prepare_chunk_for_prompt(chunk))
         
         return chunks
 
@@ -225,10 +228,8 @@ class MarkdownUploadService:
     def _split_section_by_tokens(self, section: str, rule_info: Dict[str, Any]) -> List[str]:
         """Split large sections into token-appropriate chunks (250-500 tokens)"""
         
-        tokens = self.encoding.encode(section)
-        
         # If section is within token limit, return as single chunk
-        if len(tokens) <= 500:
+        if count_tokens(section) <= 500:
             return [section]
         
         # Split by subsections (### headers) first
@@ -240,8 +241,8 @@ class MarkdownUploadService:
             if subsection_idx > 0:
                 subsection = "### " + subsection
             
-            subsection_tokens = len(self.encoding.encode(subsection))
-            current_chunk_tokens = len(self.encoding.encode(current_chunk))
+            subsection_tokens = count_tokens(subsection)
+            current_chunk_tokens = count_tokens(current_chunk)
             
             # If adding this subsection would exceed 500 tokens, save current chunk
             if current_chunk and (current_chunk_tokens + subsection_tokens) > 500:
@@ -304,6 +305,7 @@ class MarkdownUploadService:
     async def _process_batch_upload(self, task_id: str, files: List[UploadFile]):
         """Background task for processing batch upload"""
         try:
+            start_time = time.perf_counter()
             all_chunks = []
             games_registered = set()
             
@@ -344,6 +346,7 @@ class MarkdownUploadService:
             for game_id in games_registered:
                 game_chunks = [c for c in all_chunks if c["game_id"] == game_id]
                 await games_service.update_rule_count(game_id, len(game_chunks))
+            metrics.record_ingest("markdown_batch", len(all_chunks), time.perf_counter() - start_time)
             
             # Mark as completed
             self.upload_tasks[task_id]["status"] = "completed"
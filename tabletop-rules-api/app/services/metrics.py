@@ -0,0 +1,263 @@
+# app/services/metrics.py - In-process metrics with a Prometheus text exposition
+from typing import Dict, Any, List, Tuple, Optional
+from contextlib import contextmanager
+from bisect import bisect_left
+from pathlib import Path
+import asyncio
+import json
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "tabletop"
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by route and status code", None),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route", LATENCY_BUCKETS),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being handled", None),
+    "stage_duration_seconds": ("histogram", "Latency of request stages (mongo_read, scoring, context_build, llm_call, serialization)", LATENCY_BUCKETS),
+    "llm_requests_in_flight": ("gauge", "LLM calls currently waiting on the provider", None),
+    "llm_tokens_total": ("counter", "LLM tokens by model and direction (input/output)", None),
+    "embedding_tokens_total": ("counter", "Embedding tokens by model", None),
+    "ingest_chunks_total": ("counter", "Rule chunks stored by ingest source", None),
+    "ingest_duration_seconds": ("histogram", "Time to process one uploaded rulebook", LATENCY_BUCKETS),
+    "ingest_last_chunks_per_second": ("gauge", "Chunks per second of the most recent ingest", None),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)", None),
+    "query_log_dropped_total": ("counter", "Query log entries dropped because the buffer was full or a write failed", None),
+    "query_spelling_corrections_total": ("counter", "Misspelled query words replaced before retrieval", None),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Counters, gauges and histograms aggregated in-process.
+
+    Each uvicorn worker keeps its own registry. When a multiprocess
+    directory is configured, workers periodically write a JSON snapshot
+    there and /metrics merges the snapshots of all workers: counters and
+    histograms are summed (including workers that have exited, so totals
+    never go backwards) and gauges are summed over live workers only.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        self.multiprocess_dir = multiprocess_dir
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters: Dict[Tuple[str, LabelKey], float] = {}
+            self.gauges: Dict[Tuple[str, LabelKey], float] = {}
+            self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def add_gauge(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[name][2] or LATENCY_BUCKETS)
+            histogram.observe(value)
+
+    @contextmanager
+    def track_in_flight(self, name: str, **labels):
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    def record_cache(self, cache: str, hit: bool):
+        self.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+    def record_ingest(self, source: str, chunks: int, duration: float):
+        self.inc("ingest_chunks_total", chunks, source=source)
+        self.observe("ingest_duration_seconds", duration, source=source)
+        if duration > 0:
+            self.set_gauge("ingest_last_chunks_per_second", chunks / duration, source=source)
+
+    # Snapshots and multi-worker aggregation
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "written_at": time.time(),
+                "counters": [[name, list(map(list, key)), value] for (name, key), value in self.counters.items()],
+                "gauges": [[name, list(map(list, key)), value] for (name, key), value in self.gauges.items()],
+                "histograms": [
+                    [name, list(map(list, key)), list(h.buckets), list(h.counts), h.sum, h.count]
+                    for (name, key), h in self.histograms.items()
+                ]
+            }
+
+    def write_snapshot(self):
+        """Write this worker's snapshot to the multiprocess directory (atomic rename)"""
+        if not self.multiprocess_dir:
+            return
+        directory = Path(self.multiprocess_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"metrics_{os.getpid()}.json"
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(temp_path, path)
+
+    async def flush_periodically(self, interval: float):
+        """Keep this worker's snapshot fresh so other workers' /metrics include it"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                print(f"Failed to write metrics snapshot: {e}")
+
+    def _collect_snapshots(self) -> List[Dict[str, Any]]:
+        if not self.multiprocess_dir:
+            return [self.snapshot()]
+        self.write_snapshot()
+        snapshots = []
+        for path in Path(self.multiprocess_dir).glob("metrics_*.json"):
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # Being replaced by its worker right now
+        return snapshots
+
+    def merged(self) -> Dict[str, Any]:
+        """Counters, gauges and histograms merged across workers"""
+        counters: Dict[Tuple[str, LabelKey], float] = {}
+        gauges: Dict[Tuple[str, LabelKey], float] = {}
+        histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+
+        for snapshot in self._collect_snapshots():
+            alive = _pid_alive(snapshot["pid"])
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            if alive:
+                for name, labels, value in snapshot["gauges"]:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, buckets, counts, total, count in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram(tuple(buckets))
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        merged = self.merged()
+        by_name: Dict[str, List] = {}
+        for source in ("counters", "gauges", "histograms"):
+            for (name, key), value in merged[source].items():
+                by_name.setdefault(name, []).append((key, value))
+
+        # Cache hit ratios are derived from the hit/miss counters
+        ratios = _cache_hit_ratios(merged["counters"])
+
+        lines = []
+        for name in sorted(set(METRICS) | set(by_name)):
+            metric_type, help_text, _ = METRICS.get(name, ("untyped", name, None))
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for key, value in sorted(by_name.get(name, []), key=lambda item: item[0]):
+                if metric_type == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(list(value.buckets) + [float("inf")], value.counts):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(value.sum)}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {value.count}")
+                else:
+                    lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+
+        ratio_name = f"{METRIC_PREFIX}_cache_hit_ratio"
+        lines.append(f"# HELP {ratio_name} Share of cache lookups that were hits")
+        lines.append(f"# TYPE {ratio_name} gauge")
+        for cache, ratio in sorted(ratios.items()):
+            lines.append(f'{ratio_name}{{cache="{_escape(cache)}"}} {_format_value(round(ratio, 6))}')
+
+        return "\n".join(lines) + "\n"
+
+def _cache_hit_ratios(counters: Dict[Tuple[str, LabelKey], float]) -> Dict[str, float]:
+    totals: Dict[str, List[float]] = {}
+    for (name, key), value in counters.items():
+        if name != "cache_requests_total":
+            continue
+        labels = dict(key)
+        hits_and_total = totals.setdefault(labels.get("cache", ""), [0, 0])
+        if labels.get("result") == "hit":
+            hits_and_total[0] += value
+        hits_and_total[1] += value
+    return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _create_registry() -> MetricsRegistry:
+    from app.config import settings
+    return MetricsRegistry(settings.metrics_multiprocess_dir)
+
+metrics = _create_registry()
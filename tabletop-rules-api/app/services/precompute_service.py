@@ -0,0 +1,244 @@
+# app/services/precompute_service.py - Batch precomputation of answers for the most asked questions
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import asyncio
+import time
+import uuid
+from pymongo import ReturnDocument
+from app.config import settings
+from app.services.answer_registry import normalize_query
+from app.services.metrics import metrics
+
+RetrieveRules = Callable[[Any, str, str], Awaitable[List[Dict[str, Any]]]]
+
+def normalize_question(query: str) -> str:
+    """Key under which equivalent phrasings of a question are counted and stored"""
+    return " ".join(normalize_query(query))
+
+class PrecomputeService:
+    """LLM answers generated ahead of time for each game's top questions.
+
+    A job takes each game's top N questions from the query log, answers
+    them through AIChatService with bounded concurrency and stores each in
+    `precomputed_answers` tagged with the game's corpus version. Queries
+    are served from there only while the version still matches, and a
+    re-ingest schedules a refresh of the game's stale entries. Warmed
+    games keep their answers in memory, at most `max_warm_games` of them,
+    least recently used evicted first.
+    """
+
+    collection = "precomputed_answers"
+
+    def __init__(self, version_ttl_seconds: float = 30.0, max_warm_games: int = 50):
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_warm_games = max_warm_games
+        self.versions: Dict[str, Tuple[int, float]] = {}  # game_id -> (corpus version, checked_at)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+        self.warm_answers: "OrderedDict[str, Tuple[int, Dict[str, Dict[str, Any]]]]" = OrderedDict()  # game_id -> (version, question -> answer)
+
+    async def ensure_indexes(self, db):
+        await db[self.collection].create_index([("game_id", 1), ("question", 1)], unique=True)
+
+    # Corpus versions
+
+    async def corpus_version(self, db, game_id: str) -> int:
+        cached = self.versions.get(game_id)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.version_ttl_seconds:
+            return cached[0]
+        game = await db.games.find_one({"game_id": game_id}, {"corpus_version": 1})
+        version = (game or {}).get("corpus_version", 0)
+        self.versions[game_id] = (version, now)
+        return version
+
+    async def bump_corpus_version(self, db, game_id: str) -> int:
+        """Mark the game's rules as changed; precomputed answers for older versions stop being served"""
+        game = await db.games.find_one_and_update(
+            {"game_id": game_id},
+            {"$inc": {"corpus_version": 1}},
+            projection={"corpus_version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        self.versions.pop(game_id, None)
+        return (game or {}).get("corpus_version", 0)
+
+    # Serving
+
+    async def lookup(self, db, game_id: str, query: str) -> Optional[Dict[str, Any]]:
+        """The precomputed answer for this question and the current corpus, if any.
+
+        Warmed games are answered from memory; others cost one indexed read.
+        """
+        version = await self.corpus_version(db, game_id)
+        question = normalize_question(query)
+        warm = self.warm_answers.get(game_id)
+        if warm is not None and warm[0] == version:
+            answer = warm[1].get(question)
+            self.warm_answers.move_to_end(game_id)
+        else:
+            if warm is not None:
+                del self.warm_answers[game_id]  # Corpus changed since warming
+            answer = await db[self.collection].find_one(
+                {"game_id": game_id, "question": question, "corpus_version": version},
+                {"_id": 0}
+            )
+        metrics.record_cache("precomputed", answer is not None)
+        return answer
+
+    async def warm(self, db, game_id: str) -> int:
+        """Hold a game's current precomputed answers in memory; returns how many"""
+        version = await self.corpus_version(db, game_id)
+        answers = {
+            doc["question"]: doc
+            async for doc in db[self.collection].find({"game_id": game_id, "corpus_version": version}, {"_id": 0})
+        }
+        self.warm_answers[game_id] = (version, answers)
+        self.warm_answers.move_to_end(game_id)
+        while len(self.warm_answers) > self.max_warm_games:
+            self.warm_answers.popitem(last=False)
+        return len(answers)
+
+    def is_warm(self, game_id: str) -> bool:
+        return game_id in self.warm_answers
+
+    # Batch jobs
+
+    async def top_questions(self, db, game_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Most asked questions of a game according to the query log"""
+        pipeline = [
+            {"$match": {"game_id": game_id, "question": {"$ne": ""}}},
+            {"$group": {"_id": "$question", "query": {"$first": "$query"}, "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": limit}
+        ]
+        return [
+            {"question": row["_id"], "query": row["query"], "count": row["count"]}
+            async for row in db.query_log.aggregate(pipeline)
+        ]
+
+    def start_job(
+        self,
+        db,
+        retrieve: RetrieveRules,
+        game_ids: List[str],
+        top_n: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        questions: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """Run a precompute job in the background; returns its status record"""
+        job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "status": "running",
+            "game_ids": game_ids,
+            "top_n": top_n or settings.precompute_top_n,
+            "concurrency": concurrency or settings.precompute_concurrency,
+            "questions": 0,
+            "generated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "started_at": datetime.utcnow(),
+            "finished_at": None
+        }
+        self.jobs[job["job_id"]] = job
+        while len(self.jobs) > 50:
+            self.jobs.pop(next(iter(self.jobs)))
+        job["task"] = asyncio.create_task(self.run_job(job, db, retrieve, questions))
+        return job
+
+    async def run_job(self, job: Dict[str, Any], db, retrieve: RetrieveRules, questions: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        from app.services.ai_chat_service import ai_chat_service
+        semaphore = asyncio.Semaphore(job["concurrency"])
+
+        async def answer(game_id: str, version: int, entry: Dict[str, Any]):
+            async with semaphore:
+                rules = await retrieve(db, game_id, entry["query"])
+                if not rules:
+                    job["skipped"] += 1
+                    return
+                result = await ai_chat_service.generate_rule_response(entry["query"], game_id, rules)
+                if result.get("error") or not result.get("ai_powered"):
+                    job["failed"] += 1
+                    return
+                document = {
+                    "game_id": game_id,
+                    "question": entry["question"],
+                    "query": entry["query"],
+                    "asked": entry.get("count", 0),
+                    "corpus_version": version,
+                    "response": result["response"],
+                    "usage": result.get("usage", {}),
+                    "sources": [
+                        {"title": rule.get("title"), "category_id": rule.get("category_id")}
+                        for rule in rules[:5]
+                    ],
+                    "created_at": datetime.utcnow()
+                }
+                await db[self.collection].replace_one(
+                    {"game_id": game_id, "question": entry["question"]}, dict(document), upsert=True
+                )
+                warm = self.warm_answers.get(game_id)
+                if warm is not None and warm[0] == version:
+                    warm[1][entry["question"]] = document
+                job["generated"] += 1
+
+        try:
+            for game_id in job["game_ids"]:
+                version = await self.corpus_version(db, game_id)
+                entries = (questions or {}).get(game_id)
+                if entries is None:
+                    entries = await self.top_questions(db, game_id, job["top_n"])
+                current = {
+                    doc["question"]
+                    async for doc in db[self.collection].find(
+                        {"game_id": game_id, "corpus_version": version}, {"question": 1}
+                    )
+                }
+                pending = [entry for entry in entries if entry["question"] not in current]
+                job["questions"] += len(entries)
+                job["skipped"] += len(entries) - len(pending)
+                await asyncio.gather(*(answer(game_id, version, entry) for entry in pending))
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            job["status"] = "cancelled"  # Superseded by a newer refresh, or shutdown
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"Precompute job {job['job_id']} failed: {e}")
+        finally:
+            if job["status"] == "running":
+                job["status"] = "failed"  # Ended by some other BaseException; never leave it running
+            job["finished_at"] = datetime.utcnow()
+
+    def job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {k: v for k, v in job.items() if k != "task"}
+
+    def schedule_refresh(self, db, game_id: str, retrieve: RetrieveRules, delay: Optional[float] = None):
+        """Re-answer a game's stale entries once its rules stop changing.
+
+        Called after an ingest or rule edit; a burst of edits to the same
+        game collapses into a single refresh `delay` seconds after the last.
+        """
+        previous = self._refresh_tasks.get(game_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        wait = settings.precompute_refresh_delay_seconds if delay is None else delay
+        self._refresh_tasks[game_id] = asyncio.create_task(self._refresh_after(db, game_id, retrieve, wait))
+
+    async def _refresh_after(self, db, game_id: str, retrieve: RetrieveRules, delay: float):
+        await asyncio.sleep(delay)
+        self.versions.pop(game_id, None)
+        stale = [
+            {"question": doc["question"], "query": doc["query"], "count": doc.get("asked", 0)}
+            async for doc in db[self.collection].find({"game_id": game_id}, {"question": 1, "query": 1, "asked": 1})
+        ]
+        if stale:
+            job = self.start_job(db, retrieve, [game_id], questions={game_id: stale})
+            await job["task"]
+
+precompute_service = PrecomputeService(max_warm_games=settings.corpus_cache_max_games)
@@ -0,0 +1,127 @@
+# app/services/profiling.py - Per-request stage profiles and Server-Timing headers
+from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import deque
+from datetime import datetime
+import json
+import random
+import threading
+import time
+from app.config import settings
+from app.services.metrics import metrics
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+
+class RequestProfile:
+    """Stage timings collected while one request is handled"""
+
+    __slots__ = ("method", "path", "route", "status_code", "started_at", "start", "duration", "stages")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status_code = None
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.stages: Dict[str, List[float]] = {}  # name -> [total seconds, calls]
+
+    def add(self, name: str, duration: float):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [duration, 1]
+        else:
+            stage[0] += duration
+            stage[1] += 1
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: one metric per stage plus the total"""
+        parts = [f"{name};dur={total * 1000:.1f}" for name, (total, _) in self.stages.items()]
+        if self.duration is not None:
+            parts.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((self.duration or 0) * 1000, 2),
+            "stages": {
+                name: {"duration_ms": round(total * 1000, 2), "calls": calls}
+                for name, (total, calls) in self.stages.items()
+            }
+        }
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request.
+
+    The duration goes to the request's profile (Server-Timing header,
+    request log, slow-request samples) and to the stage histogram on
+    /metrics. Works outside a request too, e.g. in background ingest.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", duration, stage=name)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add(name, duration)
+
+class SlowRequestSampler:
+    """Recent request profiles for the admin slow-request listing.
+
+    A fraction of requests is sampled; requests slower than the slow
+    threshold are always kept. Bounded, so memory stays constant.
+    """
+
+    def __init__(self, size: int, sample_rate: float, slow_seconds: float):
+        self.profiles = deque(maxlen=size)
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self._lock = threading.Lock()
+
+    def offer(self, profile: RequestProfile):
+        if profile.duration < self.slow_seconds and random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            self.profiles.append(profile)
+
+    def slowest(self, limit: int = 20, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self.profiles)
+        if route:
+            profiles = [p for p in profiles if p.route == route]
+        profiles.sort(key=lambda p: p.duration, reverse=True)
+        return [p.to_dict() for p in profiles[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self.profiles.clear()
+
+slow_requests = SlowRequestSampler(
+    size=settings.profile_buffer_size,
+    sample_rate=settings.profile_sample_rate,
+    slow_seconds=settings.profile_slow_request_ms / 1000
+)
+
+def start_request_profile(method: str, path: str) -> RequestProfile:
+    profile = RequestProfile(method, path)
+    _current_profile.set(profile)
+    return profile
+
+def finish_request_profile(profile: RequestProfile, route: str, status_code: int):
+    """Close the profile, keep it if sampled and write the optional log line"""
+    profile.duration = time.perf_counter() - profile.start
+    profile.route = route
+    profile.status_code = status_code
+    slow_requests.offer(profile)
+    if settings.request_profile_log:
+        print(json.dumps({"event": "request_profile", **profile.to_dict()}))
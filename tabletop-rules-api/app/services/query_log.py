@@ -0,0 +1,162 @@
+# app/services/query_log.py - Buffered log of chat queries, written to MongoDB in batches
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.precompute_service import normalize_question
+
+class QueryLog:
+    """Every chat query, appended to an in-memory buffer and flushed in batches.
+
+    `record` never waits on MongoDB: entries go into a bounded buffer and
+    the background flusher writes them with unordered `insert_many`. When
+    the buffer is full (a slow or unreachable database) new entries are
+    dropped and counted rather than slowing requests down.
+    """
+
+    def __init__(self, max_buffer: int = 10000, batch_size: int = 500):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.written = 0
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def record(
+        self,
+        game_id: str,
+        query: str,
+        path: str,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        latency: Optional[float] = None,
+        user_id: Optional[str] = None,
+        conversation_id: Optional[str] = None
+    ):
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            metrics.inc("query_log_dropped_total")
+            return
+        self.buffer.append({
+            "game_id": game_id,
+            "query": query,
+            "question": normalize_question(query),
+            "path": path,
+            "result_count": len(rules or []),
+            "retrieval_ids": [str(rule["_id"]) for rule in (rules or [])[:5] if rule.get("_id") is not None],
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "created_at": datetime.utcnow()
+        })
+        if len(self.buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self, db) -> int:
+        """Write buffered entries in batches; a failed batch is dropped, not retried"""
+        if db is None or not self.buffer:
+            return 0
+        entries, self.buffer = self.buffer, []
+        written = 0
+        for start in range(0, len(entries), self.batch_size):
+            batch = entries[start:start + self.batch_size]
+            try:
+                await db.query_log.insert_many(batch, ordered=False)
+                written += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                metrics.inc("query_log_dropped_total", len(batch))
+                print(f"Failed to write {len(batch)} query log entries: {e}")
+        self.written += written
+        return written
+
+    async def flush_periodically(self, get_db, interval: float):
+        """Flush every `interval` seconds, or as soon as a full batch is buffered"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush(get_db())
+
+    def stats(self) -> Dict[str, int]:
+        return {"buffered": len(self.buffer), "written": self.written, "dropped": self.dropped}
+
+async def ensure_query_log_indexes(db, retention_days: int):
+    await db.query_log.create_index([("game_id", 1), ("created_at", -1)])
+    if retention_days > 0:
+        await db.query_log.create_index("created_at", expireAfterSeconds=int(timedelta(days=retention_days).total_seconds()))
+
+def _since(days: float) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+async def top_queries(db, game_id: Optional[str] = None, days: float = 7, limit: int = 20, zero_results: bool = False) -> List[Dict[str, Any]]:
+    """Most frequent normalized questions, optionally only those that found no rules"""
+    match: Dict[str, Any] = {"created_at": {"$gte": _since(days)}}
+    if game_id:
+        match["game_id"] = game_id
+    if zero_results:
+        match["result_count"] = 0
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"game_id": "$game_id", "question": "$question"},
+            "count": {"$sum": 1},
+            "query": {"$first": "$query"},
+            "avg_latency_ms": {"$avg": "$latency_ms"},
+            "last_asked": {"$max": "$created_at"}
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]
+    return [
+        {
+            "game_id": row["_id"]["game_id"],
+            "question": row["_id"]["question"],
+            "query": row["query"],
+            "count": row["count"],
+            "avg_latency_ms": round(row["avg_latency_ms"], 1) if row.get("avg_latency_ms") is not None else None,
+            "last_asked": row["last_asked"]
+        }
+        async for row in db.query_log.aggregate(pipeline)
+    ]
+
+async def latency_by_game(db, days: float = 7) -> List[Dict[str, Any]]:
+    """Query counts, latency and answer paths per game"""
+    pipeline = [
+        {"$match": {"created_at": {"$gte": _since(days)}}},
+        {"$group": {
+            "_id": {"game_id": "$game_id", "path": "$path"},
+            "count": {"$sum": 1},
+            "avg_latency_ms": {"$avg": "$latency_ms"},
+            "max_latency_ms": {"$max": "$latency_ms"}
+        }}
+    ]
+    games: Dict[str, Dict[str, Any]] = {}
+    async for row in db.query_log.aggregate(pipeline):
+        game = games.setdefault(row["_id"]["game_id"], {"game_id": row["_id"]["game_id"], "queries": 0, "latency_sum": 0.0, "max_latency_ms": 0.0, "paths": {}})
+        game["queries"] += row["count"]
+        game["latency_sum"] += (row.get("avg_latency_ms") or 0) * row["count"]
+        game["max_latency_ms"] = max(game["max_latency_ms"], row.get("max_latency_ms") or 0)
+        game["paths"][row["_id"]["path"]] = row["count"]
+    return sorted(
+        (
+            {
+                "game_id": game["game_id"],
+                "queries": game["queries"],
+                "avg_latency_ms": round(game["latency_sum"] / game["queries"], 1) if game["queries"] else None,
+                "max_latency_ms": game["max_latency_ms"],
+                "paths": game["paths"]
+            }
+            for game in games.values()
+        ),
+        key=lambda game: game["queries"],
+        reverse=True
+    )
+
+query_log = QueryLog(
+    max_buffer=settings.query_log_max_buffer,
+    batch_size=settings.query_log_batch_size
+)
@@ -0,0 +1,53 @@
+# app/services/retrieval_cache.py - Per-conversation cache of retrieved rule candidates
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import time
+from app.config import settings
+from app.services.metrics import metrics
+
+class RetrievalCache:
+    """Candidate rule sets of recent conversations, for follow-up questions.
+
+    Entries expire `ttl_seconds` after their last use and the least
+    recently used conversation is evicted past `max_entries`, so memory
+    is bounded by max_entries x candidates per worker.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str], game_id: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is not None and (entry["expires_at"] < time.monotonic() or entry["game_id"] != game_id):
+            del self.entries[key]
+            entry = None
+        metrics.record_cache("retrieval", entry is not None)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[str, str], game_id: str, query: str, rules: List[Dict[str, Any]]):
+        self.entries[key] = {
+            "game_id": game_id,
+            "query": query,
+            "rules": rules,
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate_game(self, game_id: str):
+        """Drop cached candidates of a game whose rules changed"""
+        for key in [k for k, entry in self.entries.items() if entry["game_id"] == game_id]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+retrieval_cache = RetrievalCache(
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+    max_entries=settings.retrieval_cache_max_conversations
+)
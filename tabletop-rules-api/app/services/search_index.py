@@ -0,0 +1,292 @@
+# app/services/search_index.py - In-process inverted index for keyword search over a game's rules
+from typing import Dict, Any, List, Optional, Tuple
+from bisect import bisect_left
+import asyncio
+import heapq
+import html
+import math
+import re
+from app.config import settings
+from app.services.corpus_cache import CorpusCache, corpus_cache
+from app.services.profiling import span
+
+FIELD_WEIGHTS = {"title": 3.0, "content": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 64
+SNIPPET_CHARS = 200
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+def stem(token: str) -> str:
+    """Fold simple plurals ("pawns" -> "pawn"); a stem is always a prefix of its word"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """(term, start, end) for each word, offsets into the original text"""
+    return [(stem(m.group().lower()), m.start(), m.end()) for m in _TOKEN_PATTERN.finditer(text)]
+
+def parse_query(q: str) -> List[Tuple[str, List[str]]]:
+    """Clauses of a query: ("phrase", terms) for quoted text, ("prefix", [p]) for word*, else ("term", [t])"""
+    clauses = []
+    for match in _QUERY_PATTERN.finditer(q):
+        if match.group(1) is not None:
+            terms = [term for term, _, _ in tokenize(match.group(1))]
+            if len(terms) > 1:
+                clauses.append(("phrase", terms))
+            elif terms:
+                clauses.append(("term", terms))
+            continue
+        word = match.group(2)
+        terms = [term for term, _, _ in tokenize(word)]
+        if not terms:
+            continue
+        if word.endswith("*"):
+            clauses.extend(("term", [term]) for term in terms[:-1])
+            clauses.append(("prefix", [terms[-1]]))
+        elif len(terms) > 1:
+            clauses.append(("phrase", terms))  # "en-passant" must match the two words together
+        else:
+            clauses.append(("term", terms))
+    return clauses
+
+class RuleIndex:
+    """Positional inverted index over the title and content of one game's rules.
+
+    Scoring is BM25 per field with titles weighted above content, scaled
+    by the share of query clauses a rule matches. Quoted phrases are
+    required; bare words and prefixes (word*) are optional but every rule
+    must match at least one clause. Lookups touch only the postings of the
+    query's terms, so cost does not grow with the number of rules.
+    Searches can score against other corpus statistics (see pooled_stats)
+    so that hits from several games share one scale.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = rules
+        self.postings: Dict[str, Dict[str, Dict[int, List[int]]]] = {field: {} for field in FIELD_WEIGHTS}  # field -> term -> rule -> positions
+        self.spans: Dict[str, List[List[Tuple[int, int]]]] = {field: [] for field in FIELD_WEIGHTS}  # field -> rule -> offsets by position
+        self.document_frequency: Dict[str, int] = {}
+        for field in FIELD_WEIGHTS:
+            for doc, rule in enumerate(rules):
+                tokens = tokenize(rule.get(field) or "")
+                self.spans[field].append([(start, end) for _, start, end in tokens])
+                for position, (term, _, _) in enumerate(tokens):
+                    self.postings[field].setdefault(term, {}).setdefault(doc, []).append(position)
+        for term in set().union(*(self.postings[field] for field in FIELD_WEIGHTS)):
+            self.document_frequency[term] = len(set().union(*(self.postings[field].get(term, {}) for field in FIELD_WEIGHTS)))
+        self.vocabulary = sorted(self.document_frequency)
+        self.average_length = {
+            field: (sum(len(spans) for spans in self.spans[field]) / len(rules)) if rules else 0.0
+            for field in FIELD_WEIGHTS
+        }
+        self.stats = {"rules": len(rules), "document_frequency": self.document_frequency, "average_length": self.average_length}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        terms = []
+        index = bisect_left(self.vocabulary, prefix)
+        while index < len(self.vocabulary) and self.vocabulary[index].startswith(prefix) and len(terms) < MAX_PREFIX_EXPANSIONS:
+            terms.append(self.vocabulary[index])
+            index += 1
+        return terms
+
+    def _idf(self, term: str, stats: Dict[str, Any]) -> float:
+        df = stats["document_frequency"].get(term, 0)
+        return math.log(1 + (stats["rules"] - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, field: str, doc: int, frequency: int, idf: float, stats: Dict[str, Any]) -> float:
+        length = len(self.spans[field][doc])
+        norm = 1 - BM25_B + BM25_B * length / (stats["average_length"][field] or 1)
+        return FIELD_WEIGHTS[field] * idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+
+    def _phrase_positions(self, field: str, terms: List[str]) -> Dict[int, List[int]]:
+        """Rule -> start positions of the phrase in this field"""
+        postings = [self.postings[field].get(term, {}) for term in terms]
+        found = {}
+        for doc in set(postings[0]).intersection(*postings[1:]):
+            later = [set(p[doc]) for p in postings[1:]]
+            starts = [pos for pos in postings[0][doc] if all(pos + i + 1 in positions for i, positions in enumerate(later))]
+            if starts:
+                found[doc] = starts
+        return found
+
+    def search(self, q: str, limit: int = 10, stats: Optional[Dict[str, Any]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """(total matches, top hits); each hit has rule, score and matched offsets per field"""
+        stats = stats or self.stats
+        clauses = parse_query(q)
+        scores: Dict[int, float] = {}
+        matched_clauses: Dict[int, int] = {}
+        matches: Dict[int, Dict[str, List[Tuple[int, int]]]] = {}
+        required: Optional[set] = None
+
+        for kind, terms in clauses:
+            clause_docs = set()
+            if kind == "phrase":
+                idf = sum(self._idf(term, stats) for term in terms)
+                for field in FIELD_WEIGHTS:
+                    for doc, starts in self._phrase_positions(field, terms).items():
+                        clause_docs.add(doc)
+                        scores[doc] = scores.get(doc, 0.0) + self._bm25(field, doc, len(starts), idf, stats)
+                        spans = self.spans[field][doc]
+                        matches.setdefault(doc, {}).setdefault(field, []).extend(
+                            (spans[start][0], spans[start + len(terms) - 1][1]) for start in starts
+                        )
+                required = clause_docs if required is None else required & clause_docs
+            else:
+                expanded = self.expand_prefix(terms[0]) if kind == "prefix" else terms
+                for term in expanded:
+                    idf = self._idf(term, stats)
+                    for field in FIELD_WEIGHTS:
+                        for doc, positions in self.postings[field].get(term, {}).items():
+                            clause_docs.add(doc)
+                            scores[doc] = scores.get(doc, 0.0) + self._bm25(field, doc, len(positions), idf, stats)
+                            spans = self.spans[field][doc]
+                            matches.setdefault(doc, {}).setdefault(field, []).extend(spans[pos] for pos in positions)
+            for doc in clause_docs:
+                matched_clauses[doc] = matched_clauses.get(doc, 0) + 1
+
+        docs = set(scores) if required is None else required
+        ranked = heapq.nsmallest(
+            limit, docs,
+            key=lambda doc: (-scores[doc] * matched_clauses[doc] / len(clauses), doc)
+        )
+        return len(docs), [
+            {
+                "rule": self.rules[doc],
+                "score": round(scores[doc] * matched_clauses[doc] / len(clauses), 4),
+                "matches": {field: sorted(set(spans)) for field, spans in matches.get(doc, {}).items()}
+            }
+            for doc in ranked
+        ]
+
+def pooled_stats(indexes: List[RuleIndex], q: str) -> Dict[str, Any]:
+    """Corpus statistics of several indexes taken as one corpus, for the query's terms.
+
+    BM25 scores depend on the corpus they are computed against: a word
+    that is rare in one game and common in another gets very different
+    idf. Scoring every game against the pooled rule count, document
+    frequencies and field lengths puts their hits on one scale.
+    """
+    terms = set()
+    for kind, clause_terms in parse_query(q):
+        for index in indexes:
+            terms.update(index.expand_prefix(clause_terms[0]) if kind == "prefix" else clause_terms)
+    rules = sum(len(index) for index in indexes)
+    return {
+        "rules": rules,
+        "document_frequency": {term: sum(index.document_frequency.get(term, 0) for index in indexes) for term in terms},
+        "average_length": {
+            field: (sum(index.average_length[field] * len(index) for index in indexes) / rules) if rules else 0.0
+            for field in FIELD_WEIGHTS
+        }
+    }
+
+def highlight(text: str, spans: List[Tuple[int, int]], max_chars: Optional[int] = None) -> str:
+    """HTML-escaped text with matched spans wrapped in <mark>; trimmed to a window around the first match"""
+    start, end = 0, len(text)
+    if max_chars is not None and len(text) > max_chars:
+        first = spans[0][0] if spans else 0
+        start = max(0, min(first - max_chars // 4, len(text) - max_chars))
+        space = text.rfind(" ", 0, start + 1)
+        start = space + 1 if start > 0 and space >= 0 else start
+        end = min(len(text), start + max_chars)
+    parts = ["..." if start > 0 else ""]
+    position = start
+    for span_start, span_end in spans:
+        if span_start < position or span_end > end:
+            continue
+        parts.append(html.escape(text[position:span_start]))
+        parts.append(f"<mark>{html.escape(text[span_start:span_end])}</mark>")
+        position = span_end
+    parts.append(html.escape(text[position:end]))
+    if end < len(text):
+        parts.append("...")
+    return "".join(parts)
+
+class SearchIndexes:
+    """A RuleIndex per recently searched game, rebuilt when its corpus reloads.
+
+    Rules come from the shared corpus cache, so an index covers the whole
+    game and follows the same corpus_version checks and invalidation as
+    the query path without holding a second copy of the rules.
+    """
+
+    def __init__(self, corpus: CorpusCache):
+        self.corpus = corpus
+        self.indexes: Dict[str, Tuple[List[Dict[str, Any]], RuleIndex]] = {}
+
+    async def get(self, db, game_id: str) -> RuleIndex:
+        rules = await self.corpus.get_rules(db, game_id)
+        cached = self.indexes.get(game_id)
+        if cached is not None and cached[0] is rules:
+            return cached[1]
+        with span("search_index_build"):
+            index = await asyncio.to_thread(RuleIndex, rules)  # Large games take a while; keep the event loop free
+        self.indexes[game_id] = (rules, index)
+        for stale in [g for g in self.indexes if not self.corpus.is_warm(g)]:
+            del self.indexes[stale]
+        return index
+
+    def invalidate(self, game_id: str):
+        self.corpus.invalidate(game_id)
+        self.indexes.pop(game_id, None)
+
+async def federated_search(db, game_ids: List[str], q: str, limit: int = 10, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Search several games at once and merge their hits into one global top `limit`.
+
+    Games' indexes are loaded concurrently; a game whose index is not
+    ready within `timeout` is reported instead of waited for, and its
+    build finishes in the background so the next search can use it.
+    Searching is pure Python, so the games are then searched one after
+    another in a single worker thread, which keeps the event loop free
+    but costs the sum of the games' search times. Searching gets its own
+    `timeout`: games not reached by then are reported too and the thread
+    stops, so no search is left running once the response is sent.
+    Every game is scored against statistics pooled over all the games
+    searched, so a heap can merge their hits on score directly.
+    """
+    loads = await asyncio.gather(
+        *(asyncio.wait_for(asyncio.shield(search_indexes.get(db, game_id)), timeout) for game_id in game_ids),
+        return_exceptions=True
+    )
+    failed: Dict[str, str] = {}
+    shards: List[Tuple[int, str, RuleIndex]] = []
+    for order, (game_id, loaded) in enumerate(zip(game_ids, loads)):
+        if isinstance(loaded, BaseException):
+            failed[game_id] = "timeout" if isinstance(loaded, asyncio.TimeoutError) else str(loaded)
+        else:
+            shards.append((order, game_id, loaded))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+
+    def search_shards() -> List[Tuple[int, str, Tuple[int, List[Dict[str, Any]]]]]:
+        stats = pooled_stats([index for _, _, index in shards], q)
+        results = []
+        for order, game_id, index in shards:
+            if deadline is not None and loop.time() >= deadline:
+                failed[game_id] = "timeout"
+                continue
+            results.append((order, game_id, index.search(q, limit=limit, stats=stats)))
+        return results
+
+    per_game: Dict[str, int] = {}
+    candidates = []
+    for order, game_id, (total, hits) in await asyncio.to_thread(search_shards):
+        if total:
+            per_game[game_id] = total
+        candidates.extend((hit["score"], -order, -rank, game_id, hit) for rank, hit in enumerate(hits))
+    top = heapq.nlargest(limit, candidates, key=lambda candidate: candidate[:3])
+    return {
+        "hits": [{**hit, "game_id": game_id} for _, _, _, game_id, hit in top],
+        "total_found": sum(per_game.values()),
+        "per_game": per_game,
+        "failed": failed
+    }
+
+search_indexes = SearchIndexes(corpus_cache)
@@ -0,0 +1,158 @@
+# app/services/spelling.py - Typo correction of query terms against each game's vocabulary
+from typing import Dict, Any, List, Optional, Set, Tuple
+import asyncio
+import re
+from app.services.corpus_cache import CorpusCache, corpus_cache
+from app.services.metrics import metrics
+from app.services.profiling import span
+
+PREFIX_LENGTH = 7
+MIN_WORD_LENGTH = 5  # Shorter words have too many neighbours to correct safely
+LONG_WORD_LENGTH = 8  # From here on two edits are allowed instead of one
+
+# Everyday question words that may be absent from a rulebook but must never be "corrected"
+COMMON_WORDS = {
+    "what", "when", "where", "which", "while", "whom", "whose", "does", "doing", "done", "have", "having",
+    "that", "this", "these", "those", "there", "their", "they", "them", "then", "than", "with", "without",
+    "from", "into", "onto", "about", "after", "before", "would", "could", "should", "your", "yours", "mine",
+    "some", "many", "much", "more", "most", "also", "just", "only", "even", "ever", "very", "here", "like",
+    "need", "want", "know", "happen", "happens", "really", "still", "other", "each", "every", "anyone",
+    "someone", "something", "anything", "allowed", "possible", "explain", "please", "thanks", "okay",
+    "work", "works", "working", "worked", "mean", "means", "meant", "happened", "wondering", "confused"
+}
+
+_WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+def edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Optimal string alignment distance (transpositions count as one edit), or None past max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return None
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """The word and every string reachable by deleting up to `distance` characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        found |= frontier
+    return found
+
+class SymSpell:
+    """Symmetric delete spelling dictionary.
+
+    Every vocabulary word is indexed under the strings left after deleting
+    up to `max_distance` characters from its first PREFIX_LENGTH letters.
+    A misspelling is looked up the same way, so candidates come from a few
+    dictionary probes and only those are checked with a real edit distance.
+    """
+
+    def __init__(self, words: Dict[str, int], max_distance: int = 2):
+        self.words = words
+        self.max_distance = max_distance
+        self.index: Dict[str, List[str]] = {}
+        for word in words:
+            for variant in deletes(word[:PREFIX_LENGTH], max_distance):
+                self.index.setdefault(variant, []).append(word)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def lookup(self, term: str, max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """(closest word, distance); ties go to the more frequent word"""
+        if term in self.words:
+            return term, 0
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        best: Optional[Tuple[int, int, str]] = None
+        checked = set()
+        for variant in deletes(term[:PREFIX_LENGTH], limit):
+            for candidate in self.index.get(variant, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                distance = edit_distance(term, candidate, limit)
+                if distance is None:
+                    continue
+                key = (distance, -self.words[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return (best[2], best[0]) if best else None
+
+    def correct(self, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Lower-cased text with unknown words replaced by their closest vocabulary word"""
+        corrections: List[Dict[str, Any]] = []
+
+        def replace(match: "re.Match") -> str:
+            word = match.group()
+            if len(word) < MIN_WORD_LENGTH or word in COMMON_WORDS or word in self.words:
+                return word
+            found = self.lookup(word, 1 if len(word) < LONG_WORD_LENGTH else 2)
+            if found is None or found[0].startswith(word):
+                return word  # "explore" already matches "explores"
+            corrections.append({"from": word, "to": found[0], "distance": found[1]})
+            return found[0]
+
+        corrected = _WORD_PATTERN.sub(replace, text.lower())
+        return corrected, corrections
+
+def build_vocabulary(rules: List[Dict[str, Any]], boost_rules: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Word frequencies over the rules' titles and content plus the game's boost rule terms"""
+    words: Dict[str, int] = {}
+    texts = [f"{rule.get('title') or ''} {rule.get('content') or ''}" for rule in rules]
+    for group in ("entities", "keywords"):
+        for item in (boost_rules or {}).get(group, []):
+            texts.append(" ".join([item["term"], *item.get("synonyms", []), *item.get("phrases", [])]))
+    for text in texts:
+        for word in _WORD_PATTERN.findall(text.lower()):
+            if len(word) >= 3:
+                words[word] = words.get(word, 0) + 1
+    return words
+
+class SpellingIndexes:
+    """A SymSpell dictionary per game, rebuilt when its rules or boost rules change.
+
+    Shares the corpus cache like the search and typeahead indexes, so it
+    is built at ingest by the ingesting worker and on first use elsewhere.
+    """
+
+    def __init__(self, corpus: CorpusCache):
+        self.corpus = corpus
+        self.indexes: Dict[str, Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], SymSpell]] = {}
+
+    async def get(self, db, game_id: str) -> SymSpell:
+        from app.services.boost_rules import boost_registry
+
+        rules = await self.corpus.get_rules(db, game_id)
+        await boost_registry.refresh(db, game_id)
+        config = boost_registry.entries.get(game_id, {}).get("config")
+        cached = self.indexes.get(game_id)
+        if cached is not None and cached[0] is rules and cached[1] is config:
+            return cached[2]
+        with span("spelling_build"):
+            speller = await asyncio.to_thread(lambda: SymSpell(build_vocabulary(rules, config)))  # Keep the event loop free while it builds
+        self.indexes[game_id] = (rules, config, speller)
+        for stale in [g for g in self.indexes if not self.corpus.is_warm(g)]:
+            del self.indexes[stale]
+        return speller
+
+    async def correct(self, db, game_id: str, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        speller = await self.get(db, game_id)
+        with span("spelling"):
+            corrected, corrections = speller.correct(text)
+        if corrections:
+            metrics.inc("query_spelling_corrections_total", len(corrections))
+        return corrected, corrections
+
+spelling_indexes = SpellingIndexes(corpus_cache)
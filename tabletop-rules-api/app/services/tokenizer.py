@@ -0,0 +1,35 @@
+# app/services/tokenizer.py - Shared tiktoken encoding for token counting
+from typing import Optional
+
+ENCODING_NAME = "cl100k_base"  # GPT-4 / GPT-4o-mini encoding
+CHARS_PER_TOKEN = 4  # cl100k_base averages ~4 characters per token on English text
+
+_encoding = None
+_encoding_unavailable = False
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for text that has no stored token count"""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+def get_encoding():
+    """Load the tiktoken encoding once; None if it cannot be loaded (e.g. offline)"""
+    global _encoding, _encoding_unavailable
+
+    if _encoding is None and not _encoding_unavailable:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            _encoding_unavailable = True
+            print(f"tiktoken encoding unavailable ({e}), falling back to estimated token counts")
+
+    return _encoding
+
+def count_tokens(text: Optional[str]) -> int:
+    """Exact token count for text, estimated if the encoding cannot be loaded"""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
@@ -0,0 +1,149 @@
+# app/services/typeahead.py - Per-game prefix index of rule titles, headings and key terms
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+from bisect import bisect_left
+import re
+from app.services.corpus_cache import CorpusCache, corpus_cache
+from app.services.profiling import span
+
+KIND_WEIGHTS = {"title": 3, "term": 2, "heading": 1}
+METADATA_LABELS = {"category", "complexity", "mandatory"}
+MAX_SCAN = 256  # Keys examined per lookup, so short prefixes stay cheap
+MAX_QUERY_WORDS = 3  # Trailing words of the query tried as the prefix
+
+_PART_SUFFIX = re.compile(r"\s*\(Part \d+\)$")
+_HEADING_PATTERN = re.compile(r"^#{2,3}\s+(.+?)\s*#*$", re.MULTILINE)
+_DEFINITION_PATTERN = re.compile(r"\*\*([^*\n]{2,40}?)\*\*\s*[:–—-]")
+_WORD_PATTERN = re.compile(r"\S+")
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def clean_heading(text: str) -> str:
+    text = _PART_SUFFIX.sub("", text.strip())
+    return text[6:] if text.startswith("Rule: ") else text
+
+def extract_suggestions(rules: List[Dict[str, Any]], boost_rules: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Titles, ##/### headings and defined key terms, one entry per distinct text.
+
+    Key terms are bold definitions in the rules ("**Ambush**: ...") plus the
+    terms and phrases of the game's boost rules. An entry's weight is its
+    best kind plus how many rules it appears in.
+    """
+    found: Dict[str, Dict[str, Any]] = {}
+
+    def add(text: str, kind: str):
+        text = text.strip().strip(":").strip()
+        key = normalize(text)
+        if len(key) < 2 or key in METADATA_LABELS:
+            return
+        entry = found.setdefault(key, {"text": text, "kind": kind, "count": 0})
+        entry["count"] += 1
+        if KIND_WEIGHTS[kind] > KIND_WEIGHTS[entry["kind"]]:
+            entry.update(text=text, kind=kind)
+
+    for rule in rules:
+        add(clean_heading(rule.get("title") or ""), "title")
+        content = rule.get("content") or ""
+        for heading in _HEADING_PATTERN.findall(content):
+            add(clean_heading(heading), "heading")
+        for term in _DEFINITION_PATTERN.findall(content):
+            add(term, "term")
+    for group in ("entities", "keywords"):
+        for item in (boost_rules or {}).get(group, []):
+            add(item["term"], "term")
+            for phrase in item.get("phrases", []):
+                add(phrase, "term")
+    return [
+        {"text": entry["text"], "kind": entry["kind"], "weight": KIND_WEIGHTS[entry["kind"]] + entry["count"]}
+        for entry in found.values()
+    ]
+
+class PrefixIndex:
+    """Sorted array of suggestion keys searched with binary search.
+
+    Every suggestion is keyed at each of its word starts, so "pass"
+    finds "En Passant" as well as "Passed Pawn".
+    """
+
+    def __init__(self, suggestions: List[Dict[str, Any]]):
+        self.suggestions = suggestions
+        keys = []
+        for index, suggestion in enumerate(suggestions):
+            words = normalize(suggestion["text"]).split(" ")
+            for start in range(len(words)):
+                keys.append((" ".join(words[start:]), start, index))
+        keys.sort()
+        self.keys = [key for key, _, _ in keys]
+        self.targets = [(start, index) for _, start, index in keys]
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    def lookup(self, prefix: str) -> Dict[int, bool]:
+        """Suggestion index -> whether the prefix matched its first word"""
+        found: Dict[int, bool] = {}
+        position = bisect_left(self.keys, prefix)
+        end = min(len(self.keys), position + MAX_SCAN)
+        while position < end and self.keys[position].startswith(prefix):
+            start, index = self.targets[position]
+            found[index] = found.get(index, False) or start == 0
+            position += 1
+        return found
+
+    def complete(self, q: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Suggestions completing the end of the query.
+
+        The last MAX_QUERY_WORDS words are tried as a prefix, longest
+        first; `replace_from` is the offset in `q` the suggestion replaces.
+        """
+        words = list(_WORD_PATTERN.finditer(q))
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for count in range(min(MAX_QUERY_WORDS, len(words)), 0, -1):
+            replace_from = words[-count].start()
+            prefix = normalize(q[replace_from:])
+            found = self.lookup(prefix)
+            ranked = sorted(
+                found,
+                key=lambda index: (not found[index], -self.suggestions[index]["weight"], len(self.suggestions[index]["text"]))
+            )
+            for index in ranked:
+                if index in seen:
+                    continue
+                seen.add(index)
+                suggestion = self.suggestions[index]
+                results.append({"text": suggestion["text"], "kind": suggestion["kind"], "replace_from": replace_from})
+                if len(results) >= limit:
+                    return results
+        return results
+
+class TypeaheadIndexes:
+    """A PrefixIndex per game, rebuilt when its rules or boost rules change.
+
+    Shares the corpus cache, so an ingest's invalidation also
+    retires the game's index; the ingesting worker rebuilds it right away
+    and other workers on their next keystroke.
+    """
+
+    def __init__(self, corpus: CorpusCache):
+        self.corpus = corpus
+        self.indexes: Dict[str, Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], PrefixIndex]] = {}
+
+    async def get(self, db, game_id: str) -> PrefixIndex:
+        from app.services.boost_rules import boost_registry
+
+        rules = await self.corpus.get_rules(db, game_id)
+        await boost_registry.refresh(db, game_id)
+        config = boost_registry.entries.get(game_id, {}).get("config")
+        cached = self.indexes.get(game_id)
+        if cached is not None and cached[0] is rules and cached[1] is config:
+            return cached[2]
+        with span("typeahead_build"):
+            index = await asyncio.to_thread(lambda: PrefixIndex(extract_suggestions(rules, config)))  # Keep the event loop free while it builds
+        self.indexes[game_id] = (rules, config, index)
+        for stale in [g for g in self.indexes if not self.corpus.is_warm(g)]:
+            del self.indexes[stale]
+        return index
+
+typeahead_indexes = TypeaheadIndexes(corpus_cache)
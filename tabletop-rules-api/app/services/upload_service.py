@@ -1,16 +1,21 @@
 # app/services/upload_service.py - Simple Markdown upload service
 import frontmatter
 import re
+import time
 from typing import Dict, List, Any
 from datetime import datetime
 from app.database import get_database
 from app.services.ai_service import ai_service
+from app.services.context_packer import prepare_chunk_for_prompt
+from app.services.metrics import metrics
 
 class UploadService:
     
     async def process_markdown_file(self, content: str, filename: str) -> Dict[str, Any]:
         """Process a markdown file and store rules in database"""
         
+        start_time = time.perf_counter()
+        
         # Parse frontmatter
         post = frontmatter.loads(content)
         
@@ -42,6 +47,7 @@ class UploadService:
         
         # Update game rule count
         await self._update_game_rule_count(game_id, stored_chunks)
+        metrics.record_ingest("upload_service", stored_chunks, time.perf_counter() - start_time)
         
         return {
             "game_id": game_id,
@@ -130,7 +136,7 @@ class UploadService:
                 },
                 "created_at": datetime.utcnow()
             }
-            chunks.append(chunk)
+            chunks.append(prepare_chunk_for_prompt(chunk))
         
         return chunks
     
@@ -0,0 +1,219 @@
+# app/services/usage_tracker.py - Constant-time LLM usage accounting with minute rollups in MongoDB
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from datetime import datetime, timedelta
+import asyncio
+import time
+
+class UsageTracker:
+    """Running usage counters plus a bounded buffer of recent calls.
+
+    Every call updates the totals, a 24-slot hourly ring (for `last_24h`)
+    and a pending minute rollup keyed by (minute, game, model). Pending
+    rollups are written to MongoDB in one batched bulk write per flush;
+    each write $inc's the shared documents, so the stored rollups and the
+    `usage_totals` document cover every worker in the fleet. Rollups that
+    were written but whose totals update failed are held separately, so a
+    retry adds them to the totals without writing the rollups twice.
+    """
+
+    TOTALS_ID = "all"
+
+    def __init__(self, recent_size: int = 100):
+        self.recent_size = recent_size
+        self.reset()
+
+    def reset(self, entries: Optional[List[Dict[str, Any]]] = None):
+        """Clear the counters, optionally re-seeding them from log entries"""
+        self.recent = deque(maxlen=self.recent_size)
+        self.totals = _empty_counters()
+        self.by_model: Dict[str, Dict[str, float]] = {}
+        self.by_game: Dict[str, Dict[str, float]] = {}
+        self.hourly = deque(maxlen=24)  # [hour start (epoch seconds), requests]
+        self.pending: Dict[Tuple[datetime, str, str], Dict[str, float]] = {}
+        self.pending_totals = _empty_counters()  # Written to the rollups, not yet to usage_totals
+        for entry in entries or []:
+            self.record(
+                entry["model"], entry["input_tokens"], entry["output_tokens"], entry["estimated_cost"],
+                game_id=entry.get("game_id"), latency=entry.get("latency"), entry=entry
+            )
+        self.pending.clear()  # Re-seeded entries were already flushed when first recorded
+        self.pending_totals = _empty_counters()
+
+    def record(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        game_id: Optional[str] = None,
+        latency: Optional[float] = None,
+        entry: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        now = datetime.now()
+        if entry is None:
+            entry = {
+                "timestamp": now.isoformat(),
+                "model": model,
+                "game_id": game_id,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "estimated_cost": cost,
+                "latency": latency
+            }
+        self.recent.append(entry)
+
+        for counters in (self.totals, self.by_model.setdefault(model, _empty_counters()), self.by_game.setdefault(game_id or "unknown", _empty_counters())):
+            counters["requests"] += 1
+            counters["input_tokens"] += input_tokens
+            counters["output_tokens"] += output_tokens
+            counters["cost"] += cost
+            if latency is not None:
+                counters["latency_sum"] += latency
+                counters["latency_count"] += 1
+
+        hour = int(time.time()) // 3600 * 3600
+        if not self.hourly or self.hourly[-1][0] != hour:
+            self.hourly.append([hour, 0])
+        self.hourly[-1][1] += 1
+
+        key = (now.replace(second=0, microsecond=0), game_id or "unknown", model)
+        rollup = self.pending.get(key)
+        if rollup is None:
+            rollup = self.pending[key] = _empty_counters()
+            rollup["latency_max"] = 0.0
+        rollup["requests"] += 1
+        rollup["input_tokens"] += input_tokens
+        rollup["output_tokens"] += output_tokens
+        rollup["cost"] += cost
+        if latency is not None:
+            rollup["latency_sum"] += latency
+            rollup["latency_count"] += 1
+            rollup["latency_max"] = max(rollup["latency_max"], latency)
+        return entry
+
+    def last_24h(self) -> int:
+        cutoff = time.time() - 86400
+        return sum(requests for hour, requests in self.hourly if hour + 3600 > cutoff)
+
+    def summary(self) -> Dict[str, Any]:
+        """This worker's usage since start; reads running counters only"""
+        totals = self.totals
+        total_tokens = totals["input_tokens"] + totals["output_tokens"]
+        return {
+            "total_requests": totals["requests"],
+            "total_cost": round(totals["cost"], 4),
+            "total_tokens": total_tokens,
+            "average_cost_per_request": round(totals["cost"] / totals["requests"], 4) if totals["requests"] else 0,
+            "average_latency": _average_latency(totals),
+            "last_24h": self.last_24h(),
+            "by_model": {model: _format_counters(c) for model, c in self.by_model.items()},
+            "by_game": {game: _format_counters(c) for game, c in self.by_game.items()}
+        }
+
+    async def flush(self, db) -> int:
+        """Write pending minute rollups in one bulk write, then add them to the fleet totals.
+
+        Only rollups whose writes failed are kept for the next flush; the
+        totals increment for the ones that were written is retried on its own.
+        """
+        if db is None or (not self.pending and not self.pending_totals["requests"]):
+            return 0
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        pending, self.pending = self.pending, {}
+        keys = list(pending)
+        rollup_ops = []
+        for (minute, game_id, model) in keys:
+            rollup = pending[(minute, game_id, model)]
+            rollup_ops.append(UpdateOne(
+                {"minute": minute, "game_id": game_id, "model": model},
+                {"$inc": {k: v for k, v in rollup.items() if k != "latency_max"}, "$max": {"latency_max": rollup["latency_max"]}},
+                upsert=True
+            ))
+
+        failed_keys = []
+        error = None
+        if rollup_ops:
+            try:
+                await db.usage_rollups.bulk_write(rollup_ops, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every op not listed in writeErrors was applied
+                failed_keys = [keys[write_error["index"]] for write_error in e.details.get("writeErrors", [])]
+                error = e
+            except Exception:
+                self._requeue(pending, keys)
+                raise
+
+        self._requeue(pending, failed_keys)
+        failed = set(failed_keys)
+        for key in keys:
+            if key not in failed:
+                for k, v in pending[key].items():
+                    if k != "latency_max":
+                        self.pending_totals[k] += v
+
+        if self.pending_totals["requests"]:
+            totals_inc, self.pending_totals = self.pending_totals, _empty_counters()
+            try:
+                await db.usage_totals.update_one(
+                    {"_id": self.TOTALS_ID},
+                    {"$inc": totals_inc, "$set": {"updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception:
+                for k, v in totals_inc.items():
+                    self.pending_totals[k] += v
+                raise
+        if error is not None:
+            raise error
+        return len(rollup_ops) - len(failed_keys)
+
+    def _requeue(self, pending: Dict[Tuple[datetime, str, str], Dict[str, float]], keys: List[Tuple[datetime, str, str]]):
+        """Keep the counts of unwritten rollups for the next flush"""
+        for key in keys:
+            current = self.pending.setdefault(key, {**_empty_counters(), "latency_max": 0.0})
+            for k, v in pending[key].items():
+                current[k] = max(current[k], v) if k == "latency_max" else current[k] + v
+
+    async def flush_periodically(self, get_db, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(get_db())
+            except Exception as e:
+                print(f"Failed to flush usage rollups: {e}")
+
+    async def fleet_summary(self, db) -> Optional[Dict[str, Any]]:
+        """Usage of every worker as last flushed; a single document read"""
+        if db is None:
+            return None
+        totals = await db.usage_totals.find_one({"_id": self.TOTALS_ID})
+        if not totals:
+            return None
+        return {**_format_counters(totals), "updated_at": totals.get("updated_at")}
+
+async def ensure_usage_indexes(db, retention_days: int):
+    """Rollup lookup index, plus a TTL so old minutes expire"""
+    await db.usage_rollups.create_index([("minute", 1), ("game_id", 1), ("model", 1)], unique=True)
+    if retention_days > 0:
+        await db.usage_rollups.create_index("minute", expireAfterSeconds=int(timedelta(days=retention_days).total_seconds()))
+
+def _empty_counters() -> Dict[str, float]:
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "latency_sum": 0.0, "latency_count": 0}
+
+def _average_latency(counters: Dict[str, float]) -> Optional[float]:
+    if not counters.get("latency_count"):
+        return None
+    return round(counters["latency_sum"] / counters["latency_count"], 3)
+
+def _format_counters(counters: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "requests": counters.get("requests", 0),
+        "input_tokens": counters.get("input_tokens", 0),
+        "output_tokens": counters.get("output_tokens", 0),
+        "total_cost": round(counters.get("cost", 0.0), 4),
+        "average_latency": _average_latency(counters)
+    }
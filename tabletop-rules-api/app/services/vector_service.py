@@ -1,6 +1,7 @@
 from typing import List, Dict, Any
 from app.database import get_database
 from app.services.ai_service import ai_service
+from app.services.profiling import span
 import numpy as np
 
 class VectorService:
@@ -19,7 +20,8 @@ class VectorService:
         
         try:
             # Generate embedding for the query
-            query_embedding = await ai_service.generate_embedding(query)
+            with span("embedding"):
+                query_embedding = await ai_service.generate_embedding(query)
             
             # Perform vector search (basic implementation)
             # Note: This requires MongoDB Atlas Vector Search to be properly configured
@@ -45,8 +47,9 @@ class VectorService:
             ]
             
             results = []
-            async for doc in collection.aggregate(pipeline):
-                results.append(doc)
+            with span("vector_search"):
+                async for doc in collection.aggregate(pipeline):
+                    results.append(doc)
             
             return results
             
@@ -67,11 +70,12 @@ class VectorService:
         
         try:
             results = []
-            async for doc in collection.find({
-                "game_id": game_system,
-                "$text": {"$search": query}
-            }).limit(limit):
-                results.append(doc)
+            with span("text_search"):
+                async for doc in collection.find({
+                    "game_id": game_system,
+                    "$text": {"$search": query}
+                }).limit(limit):
+                    results.append(doc)
             
             return results
         except Exception as e:
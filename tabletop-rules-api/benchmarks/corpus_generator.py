@@ -0,0 +1,312 @@
+# benchmarks/corpus_generator.py - Synthetic rulebook corpus generator and bulk loader for scale testing
+"""Generate realistic markdown rulebooks and bulk load them into a local Mongo.
+
+Rulebooks follow the format of rules_data/: frontmatter, a "# Game:" title,
+"## Rule:" sections with **Category**/**Complexity**/**Mandatory**
+metadata, "###" subsections, and "(see Rule: ...)" cross-references to
+other sections. Sizes are drawn from configurable distributions and the
+output is fully determined by the seed.
+
+    # Write 50 rulebooks to a directory
+    python -m benchmarks.corpus_generator generate --games 50 --output-dir /tmp/corpus
+
+    # Populate a local Mongo at production scale (~500 games, ~100k chunks)
+    python -m benchmarks.corpus_generator load --preset production --mongodb-uri mongodb://localhost:27017 --drop
+
+    # Load previously generated files instead
+    python -m benchmarks.corpus_generator load --input-dir /tmp/corpus --database tabletop_rules_loadtest
+
+Loading goes through the same ingest function as the upload endpoint, so
+stored chunks (prompt rendering, token counts, game registry) match
+production. Run the load test against the result with
+`python -m benchmarks.load_test --mongodb-uri ... --keep-database --skip-seed`.
+"""
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from dataclasses import dataclass, asdict
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.distributions import Distribution
+
+DEFAULT_DATABASE = "tabletop_rules_loadtest"
+RULES_DIR = Path(__file__).resolve().parent.parent / "rules_data"
+
+THEMES = {
+    "fantasy": {
+        "pieces": ["warrior", "wizard", "dragon", "knight", "archer", "scout", "guardian", "golem"],
+        "places": ["forest", "keep", "ruin", "clearing", "mountain", "river", "tower", "village"],
+        "resources": ["gold", "mana", "wood", "stone", "relic", "crystal"],
+        "actions": ["move", "attack", "recruit", "build", "explore", "cast", "rest", "trade"]
+    },
+    "space": {
+        "pieces": ["cruiser", "fighter", "freighter", "probe", "colony ship", "dreadnought", "station", "drone"],
+        "places": ["system", "nebula", "asteroid field", "wormhole", "planet", "orbit", "sector", "gate"],
+        "resources": ["credits", "fuel", "ore", "influence", "research", "alloys"],
+        "actions": ["jump", "attack", "colonize", "scan", "mine", "trade", "upgrade", "blockade"]
+    },
+    "trains": {
+        "pieces": ["locomotive", "engineer", "route", "station", "carriage", "signal", "depot", "tender"],
+        "places": ["city", "junction", "tunnel", "bridge", "yard", "port", "valley", "terminus"],
+        "resources": ["coal", "money", "goods", "passengers", "shares", "track"],
+        "actions": ["claim", "deliver", "build", "buy", "sell", "upgrade", "connect", "pass"]
+    },
+    "historical": {
+        "pieces": ["legion", "general", "cavalry", "fleet", "senator", "merchant", "siege engine", "militia"],
+        "places": ["province", "capital", "fortress", "sea zone", "frontier", "road", "harbor", "border"],
+        "resources": ["denarii", "grain", "manpower", "prestige", "influence", "supply"],
+        "actions": ["march", "besiege", "levy", "tax", "negotiate", "raid", "fortify", "retreat"]
+    }
+}
+
+CATEGORIES = ["General", "Setup", "Turn Structure", "Movement", "Combat", "Economy", "Scoring", "Special Abilities", "Advanced Rules", "Endgame"]
+COMPLEXITIES = ["Basic", "Intermediate", "Advanced"]
+NAME_PARTS = [
+    ["Crimson", "Silent", "Iron", "Hidden", "Golden", "Shattered", "Endless", "Twilight", "Ancient", "Rising"],
+    ["Realms", "Frontier", "Empire", "Skies", "Harbor", "Crown", "Railways", "Legends", "Tides", "Citadel"]
+]
+PUBLISHERS = ["Meeple Works", "Cardboard Forge", "Dice Tower Press", "Tabletop Foundry", "Red Token Games", "Hexagon House"]
+
+SENTENCES = [
+    "A player may {action} one {piece} per turn unless a card says otherwise.",
+    "When a {piece} enters a {place}, the active player must resolve any {resource} effects there first.",
+    "Each {place} can hold at most {n} {piece}s belonging to the same player.",
+    "To {action}, spend {n} {resource} and choose a {place} adjacent to one of your {piece}s.",
+    "If two players would {action} at the same time, the player with more {resource} resolves first.",
+    "A {piece} that cannot {action} during this phase is exhausted until the end of the round.",
+    "Players gain {n} victory points for each {place} they control at the end of the game.",
+    "You cannot {action} with a {piece} that was placed this turn.",
+    "During setup, each player places {n} {piece}s in their home {place}.",
+    "Return spent {resource} to the supply; it is never lost permanently.",
+    "If the supply of {resource} runs out, no player may {action} until it is replenished.",
+    "A {piece} in a {place} with an enemy {piece} must stop moving immediately.",
+    "Ties are broken in favour of the player who controls the {place} with the most {piece}s.",
+    "After you {action}, draw one card and discard down to your hand limit of {n}."
+]
+
+@dataclass
+class CorpusConfig:
+    games: int = 20
+    seed: int = 1234
+    sections: str = "lognormal:30,0.6"      # ## sections per rulebook
+    paragraphs: str = "uniform:1,4"         # Paragraphs per section or subsection
+    sentences: str = "uniform:2,6"          # Sentences per paragraph
+    subsection_rate: float = 0.3            # Share of sections split into ### subsections
+    subsections: str = "uniform:2,5"        # ### subsections when a section is split
+    cross_reference_rate: float = 0.25      # Share of paragraphs that reference another section
+
+PRESETS = {
+    "small": CorpusConfig(games=20, sections="lognormal:30,0.6"),
+    "medium": CorpusConfig(games=100, sections="lognormal:60,0.7"),
+    # ~500 games and ~100k chunks, the scale the admin and chat endpoints should handle
+    "production": CorpusConfig(games=500, sections="lognormal:150,0.8")
+}
+
+class RulebookGenerator:
+    """Deterministic generator of markdown rulebooks in the rules_data format"""
+
+    def __init__(self, config: CorpusConfig):
+        self.config = config
+        self.sections = Distribution(config.sections)
+        self.paragraphs = Distribution(config.paragraphs)
+        self.sentences = Distribution(config.sentences)
+        self.subsections = Distribution(config.subsections)
+
+    def generate(self, index: int) -> Tuple[str, str]:
+        """(game_id, markdown) for the index-th rulebook of the corpus"""
+        rng = random.Random(f"{self.config.seed}:{index}")
+        theme_name = rng.choice(sorted(THEMES))
+        theme = THEMES[theme_name]
+        game_id = f"synth_{index:04d}"
+        name = f"{rng.choice(NAME_PARTS[0])} {rng.choice(NAME_PARTS[1])} {index}"
+        min_players = rng.randint(1, 3)
+
+        titles = self._section_titles(rng, theme, self.sections.sample_int(rng))
+
+        lines = [
+            "---",
+            f'game_id: "{game_id}"',
+            f'name: "{name}"',
+            f'publisher: "{rng.choice(PUBLISHERS)}"',
+            f'description: "A synthetic {theme_name} game for scale testing"',
+            f'complexity: "{rng.choice(["light", "medium", "heavy"])}"',
+            f"min_players: {min_players}",
+            f"max_players: {min_players + rng.randint(1, 4)}",
+            f'ai_tags: ["synthetic", "{theme_name}", "strategy"]',
+            "---",
+            f"# Game: {name}",
+            ""
+        ]
+
+        for position, title in enumerate(titles):
+            category = CATEGORIES[min(len(CATEGORIES) - 1, position * len(CATEGORIES) // len(titles))]
+            lines.extend([
+                f"## Rule: {title}",
+                "",
+                f"**Category**: {category}",
+                "",
+                f"**Complexity**: {rng.choice(COMPLEXITIES)}",
+                "",
+                f"**Mandatory**: {'Yes' if rng.random() < 0.8 else 'No'}",
+                ""
+            ])
+            if rng.random() < self.config.subsection_rate:
+                for sub in range(self.subsections.sample_int(rng)):
+                    lines.extend([f"### {position + 1}.{sub + 1} {self._phrase(rng, theme).title()}", ""])
+                    lines.extend(self._paragraphs(rng, theme, titles, title))
+            else:
+                lines.extend(self._paragraphs(rng, theme, titles, title))
+
+        return game_id, "\n".join(lines) + "\n"
+
+    def _section_titles(self, rng: random.Random, theme: Dict[str, List[str]], count: int) -> List[str]:
+        titles = []
+        seen = set()
+        while len(titles) < count:
+            title = f"{rng.choice(theme['actions']).title()} {rng.choice(theme['pieces']).title()}s"
+            if len(seen) >= len(theme["actions"]) * len(theme["pieces"]) or title in seen:
+                title = f"{title} {len(titles) + 1}"
+            seen.add(title)
+            titles.append(title)
+        return titles
+
+    def _phrase(self, rng: random.Random, theme: Dict[str, List[str]]) -> str:
+        return f"{rng.choice(theme['actions'])} in a {rng.choice(theme['places'])}"
+
+    def _paragraphs(self, rng: random.Random, theme, titles: List[str], current: str) -> List[str]:
+        lines = []
+        for _ in range(self.paragraphs.sample_int(rng)):
+            sentences = [
+                rng.choice(SENTENCES).format(
+                    action=rng.choice(theme["actions"]),
+                    piece=rng.choice(theme["pieces"]),
+                    place=rng.choice(theme["places"]),
+                    resource=rng.choice(theme["resources"]),
+                    n=rng.randint(1, 5)
+                )
+                for _ in range(self.sentences.sample_int(rng))
+            ]
+            if len(titles) > 1 and rng.random() < self.config.cross_reference_rate:
+                other = rng.choice([t for t in titles if t != current])
+                sentences.append(f"(see Rule: {other})")
+            lines.extend([" ".join(sentences), ""])
+        return lines
+
+def generate_corpus(config: CorpusConfig) -> Iterator[Tuple[str, str]]:
+    generator = RulebookGenerator(config)
+    for index in range(config.games):
+        yield generator.generate(index)
+
+def write_corpus(config: CorpusConfig, output_dir: Path) -> Dict[str, Any]:
+    """Write the corpus as {game_id}.md files plus a manifest.json"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    games = []
+    total_sections = 0
+    for game_id, markdown in generate_corpus(config):
+        (output_dir / f"{game_id}.md").write_text(markdown, encoding="utf-8")
+        sections = markdown.count("\n## ")
+        total_sections += sections
+        games.append({"game_id": game_id, "sections": sections, "bytes": len(markdown.encode("utf-8"))})
+
+    manifest = {"config": asdict(config), "games": len(games), "sections": total_sections, "files": games}
+    (output_dir / "manifest.json").write_text(json.dumps(manifest, indent=2) + "\n")
+    return manifest
+
+def _read_corpus(input_dir: Path) -> Iterator[Tuple[str, str]]:
+    for path in sorted(input_dir.glob("*.md")):
+        yield path.stem, path.read_text(encoding="utf-8")
+
+async def bulk_load(rulebooks, db, concurrency: int = 8, include_bundled: bool = True) -> Dict[str, Any]:
+    """Ingest rulebooks through the upload endpoint's processing function"""
+    from app.routes.admin import basic_markdown_processing
+
+    if include_bundled:
+        rulebooks = list(rulebooks) + [(p.stem, p.read_text(encoding="utf-8")) for p in sorted(RULES_DIR.glob("*.md"))]
+
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"games": 0, "chunks": 0}
+    start = time.perf_counter()
+
+    async def load_one(name: str, markdown: str):
+        async with semaphore:
+            result = await basic_markdown_processing(markdown, f"{name}.md", db)
+        totals["games"] += 1
+        totals["chunks"] += result["rules_stored"]
+        if totals["games"] % 50 == 0:
+            elapsed = time.perf_counter() - start
+            print(f"Loaded {totals['games']} games, {totals['chunks']} chunks ({totals['chunks'] / elapsed:,.0f} chunks/s)")
+
+    await asyncio.gather(*[load_one(name, markdown) for name, markdown in rulebooks])
+
+    elapsed = time.perf_counter() - start
+    return {
+        **totals,
+        "elapsed_seconds": round(elapsed, 2),
+        "chunks_per_second": round(totals["chunks"] / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+def _config_from_args(args: argparse.Namespace) -> CorpusConfig:
+    config = CorpusConfig(**asdict(PRESETS[args.preset])) if args.preset else CorpusConfig()
+    for name in ("games", "seed", "sections", "paragraphs", "sentences", "subsection_rate", "subsections", "cross_reference_rate"):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(config, name, value)
+    return config
+
+async def _load_command(args: argparse.Namespace):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.config import settings
+
+    client = AsyncIOMotorClient(args.mongodb_uri or settings.mongodb_uri)
+    if args.drop:
+        await client.drop_database(args.database)
+        print(f"Dropped database {args.database}")
+    db = client[args.database]
+
+    rulebooks = _read_corpus(Path(args.input_dir)) if args.input_dir else generate_corpus(_config_from_args(args))
+    summary = await bulk_load(rulebooks, db, args.concurrency, include_bundled=not args.no_bundled)
+    client.close()
+
+    print(f"✅ Loaded {summary['games']} games and {summary['chunks']} chunks into {args.database} "
+          f"in {summary['elapsed_seconds']}s ({summary['chunks_per_second']:,.0f} chunks/s)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Synthetic rulebook corpus generator and bulk loader")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    size = argparse.ArgumentParser(add_help=False)
+    size.add_argument("--preset", choices=sorted(PRESETS), help="Start from a preset corpus size")
+    size.add_argument("--games", type=int, help="Number of rulebooks")
+    size.add_argument("--seed", type=int)
+    size.add_argument("--sections", help="Sections per rulebook distribution, e.g. lognormal:30,0.6")
+    size.add_argument("--paragraphs", help="Paragraphs per section distribution")
+    size.add_argument("--sentences", help="Sentences per paragraph distribution")
+    size.add_argument("--subsection-rate", type=float, help="Share of sections with ### subsections")
+    size.add_argument("--subsections", help="Subsections per split section distribution")
+    size.add_argument("--cross-reference-rate", type=float, help="Share of paragraphs with a cross-reference")
+
+    generate = subparsers.add_parser("generate", parents=[size], help="Write rulebooks to a directory")
+    generate.add_argument("--output-dir", required=True)
+
+    load = subparsers.add_parser("load", parents=[size], help="Bulk load rulebooks into Mongo")
+    load.add_argument("--input-dir", help="Load .md files from this directory instead of generating")
+    load.add_argument("--mongodb-uri", help="Mongo to load into (default: MONGODB_URI)")
+    load.add_argument("--database", default=DEFAULT_DATABASE)
+    load.add_argument("--drop", action="store_true", help="Drop the database first")
+    load.add_argument("--concurrency", type=int, default=8, help="Rulebooks ingested concurrently")
+    load.add_argument("--no-bundled", action="store_true", help="Don't also load the chess and Root rulebooks")
+    return parser
+
+def main(argv: Optional[List[str]] = None):
+    args = build_parser().parse_args(argv)
+    if args.command == "generate":
+        manifest = write_corpus(_config_from_args(args), Path(args.output_dir))
+        print(f"✅ Wrote {manifest['games']} rulebooks with {manifest['sections']} sections to {args.output_dir}")
+    else:
+        asyncio.run(_load_command(args))
+
+if __name__ == "__main__":
+    main()
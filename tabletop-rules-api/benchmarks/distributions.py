@@ -0,0 +1,42 @@
+# benchmarks/distributions.py - Named random distributions for benchmark configuration
+import math
+import random
+
+
+class Distribution:
+    """Values drawn from a distribution named on the command line.
+
+    Specs: "none", "fixed:V", "uniform:LOW,HIGH", "normal:MEAN,STDDEV",
+    "lognormal:MEDIAN,SIGMA" (heavy right tail, closest to real LLM
+    latency and real rulebook sizes).
+    """
+
+    KINDS = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str = "none"):
+        kind, _, params = spec.partition(":")
+        kind = kind.strip().lower()
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown distribution '{kind}'")
+        values = [float(v) for v in params.split(",") if v.strip()]
+        if len(values) != self.KINDS[kind]:
+            raise ValueError(f"Distribution '{kind}' takes {self.KINDS[kind]} parameter(s)")
+        self.spec = spec
+        self.kind = kind
+        self.params = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma)
+
+    def sample_int(self, rng: random.Random, minimum: int = 1) -> int:
+        """Sample rounded to a count, never below minimum"""
+        return max(minimum, int(round(self.sample(rng))))
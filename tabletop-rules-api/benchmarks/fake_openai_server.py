@@ -0,0 +1,313 @@
+# benchmarks/fake_openai_server.py - Local OpenAI-compatible stand-in for offline load and fault testing
+"""Fake OpenAI API serving /v1/embeddings and /v1/chat/completions.
+
+Responses are deterministic for a given input, latency is drawn from a
+configurable distribution and errors / 429s can be injected at a fixed
+rate, so the real AsyncOpenAI client and HTTP stack are exercised end to
+end without network access.
+
+Run it and point the API at it:
+
+    python -m benchmarks.fake_openai_server --port 8100 --latency lognormal:0.8,0.5 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake uvicorn main:app
+"""
+from typing import List, Dict, Any, Optional, Tuple, Union
+from dataclasses import dataclass, field, asdict
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.tokenizer import count_tokens
+from benchmarks.distributions import Distribution as LatencyDistribution
+
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536
+}
+
+@dataclass
+class FakeOpenAIConfig:
+    latency: str = "none"
+    embedding_latency: str = "none"
+    stream_chunk_delay: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: int = 42
+    completion_tokens: int = 180  # Length of generated answers before max_tokens is applied
+
+@dataclass
+class FakeOpenAIStats:
+    embedding_requests: int = 0
+    chat_requests: int = 0
+    stream_requests: int = 0
+    injected_errors: int = 0
+    injected_rate_limits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    embedding_tokens: int = 0
+
+def deterministic_embedding(text: str, dimensions: int = 1536) -> List[float]:
+    """Unit-length vector that depends only on the text"""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):  # Content parts
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+def _question(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            text = _message_text([message])
+            if "Question:" in text:
+                return text.rsplit("Question:", 1)[1].strip()
+            return text.strip()
+    return "your question"
+
+def generate_answer(messages: List[Dict[str, Any]], target_words: int) -> str:
+    """Deterministic answer in the rules-advisor template format"""
+    question = _question(messages)
+    seed = int.from_bytes(hashlib.blake2b(question.encode("utf-8"), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    vocabulary = [
+        "the", "player", "must", "may", "each", "turn", "piece", "move", "rule", "card",
+        "board", "action", "phase", "token", "capture", "space", "adjacent", "before", "after", "unless"
+    ]
+    body = " ".join(rng.choice(vocabulary) for _ in range(max(10, target_words)))
+    return (
+        f"**This is a simulated answer to: {question}**\n\n"
+        f"{body.capitalize()}.\n\n"
+        "**Related Rules**\n"
+        "• **Simulated Rule A**: Placeholder related rule\n"
+        "• **Simulated Rule B**: Placeholder related rule\n"
+        "• **Simulated Rule C**: Placeholder related rule"
+    )
+
+def _truncate_to_tokens(text: str, max_tokens: Optional[int]) -> Tuple[str, str]:
+    if not max_tokens:
+        return text, "stop"
+    words = text.split(" ")
+    # Roughly 0.75 words per token
+    max_words = max(1, int(max_tokens * 0.75))
+    if len(words) <= max_words:
+        return text, "stop"
+    return " ".join(words[:max_words]), "length"
+
+def _error(status: int, message: str, error_type: str, code: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": code}},
+        headers=headers
+    )
+
+def create_app(config: Optional[FakeOpenAIConfig] = None) -> FastAPI:
+    """Build the fake OpenAI app; config can be changed at runtime via /_fake/config"""
+    app = FastAPI(title="Fake OpenAI API")
+    app.state.config = config or FakeOpenAIConfig()
+    app.state.stats = FakeOpenAIStats()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.latency = LatencyDistribution(app.state.config.latency)
+    app.state.embedding_latency = LatencyDistribution(app.state.config.embedding_latency)
+
+    def apply_config(new_config: FakeOpenAIConfig):
+        app.state.latency = LatencyDistribution(new_config.latency)
+        app.state.embedding_latency = LatencyDistribution(new_config.embedding_latency)
+        app.state.config = new_config
+        app.state.rng = random.Random(new_config.seed)
+
+    def inject_fault():
+        """Return an error response if this request should fail"""
+        roll = app.state.rng.random()
+        if roll < app.state.config.rate_limit_rate:
+            app.state.stats.injected_rate_limits += 1
+            return _error(
+                429, "Rate limit reached (injected by fake server)", "requests",
+                code="rate_limit_exceeded", headers={"retry-after": "1"}
+            )
+        if roll < app.state.config.rate_limit_rate + app.state.config.error_rate:
+            app.state.stats.injected_errors += 1
+            return _error(500, "The server had an error (injected by fake server)", "server_error")
+        return None
+
+    @app.post("/v1/embeddings")
+    async def create_embeddings(request: Request):
+        body = await request.json()
+        app.state.stats.embedding_requests += 1
+
+        fault = inject_fault()
+        if fault is not None:
+            return fault
+
+        inputs: Union[str, List[str]] = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        model = body.get("model", "text-embedding-3-small")
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+
+        await asyncio.sleep(app.state.embedding_latency.sample(app.state.rng))
+
+        tokens = sum(count_tokens(text) for text in inputs)
+        app.state.stats.embedding_tokens += tokens
+
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": deterministic_embedding(text, dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.post("/v1/chat/completions")
+    async def create_chat_completion(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4o-mini")
+        stream = bool(body.get("stream"))
+        app.state.stats.chat_requests += 1
+
+        fault = inject_fault()
+        if fault is not None:
+            return fault
+
+        answer, finish_reason = _truncate_to_tokens(
+            generate_answer(messages, app.state.config.completion_tokens),
+            body.get("max_tokens") or body.get("max_completion_tokens")
+        )
+        prompt_tokens = count_tokens(_message_text(messages))
+        completion_tokens = count_tokens(answer)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        app.state.stats.prompt_tokens += prompt_tokens
+        app.state.stats.completion_tokens += completion_tokens
+
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        # Time to first token
+        await asyncio.sleep(app.state.latency.sample(app.state.rng))
+
+        if not stream:
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "logprobs": None,
+                    "finish_reason": finish_reason
+                }],
+                "usage": usage
+            }
+
+        app.state.stats.stream_requests += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def event_stream():
+            def chunk(delta: Dict[str, Any], finish: Optional[str] = None, chunk_usage=None) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish}] if delta is not None else [],
+                }
+                if chunk_usage is not None:
+                    payload["usage"] = chunk_usage
+                return f"data: {json.dumps(payload)}\n\n"
+
+            yield chunk({"role": "assistant", "content": ""})
+            words = answer.split(" ")
+            for i, word in enumerate(words):
+                if app.state.config.stream_chunk_delay:
+                    await asyncio.sleep(app.state.config.stream_chunk_delay)
+                yield chunk({"content": word if i == 0 else " " + word})
+            yield chunk({}, finish=finish_reason)
+            if include_usage:
+                yield chunk(None, chunk_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "fake"}
+                for model in ["gpt-4o-mini", *EMBEDDING_DIMENSIONS]
+            ]
+        }
+
+    @app.get("/_fake/config")
+    async def get_config():
+        return asdict(app.state.config)
+
+    @app.post("/_fake/config")
+    async def update_config(updates: Dict[str, Any]):
+        """Change latency / fault injection mid-run (e.g. to trip the circuit breaker)"""
+        try:
+            apply_config(FakeOpenAIConfig(**{**asdict(app.state.config), **updates}))
+        except (TypeError, ValueError) as e:
+            return _error(400, str(e), "invalid_request_error")
+        return asdict(app.state.config)
+
+    @app.get("/_fake/stats")
+    async def get_stats():
+        return asdict(app.state.stats)
+
+    @app.post("/_fake/stats/reset")
+    async def reset_stats():
+        app.state.stats = FakeOpenAIStats()
+        return asdict(app.state.stats)
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible API for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="none", help="Chat latency, e.g. fixed:0.5, uniform:0.2,1.0, lognormal:0.8,0.5")
+    parser.add_argument("--embedding-latency", default="none", help="Embedding latency distribution")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = FakeOpenAIConfig(
+        latency=args.latency,
+        embedding_latency=args.embedding_latency,
+        stream_chunk_delay=args.stream_chunk_delay,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1 ({config})")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/import_time.py - Import-time report and startup budget for API workers
+"""Import-time report for the app, from `python -X importtime`, with a budget.
+
+Every uvicorn worker, reload and test run starts by importing main, so
+slow module-level work there (loading an SDK, a tokenizer encoding or a
+password hasher) is paid over and over. This imports the target in fresh
+interpreters, reports the slowest modules by cumulative and self time,
+and fails when the import exceeds the budget or pulls in a module that
+must stay lazy (loaded on first use instead):
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 1000 --top 25 --output import_time.json
+    python -m benchmarks.import_time --target app.routes.chat
+
+Times are machine-specific; set the budget for the machine it runs on.
+"""
+from typing import List, Dict, Any
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_TARGET = "main"
+DEFAULT_BUDGET_MS = 1000.0
+LAZY_MODULES = ("openai", "tiktoken", "passlib")  # Loaded on first use; importing the app must not pull them in
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Entries of `-X importtime` output, in import order, times in milliseconds"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "| cumulative |" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return entries
+
+def lazy_violations(entries: List[Dict[str, Any]], lazy_modules=LAZY_MODULES) -> List[str]:
+    """Top-level packages among lazy_modules that were imported"""
+    imported = {entry["module"].split(".")[0] for entry in entries}
+    return [module for module in lazy_modules if module in imported]
+
+def import_once(target: str) -> List[Dict[str, Any]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=PROJECT_DIR, env=os.environ.copy(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def measure_imports(target: str = DEFAULT_TARGET, runs: int = 5, top: int = 15) -> Dict[str, Any]:
+    """Best and median import time of the target over fresh interpreters, with the slowest modules of the best run"""
+    import_once(target)  # Writes bytecode caches so every timed run starts warm
+    timed = []
+    for _ in range(runs):
+        entries = import_once(target)
+        total = next(entry["cumulative_ms"] for entry in entries if entry["module"] == target and entry["depth"] == 0)
+        timed.append((total, entries))
+    timed.sort(key=lambda run: run[0])
+    best, entries = timed[0]
+    under_target = [entry for entry in entries if entry["depth"] > 0 or entry["module"] == target]
+    return {
+        "target": target,
+        "runs": runs,
+        "best_ms": round(best, 1),
+        "median_ms": round(timed[len(timed) // 2][0], 1),
+        "modules": len(entries),
+        "lazy_violations": lazy_violations(entries),
+        "slowest_cumulative": [
+            {"module": e["module"], "ms": round(e["cumulative_ms"], 1)}
+            for e in sorted((e for e in entries if e["depth"] == 1), key=lambda e: -e["cumulative_ms"])[:top]
+        ],
+        "slowest_self": [
+            {"module": e["module"], "ms": round(e["self_ms"], 1)}
+            for e in sorted(under_target, key=lambda e: -e["self_ms"])[:top]
+        ]
+    }
+
+def check_budget(report: Dict[str, Any], budget_ms: float) -> List[str]:
+    """Reasons the report breaks the budget; empty when it is within it"""
+    problems = []
+    if report["best_ms"] > budget_ms:
+        problems.append(f"import {report['target']} took {report['best_ms']:.0f} ms (budget {budget_ms:.0f} ms)")
+    for module in report["lazy_violations"]:
+        problems.append(f"import {report['target']} imported {module}, which should load on first use")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report and startup budget")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters timed; the best run is reported")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules listed")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum best-run import time")
+    parser.add_argument("--output", help="Write the report JSON to this file")
+    args = parser.parse_args()
+
+    report = measure_imports(args.target, args.runs, args.top)
+    print(f"import {report['target']}: best {report['best_ms']:.1f} ms, median {report['median_ms']:.1f} ms, {report['modules']} modules")
+    print("\nSlowest direct imports (cumulative):")
+    for entry in report["slowest_cumulative"]:
+        print(f"  {entry['ms']:>9.1f} ms  {entry['module']}")
+    print("\nSlowest modules (self):")
+    for entry in report["slowest_self"]:
+        print(f"  {entry['ms']:>9.1f} ms  {entry['module']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nReport written to {args.output}")
+
+    problems = check_budget(report, args.budget_ms)
+    if problems:
+        print("\n❌ " + "\n❌ ".join(problems))
+        sys.exit(1)
+    print(f"\n✅ Within the {args.budget_ms:.0f} ms budget")
+
+if __name__ == "__main__":
+    main()
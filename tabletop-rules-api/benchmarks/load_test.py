@@ -0,0 +1,504 @@
+# benchmarks/load_test.py - End-to-end load test for the chat and ingest paths
+"""Concurrent load test for /api/chat/query, keyword search and uploads.
+
+Boots the real FastAPI app with uvicorn in this process, against either a
+local mongod or an in-memory Mongo stand-in (mongomock-motor), with the
+fake OpenAI server from benchmarks/fake_openai_server.py as the LLM. The
+bundled chess and Root rulebooks are uploaded, then query workers drive a
+weighted mix of questions while upload workers re-ingest the rulebooks.
+
+Reports throughput and p50/p95/p99 per route and per stage (Mongo reads
+and writes, scoring, context build, LLM call, response build,
+serialization), taken from the Server-Timing header of each response, and
+writes them as JSON so runs can be diffed across commits:
+
+    python -m benchmarks.load_test --in-memory --concurrency 20 --duration 30 --output run.json
+    python -m benchmarks.load_test --mongodb-uri mongodb://localhost:27017 --mix chess=1,root=3 --upload-concurrency 2
+    python -m benchmarks.load_test --in-memory --compare baseline.json
+
+Client and server share one event loop, so absolute numbers are lower
+than a multi-worker deployment; compare runs made with the same options.
+Use --base-url to drive an already running server instead; stage timings
+are reported as long as it sends Server-Timing headers.
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+
+import httpx
+
+RULES_DIR = Path(__file__).resolve().parent.parent / "rules_data"
+RULEBOOKS = {
+    "chess": RULES_DIR / "chess_rules.md",
+    "root": RULES_DIR / "root_rules.md"
+}
+DEFAULT_DATABASE = "tabletop_rules_loadtest"
+
+QUERY_SETS = {
+    "chess": [
+        "How do pawns move?",
+        "Can a pawn capture en passant?",
+        "How does castling work?",
+        "What happens when the king is in check?",
+        "How does the knight move?",
+        "What is checkmate?",
+        "Can the queen move diagonally?",
+        "When is a game drawn by stalemate?",
+        "What happens when a pawn reaches the last rank?",
+        "How does the bishop move?"
+    ],
+    "root": [
+        "How does the Marquise de Cat build?",
+        "What happens during battle?",
+        "How do I score victory points?",
+        "How does the Eyrie Decree work?",
+        "What is ruling a clearing?",
+        "How does the Woodland Alliance spread sympathy?",
+        "What does the Vagabond do on their turn?",
+        "How do dominance cards work?",
+        "Can I move through a forest?",
+        "How are hits removed in battle?"
+    ]
+}
+
+ROUTE_QUERY = "POST /api/chat/query"
+ROUTE_SEARCH = "GET /api/chat/search/{game_id}"
+ROUTE_LISTING = "GET /api/games/"
+ROUTE_UPLOAD = "POST /api/admin/upload/markdown-simple"
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (pct in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+def summarize(durations: List[float], elapsed: float, errors: int = 0) -> Dict[str, Any]:
+    """Throughput and latency percentiles (milliseconds) for one route or stage"""
+    count = len(durations)
+    return {
+        "count": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(durations) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 99) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2) if durations else 0.0
+    }
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse "chess=3,root=1" into normalized game weights"""
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        game, _, weight = item.partition("=")
+        game = game.strip()
+        if game not in QUERY_SETS:
+            raise ValueError(f"Unknown game '{game}' in query mix (available: {', '.join(QUERY_SETS)})")
+        weights[game] = float(weight) if weight else 1.0
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Query mix weights must add up to more than zero")
+    return {game: weight / total for game, weight in weights.items()}
+
+class LoadRecorder:
+    """Collects per-route and per-stage durations during a run"""
+
+    def __init__(self):
+        self.routes = defaultdict(list)
+        self.route_errors = defaultdict(int)
+        self.stages = defaultdict(list)
+        self.status_codes = defaultdict(int)
+        self.search_methods = defaultdict(int)
+        self.recording = False
+
+    def record_request(self, route: str, duration: float, status_code: Optional[int]):
+        if not self.recording:
+            return
+        self.status_codes[str(status_code or "error")] += 1
+        if status_code is None or status_code >= 400:
+            self.route_errors[route] += 1
+        else:
+            self.routes[route].append(duration)
+
+    def record_stage(self, stage: str, duration: float):
+        if self.recording:
+            self.stages[stage].append(duration)
+
+    def results(self, elapsed: float) -> Dict[str, Any]:
+        route_names = sorted(set(self.routes) | set(self.route_errors))
+        return {
+            "routes": {route: summarize(self.routes[route], elapsed, self.route_errors[route]) for route in route_names},
+            "stages": {stage: summarize(durations, elapsed) for stage, durations in sorted(self.stages.items())},
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "search_methods": dict(sorted(self.search_methods.items()))
+        }
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Stage durations in seconds from a Server-Timing header ("name;dur=12.3, ...")"""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key == "dur":
+                try:
+                    stages[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+async def _start_server(app, host: str = "127.0.0.1", port: int = 0):
+    """Run an ASGI app with uvicorn in this event loop; returns (server, task, base_url)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+    server.install_signal_handlers = lambda: None  # Leave Ctrl+C to the harness
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # Surface startup errors
+            raise RuntimeError("Server exited during startup")
+        await asyncio.sleep(0.02)
+    bound_port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://{host}:{bound_port}"
+
+async def _stop_server(server, task):
+    server.should_exit = True
+    await task
+
+def _in_memory_lifespan():
+    """Replace the app's Mongo connection with a mongomock-motor client"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        raise SystemExit("--in-memory needs mongomock-motor: pip install -r benchmark_requirements.txt")
+
+    from app.config import settings
+    from app.database import db
+
+    @asynccontextmanager
+    async def lifespan(app):
+        db.client = AsyncMongoMockClient()
+        db.database = db.client[settings.database_name]
+        yield
+        db.client = None
+        db.database = None
+
+    return lifespan
+
+@contextmanager
+def _patched_settings(**overrides):
+    """Override settings for the run and restore them afterwards"""
+    from app.config import settings
+
+    previous = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield settings
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+def _configure_llm(mode: str, base_url: Optional[str]):
+    """Point the AI services at the fake server (or disable them) for this run"""
+    from app.config import settings
+    from app.services.ai_chat_service import ai_chat_service
+
+    if mode == "fake":
+        settings.openai_base_url = base_url
+        settings.openai_api_key = "fake-load-test-key"
+    elif mode == "none":
+        settings.openai_api_key = ""
+    # Recreate clients with the new settings on first use
+    ai_chat_service.client = None
+    ai_chat_service.breaker.reset()
+
+def _rulebook_for_upload(game: str, upload_game_id: str) -> str:
+    """Rulebook text with its frontmatter game_id rewritten so uploads don't touch queried games"""
+    text = RULEBOOKS[game].read_text(encoding="utf-8")
+    return text.replace(f'game_id: "{game}"', f'game_id: "{upload_game_id}"', 1)
+
+async def _timed_request(client: httpx.AsyncClient, recorder: LoadRecorder, route: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.record_request(route, time.perf_counter() - start, None)
+        print(f"Request failed: {route}: {e}")
+        return None
+    recorder.record_request(route, time.perf_counter() - start, response.status_code)
+    for stage, duration in parse_server_timing(response.headers.get("server-timing")).items():
+        if stage != "total":
+            recorder.record_stage(stage, duration)
+    return response
+
+async def _get_token(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def _seed(client: httpx.AsyncClient, headers: Dict[str, str], games: List[str]):
+    """Upload the bundled rulebooks that the query mix needs"""
+    for game in games:
+        response = await client.post(
+            "/api/admin/upload/markdown-simple",
+            files={"file": (RULEBOOKS[game].name, RULEBOOKS[game].read_bytes(), "text/markdown")},
+            headers=headers
+        )
+        response.raise_for_status()
+        print(f"Seeded {game}: {response.json().get('rules_stored', '?')} rules")
+
+async def _query_worker(worker_id: int, client, recorder, mix, args, deadline, counter, max_requests):
+    rng = random.Random(args.seed + worker_id)
+    games = list(mix)
+    weights = [mix[g] for g in games]
+    while time.perf_counter() < deadline and (max_requests is None or counter["sent"] < max_requests):
+        counter["sent"] += 1
+        game = rng.choices(games, weights)[0]
+        query = rng.choice(QUERY_SETS[game])
+
+        roll = rng.random()
+        if roll < args.search_ratio:
+            keyword = max(query.rstrip("?").split(), key=len)
+            await _timed_request(client, recorder, ROUTE_SEARCH, "GET", f"/api/chat/search/{game}", params={"q": keyword})
+            continue
+        if roll < args.search_ratio + args.listing_ratio:
+            await _timed_request(client, recorder, ROUTE_LISTING, "GET", "/api/games/")
+            continue
+
+        response = await _timed_request(
+            client, recorder, ROUTE_QUERY, "POST", "/api/chat/query",
+            json={"query": query, "game_system": game}
+        )
+        if response is not None and response.status_code == 200 and recorder.recording:
+            recorder.search_methods[response.json().get("search_method", "unknown")] += 1
+
+async def _upload_worker(worker_id: int, client, recorder, headers, deadline, seed):
+    rng = random.Random(seed + 1000 + worker_id)
+    games = list(RULEBOOKS)
+    uploads = 0
+    while time.perf_counter() < deadline:
+        game = rng.choice(games)
+        upload_game_id = f"loadtest_{game}_{worker_id}"
+        body = _rulebook_for_upload(game, upload_game_id).encode("utf-8")
+        await _timed_request(
+            client, recorder, ROUTE_UPLOAD, "POST", "/api/admin/upload/markdown-simple",
+            files={"file": (f"{upload_game_id}.md", body, "text/markdown")}, headers=headers
+        )
+        uploads += 1
+        # Keep the upload game small so it doesn't dominate the database
+        if uploads % 5 == 0:
+            await client.delete(f"/api/admin/games/{upload_game_id}", headers=headers)
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Boot the stack, seed it, run the configured load and return the results"""
+    if args.base_url is not None:
+        return await _drive_load(args, args.base_url, None)
+
+    from app.config import settings
+    from app.services.ai_chat_service import ai_chat_service
+    from main import app
+
+    overrides = {
+        "database_name": args.database,
+        "mongodb_uri": args.mongodb_uri or settings.mongodb_uri,
+        "openai_base_url": settings.openai_base_url,
+        "openai_api_key": settings.openai_api_key
+    }
+    original_lifespan = app.router.lifespan_context
+    servers = []
+    fake_llm = None
+
+    with _patched_settings(**overrides):
+        try:
+            if args.llm == "fake":
+                from benchmarks.fake_openai_server import create_app as create_fake_openai, FakeOpenAIConfig
+
+                fake_llm = create_fake_openai(FakeOpenAIConfig(
+                    latency=args.llm_latency,
+                    error_rate=args.llm_error_rate,
+                    rate_limit_rate=args.llm_rate_limit_rate,
+                    seed=args.seed
+                ))
+                server, task, fake_url = await _start_server(fake_llm)
+                servers.append((server, task))
+                _configure_llm("fake", f"{fake_url}/v1")
+            else:
+                _configure_llm(args.llm, None)
+
+            if args.in_memory:
+                app.router.lifespan_context = _in_memory_lifespan()
+            elif not args.keep_database:
+                from motor.motor_asyncio import AsyncIOMotorClient
+                # Start from an empty benchmark database every run
+                await AsyncIOMotorClient(settings.mongodb_uri).drop_database(args.database)
+
+            server, task, base_url = await _start_server(app)
+            servers.append((server, task))
+
+            return await _drive_load(args, base_url, fake_llm)
+
+        finally:
+            for server, task in reversed(servers):
+                await _stop_server(server, task)
+            app.router.lifespan_context = original_lifespan
+            ai_chat_service.client = None
+
+async def _drive_load(args: argparse.Namespace, base_url: str, fake_llm) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    recorder = LoadRecorder()
+    in_process = args.base_url is None
+
+    limits = httpx.Limits(max_connections=args.concurrency + args.upload_concurrency + 5)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        token = await _get_token(client, args.username, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        if not args.skip_seed:
+            await _seed(client, headers, list(mix))
+
+        if args.warmup > 0:
+            warmup_deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*[
+                _query_worker(i, client, recorder, mix, args, warmup_deadline, {"sent": 0}, None)
+                for i in range(args.concurrency)
+            ])
+
+        recorder.recording = True
+        counter = {"sent": 0}
+        start = time.perf_counter()
+        deadline = start + args.duration
+        workers = [
+            _query_worker(i, client, recorder, mix, args, deadline, counter, args.requests)
+            for i in range(args.concurrency)
+        ]
+        workers.extend(
+            _upload_worker(i, client, recorder, headers, deadline, args.seed)
+            for i in range(args.upload_concurrency)
+        )
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - start
+        recorder.recording = False
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "elapsed_seconds": round(elapsed, 3),
+            "config": {
+                "concurrency": args.concurrency,
+                "upload_concurrency": args.upload_concurrency,
+                "duration": args.duration,
+                "requests": args.requests,
+                "mix": mix,
+                "search_ratio": args.search_ratio,
+                "listing_ratio": args.listing_ratio,
+                "database": "external" if not in_process else ("in-memory" if args.in_memory else "mongod"),
+                "llm": "external" if not in_process else args.llm,
+                "llm_latency": args.llm_latency if in_process and args.llm == "fake" else None,
+                "seed": args.seed
+            }
+        },
+        **recorder.results(elapsed)
+    }
+    if fake_llm is not None:
+        results["llm_server"] = asdict(fake_llm.state.stats)
+    return results
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Tuple[str, str, float, float]]:
+    """(section, name, baseline p95, current p95) for every route and stage present in both runs"""
+    rows = []
+    for section in ("routes", "stages"):
+        for name, stats in current.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if previous:
+                rows.append((section, name, previous["p95_ms"], stats["p95_ms"]))
+    return rows
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"\nLoad test ({results['meta']['elapsed_seconds']}s, commit {results['meta']['git_commit']})")
+    header = f"{'':<42} {'count':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+    for section in ("routes", "stages"):
+        print(f"\n{section.upper()}")
+        print(header)
+        for name, stats in results[section].items():
+            print(
+                f"{name:<42} {stats['count']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+                f"{stats['p50_ms']:>8}ms {stats['p95_ms']:>8}ms {stats['p99_ms']:>8}ms"
+            )
+    if results.get("search_methods"):
+        print(f"\nSearch methods: {results['search_methods']}")
+
+    if baseline:
+        print("\nP95 VS BASELINE")
+        for section, name, before, after in compare_results(results, baseline):
+            change = (after - before) / before * 100 if before else 0.0
+            print(f"{name:<42} {before:>8}ms -> {after:>8}ms ({change:+.1f}%)")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="End-to-end load test for the chat and ingest paths")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--in-memory", action="store_true", help="Use an in-memory Mongo stand-in (mongomock-motor)")
+    target.add_argument("--mongodb-uri", help="Local mongod to run against (default: MONGODB_URI)")
+    target.add_argument("--base-url", help="Drive an already running server instead of booting one")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="Database to use; dropped at the start of each run")
+    parser.add_argument("--keep-database", action="store_true", help="Don't drop the database, e.g. after a corpus_generator bulk load")
+    parser.add_argument("--llm", choices=["fake", "none", "real"], default="fake", help="LLM backend for the in-process app")
+    parser.add_argument("--llm-latency", default="lognormal:0.6,0.4", help="Fake LLM latency distribution")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mix", default="chess=1,root=1", help="Query mix weights per game, e.g. chess=3,root=1")
+    parser.add_argument("--search-ratio", type=float, default=0.0, help="Fraction of requests sent to keyword search")
+    parser.add_argument("--listing-ratio", type=float, default=0.0, help="Fraction of requests sent to the games listing")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent query workers")
+    parser.add_argument("--upload-concurrency", type=int, default=0, help="Concurrent upload workers")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured run length in seconds")
+    parser.add_argument("--requests", type=int, help="Stop after this many query requests")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured warmup in seconds")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--skip-seed", action="store_true", help="Don't upload the bundled rulebooks first")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare p95 latencies against")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+    results = asyncio.run(run_load_test(args))
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(results, baseline)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"\nResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# benchmarks/microbench.py - Pinned microbenchmarks for retrieval, chunking and response-building hot functions
+"""Microbenchmarks with stable fixtures from rules_data/ and seeded synthetic corpora.
+
+Each benchmark reports ops/sec (best of several timed rounds) and the
+allocations of a single call (tracemalloc peak and blocks still held
+when it returns).
+Results can be saved as a baseline and later compared against it; the
+compare mode exits non-zero when a benchmark's ops/sec drops by more than
+the threshold:
+
+    python -m benchmarks.microbench --save-baseline microbench_baseline.json
+    python -m benchmarks.microbench --compare microbench_baseline.json --threshold 0.15
+    python -m benchmarks.microbench --filter score_rules
+
+Baselines are machine-specific; record them on the machine you compare on.
+"""
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+from unittest.mock import patch
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import frontmatter
+
+RULES_DIR = Path(__file__).resolve().parent.parent / "rules_data"
+
+QUERIES = {
+    "chess": ["how do pawns move?", "how does castling work?", "what is checkmate?", "can the knight jump?"],
+    "root": ["how does battle work?", "how do i score victory points?", "what is the eyrie decree?", "can i move through a forest?"]
+}
+
+SYNTHETIC_TERMS = [
+    "move", "piece", "card", "turn", "player", "token", "battle", "score", "clearing", "action",
+    "phase", "board", "capture", "space", "resource", "build", "recruit", "craft", "discard", "draw"
+]
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Callable[[], Any]]  # Returns the zero-argument function to time
+    description: str = ""
+
+def load_rulebook(game: str) -> Tuple[Dict[str, Any], str]:
+    post = frontmatter.loads((RULES_DIR / f"{game}_rules.md").read_text(encoding="utf-8"))
+    return post.metadata, post.content
+
+def rulebook_rules(game: str) -> List[Dict[str, Any]]:
+    """Rule chunks as ingest stores them, built from a bundled rulebook"""
+    from app.services.context_packer import prepare_chunk_for_prompt
+
+    _, content = load_rulebook(game)
+    rules = []
+    for i, section in enumerate(content.split("\n## ")):
+        if not section.strip():
+            continue
+        lines = section.split("\n", 1)
+        title = "Introduction" if i == 0 else lines[0].strip()
+        body = section if i == 0 else f"## {title}\n{lines[1] if len(lines) > 1 else ''}"
+        rules.append(prepare_chunk_for_prompt({
+            "game_id": game,
+            "category_id": f"{game}_general",
+            "title": title,
+            "content": body,
+            "chunk_metadata": {"source_file": f"{game}_rules.md", "section_index": i}
+        }))
+    return rules
+
+def synthetic_rules(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Seeded synthetic rule chunks of realistic size for scale benchmarks"""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        title = f"{rng.choice(SYNTHETIC_TERMS).title()} {rng.choice(SYNTHETIC_TERMS).title()} {i}"
+        paragraphs = [
+            " ".join(rng.choice(SYNTHETIC_TERMS) for _ in range(rng.randint(30, 80))).capitalize() + "."
+            for _ in range(rng.randint(1, 4))
+        ]
+        rules.append({
+            "game_id": "synthetic",
+            "category_id": f"synthetic_{rng.choice(SYNTHETIC_TERMS)}",
+            "title": title,
+            "content": f"## {title}\n" + "\n\n".join(paragraphs),
+            "chunk_metadata": {"section_index": i}
+        })
+    return rules
+
+def _largest_section(game: str) -> str:
+    _, content = load_rulebook(game)
+    return "## " + max(content.split("\n## ")[1:], key=len)
+
+# Benchmark setups
+
+def bench_score_rules(game: str):
+    def setup():
+        from app.routes.chat import score_rules_for_query
+        rules = rulebook_rules(game) if game in QUERIES else synthetic_rules(int(game.split("_")[1]))
+        queries = QUERIES.get(game, QUERIES["root"])
+        return lambda: [score_rules_for_query(rules, q) for q in queries]
+    return setup
+
+def bench_chunk_markdown(game: str):
+    def setup():
+        from app.services.markdown_upload_service import markdown_upload_service
+        metadata, content = load_rulebook(game)
+        parsed = {"metadata": metadata, "content": content, "filename": f"{game}_rules.md"}
+        loop = asyncio.new_event_loop()
+
+        def run():
+            # No database: category registration is a no-op for the benchmark
+            with patch("app.services.markdown_upload_service.games_service.add_category_to_game", new=_noop):
+                return loop.run_until_complete(markdown_upload_service._chunk_markdown_content(parsed))
+        return run
+    return setup
+
+async def _noop(*args, **kwargs):
+    return None
+
+def bench_split_section(game: str):
+    def setup():
+        from app.services.markdown_upload_service import markdown_upload_service
+        section = _largest_section(game)
+        rule_info = markdown_upload_service._extract_rule_info(section)
+        return lambda: markdown_upload_service._split_section_by_tokens(section, rule_info)
+    return setup
+
+def bench_format_context(game: str, candidates: int):
+    def setup():
+        from app.routes.chat import score_rules_for_query
+        from app.services.ai_chat_service import AIChatService
+        service = AIChatService()
+        query = QUERIES[game][0]
+        rules = score_rules_for_query(rulebook_rules(game), query)[:candidates]
+        return lambda: service._format_rules_context(rules, query, game)
+    return setup
+
+def bench_structured_response(game: str):
+    def setup():
+        from app.routes.chat import score_rules_for_query, create_structured_gaming_response
+        query = QUERIES[game][0]
+        rules = score_rules_for_query(rulebook_rules(game), query)[:5]
+        return lambda: create_structured_gaming_response(rules, query, game)
+    return setup
+
+BENCHMARKS = [
+    Benchmark("score_rules_for_query[chess]", bench_score_rules("chess"), "4 queries over the chess rulebook"),
+    Benchmark("score_rules_for_query[root]", bench_score_rules("root"), "4 queries over the Root rulebook"),
+    Benchmark("score_rules_for_query[synthetic_1000]", bench_score_rules("synthetic_1000"), "4 queries over 1000 synthetic rules"),
+    Benchmark("_chunk_markdown_content[root]", bench_chunk_markdown("root"), "Chunk the Root rulebook"),
+    Benchmark("_split_section_by_tokens[root]", bench_split_section("root"), "Split the largest Root section"),
+    Benchmark("_format_rules_context[chess_top15]", bench_format_context("chess", 15), "Pack 15 chess candidates"),
+    Benchmark("_format_rules_context[root_top15]", bench_format_context("root", 15), "Pack 15 Root candidates"),
+    Benchmark("create_structured_gaming_response[chess]", bench_structured_response("chess"), "Template answer from 5 chess rules")
+]
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, rounds: int = 5) -> Dict[str, Any]:
+    """Ops/sec (best and median round) plus allocations of a single call"""
+    func()  # Warm caches and lazy imports
+
+    # Calibrate loops per round so each round runs for at least min_time
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        duration = time.perf_counter() - start
+        if duration >= min_time or loops >= 1_000_000:
+            break
+        loops *= 2 if duration == 0 else max(2, min(10, int(min_time / duration) + 1))
+
+    round_rates = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            round_rates.append(loops / (time.perf_counter() - start))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    round_rates.sort()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline_memory = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline_memory
+        # Taken while the result is alive so its blocks are counted
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+
+    return {
+        "ops_per_sec": round(round_rates[-1], 2),
+        "median_ops_per_sec": round(round_rates[len(round_rates) // 2], 2),
+        "loops_per_round": loops,
+        "rounds": rounds,
+        "alloc_peak_kib": round(peak / 1024, 2),
+        "alloc_blocks": blocks
+    }
+
+def run_benchmarks(name_filter: Optional[str] = None, min_time: float = 0.2, rounds: int = 5) -> Dict[str, Any]:
+    results = {}
+    for bench in BENCHMARKS:
+        if name_filter and name_filter not in bench.name:
+            continue
+        try:
+            func = bench.setup()
+        except Exception as e:
+            # e.g. the tokenizer encoding cannot be loaded offline
+            reason = f"{type(e).__name__}: {str(e)[:80]}"
+            print(f"{bench.name:<45} skipped ({reason})")
+            results[bench.name] = {"skipped": reason}
+            continue
+        results[bench.name] = measure(func, min_time=min_time, rounds=rounds)
+        stats = results[bench.name]
+        print(f"{bench.name:<45} {stats['ops_per_sec']:>12,.1f} ops/s {stats['alloc_peak_kib']:>10.1f} KiB peak {stats['alloc_blocks']:>7} blocks")
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "min_time": min_time, "rounds": rounds},
+        "benchmarks": results
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Regressions where ops/sec fell more than threshold (a fraction) below the baseline"""
+    regressions = []
+    for name, stats in current["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous or "ops_per_sec" not in previous or "ops_per_sec" not in stats:
+            continue
+        change = (stats["ops_per_sec"] - previous["ops_per_sec"]) / previous["ops_per_sec"]
+        print(
+            f"{name:<45} {previous['ops_per_sec']:>12,.1f} -> {stats['ops_per_sec']:>12,.1f} ops/s ({change:+.1%}), "
+            f"peak {previous['alloc_peak_kib']:.1f} -> {stats['alloc_peak_kib']:.1f} KiB"
+        )
+        if change < -threshold:
+            regressions.append({"name": name, "baseline": previous["ops_per_sec"], "current": stats["ops_per_sec"], "change": change})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for retrieval, chunking and response building")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timed round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--save-baseline", help="Write results JSON as the baseline to compare against")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed ops/sec drop before failing (fraction)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter, args.min_time, args.rounds)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Results written to {path}")
+
+    if args.compare:
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%})")
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) regressed: {', '.join(r['name'] for r in regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# benchmarks/retrieval_eval.py - Retrieval quality and latency on labeled queries per bundled rulebook
+"""Retrieval evaluation against the labeled queries in rules_data/{game}_eval.yaml.
+
+Each labeled query lists the chunk titles that answer it, most relevant
+first. Every strategy ranks the game's chunks (built from the bundled
+rulebook as ingest stores them) for every query and is scored with
+recall@k, MRR and nDCG@k (graded by label order). Each search is timed to
+give per-strategy latency; building an index or embedding the chunks is
+reported separately as build time.
+
+Strategies:
+    keyword  score_rules_for_query, the ranking behind /api/chat/query
+    bm25     the inverted index behind /api/chat/search
+    fuzzy    spelling correction of the query, then keyword
+    vector   cosine similarity of OpenAI embeddings; needs OPENAI_API_KEY
+             (OPENAI_BASE_URL may point at the fake server, whose random
+             embeddings make the quality numbers meaningless but the
+             latency ones useful)
+    hybrid   reciprocal rank fusion of keyword and bm25, plus vector when
+             it is evaluated in the same run
+
+    python -m benchmarks.retrieval_eval
+    python -m benchmarks.retrieval_eval --games chess --strategies keyword,fuzzy --output before.json
+    python -m benchmarks.retrieval_eval --compare before.json --threshold 0.02
+
+Compare mode exits non-zero when a strategy's recall@5, MRR or nDCG@5
+drops by more than the threshold.
+"""
+from typing import List, Dict, Any, Callable, Awaitable, Iterable, Optional
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+
+from benchmarks.load_test import percentile
+from benchmarks.microbench import RULES_DIR, load_rulebook, rulebook_rules
+
+Search = Callable[[str], Awaitable[List[str]]]  # Query -> chunk titles, best first
+
+EVAL_K = (1, 3, 5, 10)
+COMPARED_METRICS = ("recall@5", "mrr", "ndcg@5")
+RRF_K = 60  # Reciprocal rank fusion constant; damps the weight of top ranks
+EMBEDDING_CHARS = 24000  # Keeps the largest Root sections inside the embedding model's input limit
+EMBEDDING_CONCURRENCY = 8
+
+def eval_games() -> List[str]:
+    return sorted(path.name[:-len("_eval.yaml")] for path in RULES_DIR.glob("*_eval.yaml"))
+
+def load_eval_set(game: str) -> List[Dict[str, Any]]:
+    import yaml
+
+    return yaml.safe_load((RULES_DIR / f"{game}_eval.yaml").read_text(encoding="utf-8")) or []
+
+# Metrics
+
+def recall_at_k(ranked: List[str], relevant: List[str], k: int) -> float:
+    return len(set(ranked[:k]) & set(relevant)) / len(relevant) if relevant else 0.0
+
+def reciprocal_rank(ranked: List[str], relevant: List[str], depth: int) -> float:
+    for rank, title in enumerate(ranked[:depth], 1):
+        if title in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def ndcg_at_k(ranked: List[str], relevant: List[str], k: int) -> float:
+    """nDCG with graded relevance: the first label gets the highest grade"""
+    grades = {title: len(relevant) - i for i, title in enumerate(relevant)}
+    dcg = sum((2 ** grades.get(title, 0) - 1) / math.log2(rank + 1) for rank, title in enumerate(ranked[:k], 1))
+    ideal = sum((2 ** grade - 1) / math.log2(rank + 1) for rank, grade in enumerate(sorted(grades.values(), reverse=True)[:k], 1))
+    return dcg / ideal if ideal else 0.0
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, title in enumerate(ranking, 1):
+            scores[title] = scores.get(title, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda title: -scores[title])
+
+def _titles(rules: Iterable[Dict[str, Any]]) -> List[str]:
+    """Distinct titles in rank order, so split chunks of one section count once"""
+    return list(dict.fromkeys(rule["title"] for rule in rules))
+
+# Strategies: each builds its search function for one game's chunks
+
+async def build_keyword(game: str, rules: List[Dict[str, Any]], built: Dict[str, Search]) -> Search:
+    from app.routes.chat import score_rules_for_query
+
+    async def search(query: str) -> List[str]:
+        return _titles(score_rules_for_query(rules, query.lower()))
+    return search
+
+async def build_bm25(game: str, rules: List[Dict[str, Any]], built: Dict[str, Search]) -> Search:
+    from app.services.search_index import RuleIndex
+
+    index = RuleIndex(rules)
+
+    async def search(query: str) -> List[str]:
+        return _titles(hit["rule"] for hit in index.search(query, limit=len(rules))[1])
+    return search
+
+async def build_fuzzy(game: str, rules: List[Dict[str, Any]], built: Dict[str, Search]) -> Search:
+    from app.routes.chat import score_rules_for_query
+    from app.services.spelling import SymSpell, build_vocabulary
+
+    speller = SymSpell(build_vocabulary(rules, load_rulebook(game)[0].get("boost_rules")))
+
+    async def search(query: str) -> List[str]:
+        corrected, _ = speller.correct(query)
+        return _titles(score_rules_for_query(rules, corrected))
+    return search
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+async def build_vector(game: str, rules: List[Dict[str, Any]], built: Dict[str, Search]) -> Search:
+    from app.services.ai_service import ai_service
+
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def embed(text: str) -> List[float]:
+        async with semaphore:
+            return _normalize(await ai_service.generate_embedding(text[:EMBEDDING_CHARS]))
+
+    vectors = await asyncio.gather(*(embed(f"{rule['title']}\n{rule['content']}") for rule in rules))
+
+    async def search(query: str) -> List[str]:
+        query_vector = await embed(query)
+        scores = [sum(a * b for a, b in zip(query_vector, vector)) for vector in vectors]
+        return _titles(rules[i] for i in sorted(range(len(rules)), key=lambda i: -scores[i]))
+    return search
+
+async def build_hybrid(game: str, rules: List[Dict[str, Any]], built: Dict[str, Search]) -> Search:
+    components = [
+        built.get("keyword") or await build_keyword(game, rules, built),
+        built.get("bm25") or await build_bm25(game, rules, built)
+    ]
+    if "vector" in built:
+        components.append(built["vector"])
+
+    async def search(query: str) -> List[str]:
+        return reciprocal_rank_fusion(await asyncio.gather(*(component(query) for component in components)))
+    return search
+
+# Hybrid is built last so it can reuse the others
+STRATEGIES = {
+    "keyword": build_keyword,
+    "bm25": build_bm25,
+    "fuzzy": build_fuzzy,
+    "vector": build_vector,
+    "hybrid": build_hybrid
+}
+
+# Runner
+
+async def evaluate_strategy(search: Search, queries: List[Dict[str, Any]], repeat: int = 3) -> Dict[str, Any]:
+    """Mean quality metrics over the labeled queries plus search latency"""
+    depth = max(EVAL_K)
+    latencies = []
+    per_query = []
+    for item in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ranked = await search(item["query"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        relevant = item["relevant"]
+        scores = {f"recall@{k}": recall_at_k(ranked, relevant, k) for k in EVAL_K}
+        scores["mrr"] = reciprocal_rank(ranked, relevant, depth)
+        scores.update({f"ndcg@{k}": ndcg_at_k(ranked, relevant, k) for k in EVAL_K})
+        per_query.append({"query": item["query"], "relevant": relevant, "top": ranked[:3], **scores})
+
+    metrics = {name: round(sum(q[name] for q in per_query) / len(per_query), 4) for name in per_query[0] if name not in ("query", "relevant", "top")}
+    return {
+        **metrics,
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p95_ms": round(percentile(latencies, 95), 3),
+        "latency_mean_ms": round(sum(latencies) / len(latencies), 3),
+        "queries": per_query
+    }
+
+async def evaluate_game(game: str, strategies: List[str], repeat: int = 3) -> Dict[str, Any]:
+    rules = rulebook_rules(game)
+    queries = load_eval_set(game)
+    built: Dict[str, Search] = {}
+    results = {}
+    for name in sorted(strategies, key=list(STRATEGIES).index):
+        start = time.perf_counter()
+        try:
+            built[name] = await STRATEGIES[name](game, rules, built)
+        except Exception as e:
+            # e.g. no OpenAI API key for the vector strategy
+            reason = f"{type(e).__name__}: {str(e)[:80]}"
+            print(f"{game:<8} {name:<8} skipped ({reason})")
+            results[name] = {"skipped": reason}
+            continue
+        build_ms = round((time.perf_counter() - start) * 1000, 3)
+        results[name] = {**await evaluate_strategy(built[name], queries, repeat), "build_ms": build_ms}
+        stats = results[name]
+        print(
+            f"{game:<8} {name:<8} R@1 {stats['recall@1']:.3f}  R@5 {stats['recall@5']:.3f}  MRR {stats['mrr']:.3f}  "
+            f"nDCG@5 {stats['ndcg@5']:.3f}  p50 {stats['latency_p50_ms']:>8.3f} ms  p95 {stats['latency_p95_ms']:>8.3f} ms"
+        )
+    return {"chunks": len(rules), "queries": len(queries), "strategies": results}
+
+async def run_eval(games: Optional[List[str]] = None, strategies: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, Any]:
+    strategies = strategies or list(STRATEGIES)
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "repeat": repeat, "k": list(EVAL_K)},
+        "games": {game: await evaluate_game(game, strategies, repeat) for game in games or eval_games()}
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Regressions where a quality metric fell more than threshold (absolute) below the baseline"""
+    regressions = []
+    for game, result in current["games"].items():
+        for name, stats in result["strategies"].items():
+            previous = baseline.get("games", {}).get(game, {}).get("strategies", {}).get(name)
+            if not previous or "skipped" in previous or "skipped" in stats:
+                continue
+            changes = ", ".join(f"{metric} {previous[metric]:.3f} -> {stats[metric]:.3f}" for metric in COMPARED_METRICS)
+            print(f"{game:<8} {name:<8} {changes}, p50 {previous['latency_p50_ms']:.3f} -> {stats['latency_p50_ms']:.3f} ms")
+            for metric in COMPARED_METRICS:
+                if stats[metric] < previous[metric] - threshold:
+                    regressions.append({"game": game, "strategy": name, "metric": metric, "baseline": previous[metric], "current": stats[metric]})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency on labeled queries")
+    parser.add_argument("--games", help="Comma-separated games (default: every rules_data/*_eval.yaml)")
+    parser.add_argument("--strategies", help=f"Comma-separated strategies (default: {','.join(STRATEGIES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed searches per query")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.02, help="Allowed metric drop before failing (absolute)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_eval(
+        args.games.split(",") if args.games else None,
+        args.strategies.split(",") if args.strategies else None,
+        args.repeat
+    ))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        print(f"\nCompared with {args.compare} (threshold {args.threshold})")
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            names = ", ".join(f"{r['game']}/{r['strategy']} {r['metric']}" for r in regressions)
+            print(f"\n❌ {len(regressions)} metric(s) regressed: {names}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,35 @@
 # main.py - Proper version with correct imports
 import os
+import asyncio
+import time
 from dotenv import load_dotenv
 
 # Load environment variables before any other imports
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from contextlib import asynccontextmanager
 from datetime import datetime
-from passlib.context import CryptContext
 
 # Import database and config
 from app.database import connect_to_mongo, close_mongo_connection, get_database
 from app.config import settings
 
 # Import auth service functions
-from app.services.auth_service import create_access_token, verify_token, get_current_user
+from app.services.auth_service import create_access_token, verify_token, get_current_user, verify_password, get_password_hash, VISITOR_COOKIE, VISITOR_COOKIE_MAX_AGE
+from app.services.metrics import metrics
+from app.services.profiling import start_request_profile, finish_request_profile
+from app.services.ai_chat_service import ai_chat_service
+from app.services.usage_tracker import ensure_usage_indexes
+from app.services.conversation_service import conversation_service
+from app.services.answer_registry import answer_registry
+from app.services.precompute_service import precompute_service
+from app.services.query_log import query_log, ensure_query_log_indexes
+from app.services.corpus_cache import warm_top_games
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,8 +37,56 @@ async def lifespan(app: FastAPI):
     await connect_to_mongo()
     print("✅ Connected to MongoDB")
     print("✅ Tabletop Rules API ready")
+    metrics_task = None
+    if settings.metrics_multiprocess_dir:
+        metrics_task = asyncio.create_task(metrics.flush_periodically(settings.metrics_flush_seconds))
+    if get_database() is not None:
+        try:
+            await ensure_usage_indexes(get_database(), settings.usage_rollup_retention_days)
+        except Exception as e:
+            print(f"Could not create usage rollup indexes: {e}")
+        try:
+            await conversation_service.ensure_indexes()
+        except Exception as e:
+            print(f"Could not create conversation indexes: {e}")
+        try:
+            await precompute_service.ensure_indexes(get_database())
+        except Exception as e:
+            print(f"Could not create precomputed answer indexes: {e}")
+        try:
+            await ensure_query_log_indexes(get_database(), settings.query_log_retention_days)
+        except Exception as e:
+            print(f"Could not create query log indexes: {e}")
+        try:
+            await answer_registry.ensure_indexes(get_database())
+            await answer_registry.load(get_database())
+            print(f"✅ Loaded precomputed answers for {len(answer_registry.games)} games")
+        except Exception as e:
+            print(f"Could not load stored answers: {e}")
+        try:
+            warmed = await asyncio.wait_for(warm_top_games(get_database(), settings.warm_top_games), settings.warm_timeout_seconds)
+            print(f"✅ Warmed {len(warmed)} games")
+        except Exception as e:
+            print(f"Could not warm games: {e!r}")
+    usage_task = asyncio.create_task(ai_chat_service.usage.flush_periodically(get_database, settings.usage_flush_seconds))
+    answers_task = asyncio.create_task(answer_registry.reload_periodically(get_database, settings.answer_registry_reload_seconds))
+    query_log_task = asyncio.create_task(query_log.flush_periodically(get_database, settings.query_log_flush_seconds))
     yield
     # Shutdown
+    if metrics_task:
+        metrics_task.cancel()
+        metrics.write_snapshot()
+    usage_task.cancel()
+    answers_task.cancel()
+    query_log_task.cancel()
+    try:
+        await query_log.flush(get_database())
+    except Exception as e:
+        print(f"Failed to flush query log: {e}")
+    try:
+        await ai_chat_service.usage.flush(get_database())
+    except Exception as e:
+        print(f"Failed to flush usage rollups: {e}")
     await close_mongo_connection()
     print("❌ Disconnected from MongoDB")
 
@@ -45,11 +104,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route request counts, latency histograms, the in-flight gauge and stage profiles"""
+    start_time = time.perf_counter()
+    status_code = 500
+    profile = start_request_profile(request.method, request.url.path)
+    with metrics.track_in_flight("http_requests_in_flight"):
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            if settings.server_timing_enabled:
+                # Stages that ran before the response started; streamed bodies are not included
+                profile.duration = time.perf_counter() - profile.start
+                response.headers["Server-Timing"] = profile.server_timing()
+            return response
+        finally:
+            # Label by route template, not raw path, to keep label cardinality bounded
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            metrics.observe("http_request_duration_seconds", time.perf_counter() - start_time, method=request.method, route=route_path)
+            metrics.inc("http_requests_total", method=request.method, route=route_path, status=str(status_code))
+            finish_request_profile(profile, route_path, status_code)
+
+@app.middleware("http")
+async def issue_visitor_cookie(request: Request, call_next):
+    """Send the signed visitor ID issued to an anonymous caller during this request"""
+    response = await call_next(request)
+    visitor_cookie = getattr(request.state, "visitor_cookie", None)
+    if visitor_cookie:
+        response.set_cookie(VISITOR_COOKIE, visitor_cookie, max_age=VISITOR_COOKIE_MAX_AGE, httponly=True, samesite="lax")
+    return response
+
 # Authentication setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Auth endpoints
 @app.post("/token")
@@ -98,7 +189,7 @@ async def register_user(user_data: dict, db: AsyncIOMotorDatabase = Depends(get_
                 raise HTTPException(status_code=400, detail="Email already exists")
         
         # Hash password
-        hashed_password = pwd_context.hash(user_data["password"])
+        hashed_password = get_password_hash(user_data["password"])
         
         # Create user document
         user_doc = {
@@ -144,7 +235,7 @@ async def login_user(login_data: dict, db: AsyncIOMotorDatabase = Depends(get_da
         # Find user in database
         user = await db.users.find_one({"username": username})
         
-        if not user or not pwd_context.verify(password, user["hashed_password"]):
+        if not user or not verify_password(password, user["hashed_password"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Create access token
@@ -203,6 +294,11 @@ async def health_check():
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition of request, stage, token, ingest and cache metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Simple test endpoint
 @app.get("/test")
 async def test_endpoint():
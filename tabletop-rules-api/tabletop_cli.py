@@ -10,6 +10,7 @@ Usage:
     python tabletop_cli.py upload rules_data/chess_rules.md
     python tabletop_cli.py list-games
     python tabletop_cli.py validate chess
+    python tabletop_cli.py ask-batch questions.txt --game chess
 """
 
 import os
@@ -152,6 +153,19 @@ class TabletopAPI:
                 })
         return results
     
+    async def ask_batch(self, questions: List[Dict[str, Any]], concurrency: Optional[int] = None):
+        """Ask many questions at once, yielding each answer as the backend streams it."""
+        payload = {"questions": questions, "concurrency": concurrency}
+        async with self.client.stream(
+            "POST", f"{self.base_url}/api/chat/batch", json=payload, timeout=None
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+    
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
@@ -438,6 +452,71 @@ def validate_game(
     
     asyncio.run(_validate())
 
+def load_questions(file_path: Path, game_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Questions from a JSON list, NDJSON, or a text file with one question per line."""
+    text = file_path.read_text(encoding="utf-8")
+    if file_path.suffix == ".json":
+        questions = json.loads(text)
+    elif file_path.suffix in (".ndjson", ".jsonl"):
+        questions = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        questions = [{"query": line.strip()} for line in text.splitlines() if line.strip()]
+    for question in questions:
+        if game_id:
+            question.setdefault("game_system", game_id)
+        if not question.get("game_system"):
+            raise typer.BadParameter(f"No game for question '{question.get('query')}'; pass --game")
+    return questions
+
+@app.command("ask-batch")
+def ask_batch(
+    file_path: Path = typer.Argument(..., help="Questions as .json, .ndjson/.jsonl or one per line"),
+    game_id: Optional[str] = typer.Option(None, "--game", "-g", help="Game for questions that do not name one"),
+    concurrency: Optional[int] = typer.Option(None, "--concurrency", "-c", help="Answers generated at once"),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write every answer line to this NDJSON file")
+):
+    """❓ Ask many rules questions in one request, printing answers as they arrive."""
+    async def _ask_batch():
+        if not file_path.exists():
+            console.print(f"[red]File not found:[/red] {file_path}")
+            raise typer.Exit(1)
+        
+        questions = load_questions(file_path, game_id)
+        console.print(f"[blue]Asking {len(questions)} questions...[/blue]")
+        
+        out = open(output, "w", encoding="utf-8") if output else None
+        try:
+            async for line in api_client.ask_batch(questions, concurrency):
+                if out:
+                    out.write(json.dumps(line) + "\n")
+                if line.get("done"):
+                    console.print(Panel(
+                        f"Answered: [green]{line['count'] - line['errors']}[/green]\n"
+                        f"Failed: [red]{line['errors']}[/red]\n"
+                        f"Time: {line['duration_ms'] / 1000:.1f}s",
+                        title="Batch Results"
+                    ))
+                    continue
+                
+                question = questions[line["index"]]
+                label = line.get("id") or f"#{line['index'] + 1}"
+                if line.get("error"):
+                    console.print(f"[red]✗ {label}[/red] {question['query']}: {line['error']}")
+                    continue
+                summary = line["structured_response"]["content"]["summary"]["text"]
+                console.print(f"[green]✓ {label}[/green] [bold]{question['query']}[/bold] [dim]({line['search_method']})[/dim]")
+                console.print(f"  {summary}")
+            
+        except Exception as e:
+            console.print(f"[red]Batch questions failed:[/red] {str(e)}")
+            raise typer.Exit(1)
+        finally:
+            if out:
+                out.close()
+            await api_client.close()
+    
+    asyncio.run(_ask_batch())
+
 @app.command("status")
 def status():
     """📊 Show backend status and connection info."""
@@ -6,6 +6,30 @@ from app.services.ai_chat_service import AIChatService
 from openai import AsyncOpenAI
 
 
+class FakeStream:
+    """Async iterator of streamed chat completion chunks, usage in the last one"""
+    
+    def __init__(self, text, prompt_tokens, completion_tokens, words_per_chunk=5):
+        words = text.split(" ")
+        self.chunks = []
+        for i in range(0, len(words), words_per_chunk):
+            chunk = MagicMock(usage=None)
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = " ".join(words[i:i + words_per_chunk]) + " "
+            self.chunks.append(chunk)
+        usage_chunk = MagicMock(choices=[])
+        usage_chunk.usage.prompt_tokens = prompt_tokens
+        usage_chunk.usage.completion_tokens = completion_tokens
+        self.chunks.append(usage_chunk)
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
 class TestAIChatService:
     """Test suite for AI Chat Service"""
     
@@ -19,10 +43,8 @@ class TestAIChatService:
     
     @pytest.fixture
     def mock_openai_response(self):
-        """Mock OpenAI API response"""
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message.content = """**Pawns move one square forward, or two squares forward on their first move.**
+        """Mock streamed OpenAI API response"""
+        return FakeStream("""**Pawns move one square forward, or two squares forward on their first move.**
 
 Pawns are unique pieces with special movement rules. They move straight forward one square to an unoccupied square. On a pawn's very first move from its starting position, it has the option to advance two squares forward instead of one, provided both squares are unoccupied.
 
@@ -30,12 +52,7 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
 
 **Related Rules**
 • **En Passant**: Special pawn capture rule when opponent pawn moves two squares
-• **Pawn Promotion**: Pawns reaching the opposite end transform into any piece"""
-        
-        mock_response.usage = MagicMock()
-        mock_response.usage.prompt_tokens = 150
-        mock_response.usage.completion_tokens = 100
-        return mock_response
+• **Pawn Promotion**: Pawns reaching the opposite end transform into any piece""", prompt_tokens=150, completion_tokens=100)
     
     @pytest.fixture
     def sample_rules(self):
@@ -79,6 +96,7 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
     def test_ensure_client_success(self, mock_openai_class, mock_settings, ai_service):
         """Test successful client initialization"""
         mock_settings.openai_api_key = "sk-test-key"
+        mock_settings.openai_base_url = None
         mock_client = AsyncMock()
         mock_openai_class.return_value = mock_client
         
@@ -87,6 +105,17 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
         assert ai_service.client is mock_client
         mock_openai_class.assert_called_once_with(api_key="sk-test-key")
     
+    @patch('app.services.ai_chat_service.settings')
+    @patch('app.services.ai_chat_service.AsyncOpenAI')
+    def test_ensure_client_custom_base_url(self, mock_openai_class, mock_settings, ai_service):
+        """Test client points at an alternate OpenAI-compatible endpoint when configured"""
+        mock_settings.openai_api_key = "sk-test-key"
+        mock_settings.openai_base_url = "http://localhost:8100/v1"
+        
+        ai_service._ensure_client()
+        
+        mock_openai_class.assert_called_once_with(api_key="sk-test-key", base_url="http://localhost:8100/v1")
+    
     def test_calculate_cost_gpt4o_mini(self, ai_service):
         """Test cost calculation for GPT-4o-mini"""
         # Test with 1000 input tokens and 500 output tokens
@@ -141,17 +170,24 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
         assert "Category: movement" in context
     
     def test_format_rules_context_truncate_long_content(self, ai_service):
-        """Test context formatting truncates long content"""
+        """Test context formatting keeps content that fits the budget and truncates content that doesn't"""
         long_rule = {
             "title": "Long Rule",
-            "content": "A" * 600,  # Very long content
+            "content": "A" * 600,  # Fits comfortably in the token budget
             "category_id": "test"
         }
         
         context = ai_service._format_rules_context([long_rule], "test", "chess")
+        assert "A" * 600 in context
         
-        # Should be truncated to 500 chars + "..."
-        assert "A" * 500 + "..." in context
+        huge_rule = {**long_rule, "content": "A" * 20000}
+        context, stats = ai_service._build_rules_context([huge_rule], "test", "chess", budget_tokens=200)
+        
+        # Should be truncated to the budget + "..."
+        assert "..." in context
+        assert "A" * 1000 not in context
+        assert stats["truncated_chunks"] == 1
+        assert stats["tokens_saved"] > 0
     
     def test_create_system_prompt(self, ai_service):
         """Test system prompt creation"""
@@ -190,6 +226,9 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
         
         # Check usage was logged
         assert len(ai_service.usage_log) == 1
+        assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+        assert ai_service.call_overhead_seconds is not None
+        assert ai_service.seconds_per_output_token is not None
     
     @pytest.mark.asyncio
     async def test_generate_rule_response_api_error(self, ai_service, sample_rules):
@@ -292,5 +331,127 @@ Example: A pawn on e2 can move to e3, or jump to e4 on its first move.
         mock_client.aclose.assert_called_once()
 
 
+
+class TestLLMBudgets:
+    """Test suite for pre-flight token counting and budget enforcement"""
+    
+    @pytest.fixture
+    def ai_service(self):
+        service = AIChatService()
+        service.max_prompt_tokens = 3000
+        service.max_output_tokens = 800
+        service.min_output_tokens = 150
+        service.max_cost_per_request = 0.001
+        service.target_latency_seconds = 6.0
+        return service
+    
+    @pytest.fixture
+    def long_rules(self):
+        return [
+            {
+                "title": f"Rule {i}",
+                "content": " ".join(f"Step {j} of rule {i}: players move pieces across the board." for j in range(40)),
+                "category_id": "general"
+            }
+            for i in range(20)
+        ]
+    
+    def test_prompt_within_budget(self, ai_service, long_rules):
+        """Test a normal request goes to the LLM with the full max_tokens"""
+        messages, _, budget = ai_service._prepare_request("How do pieces move?", "chess", long_rules[:2])
+        
+        assert budget["decision"] == "llm"
+        assert budget["prompt_tokens"] == ai_service._count_prompt_tokens(messages)
+        assert budget["max_tokens"] == 800
+        assert budget["context_shrunk"] is False
+    
+    def test_oversized_prompt_shrinks_context(self, ai_service, long_rules):
+        """Test the context budget is reduced until the prompt fits"""
+        ai_service.context_token_budget = 5000
+        ai_service.max_prompt_tokens = 1200
+        
+        messages, context_stats, budget = ai_service._prepare_request("How do pieces move?", "chess", long_rules)
+        
+        assert budget["context_shrunk"] is True
+        assert budget["prompt_tokens"] <= 1200
+        assert context_stats["budget_tokens"] < 5000
+        assert ai_service.budget_stats["context_shrunk"] == 1
+    
+    def test_cost_budget_lowers_max_tokens(self, ai_service):
+        """Test max_tokens is reduced to stay under the cost cap"""
+        ai_service.max_cost_per_request = 0.0006
+        
+        plan = ai_service._plan_output_budget("gpt-4o-mini", 2000)
+        
+        # $0.0003 of input leaves $0.0003 for output at $0.60/1M
+        assert plan["max_tokens"] == 500
+        assert plan["limited_by"] == ["cost"]
+        assert plan["estimated_max_cost"] <= 0.0006
+    
+    def test_latency_budget_lowers_max_tokens(self, ai_service):
+        """Test max_tokens follows the observed generation speed"""
+        ai_service.seconds_per_output_token = 0.02
+        
+        plan = ai_service._plan_output_budget("gpt-4o-mini", 500)
+        
+        assert plan["max_tokens"] == 300
+        assert plan["limited_by"] == ["latency"]
+    
+    def test_latency_overhead_not_counted_per_token(self, ai_service):
+        """Test a slow first token does not inflate the per-token cost"""
+        # 3s call with 40 tokens: 2.6s until the first token, 0.4s for the other 39
+        ai_service._record_latency(2.6, 0.4, 40)
+        
+        plan = ai_service._plan_output_budget("gpt-4o-mini", 500)
+        
+        assert ai_service.call_overhead_seconds == 2.6
+        assert plan["max_tokens"] == int((6.0 - 2.6) / (0.4 / 39))
+        assert plan["max_tokens"] >= ai_service.min_output_tokens
+    
+    def test_stale_latency_estimate_lets_probe_through(self, ai_service):
+        """Test a slow estimate serves templates only until the next probe is due"""
+        ai_service.latency_probe_seconds = 60
+        ai_service._record_latency(5.5, 4.0, 101)  # Only ~12 tokens fit in the target
+        
+        blocked = ai_service._plan_output_budget("gpt-4o-mini", 500)
+        ai_service.latency_measured_at -= 61
+        probe = ai_service._plan_output_budget("gpt-4o-mini", 500)
+        after_probe = ai_service._plan_output_budget("gpt-4o-mini", 500)
+        
+        assert blocked["max_tokens"] < ai_service.min_output_tokens
+        assert probe["max_tokens"] == ai_service.min_output_tokens
+        assert "latency_probe" in probe["limited_by"]
+        assert after_probe["max_tokens"] < ai_service.min_output_tokens
+        assert ai_service.budget_stats["latency_probes"] == 1
+    
+    def test_history_counted_in_prompt(self, ai_service, long_rules):
+        """Test conversation history sits between the system prompt and the question"""
+        history = [
+            {"role": "user", "content": "How do pawns move?"},
+            {"role": "assistant", "content": "One square forward."}
+        ]
+        
+        without_history, _, plain = ai_service._prepare_request("And castling?", "chess", long_rules[:2])
+        messages, _, budget = ai_service._prepare_request("And castling?", "chess", long_rules[:2], history=history)
+        
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "user"]
+        assert budget["prompt_tokens"] > plain["prompt_tokens"]
+    
+    @pytest.mark.asyncio
+    @patch('app.services.ai_chat_service.settings')
+    async def test_over_budget_skips_llm(self, mock_settings, ai_service, long_rules):
+        """Test the template path is chosen without calling the LLM"""
+        mock_settings.openai_api_key = "sk-test-key"
+        ai_service.client = AsyncMock()
+        ai_service.max_cost_per_request = 0.00001
+        
+        result = await ai_service.generate_rule_response("How do pieces move?", "chess", long_rules)
+        
+        assert result["fallback_required"] is True
+        assert result["error_type"] == "BudgetExceeded"
+        assert result["budget"]["decision"] == "template"
+        ai_service.client.chat.completions.create.assert_not_called()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,117 @@
+# tests/test_answer_registry.py - Tests for precomputed per-game template answers
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.services.answer_registry import AnswerRegistry, normalize_query, detect_intent, validate_answer
+from app.routes.chat import create_structured_gaming_response
+
+RULES = [
+    {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square. On their first move they may advance two squares instead.", "category_id": "movement"},
+    {"game_id": "chess", "title": "Pawn Promotion", "content": "A pawn reaching the last rank is promoted.", "category_id": "special"}
+]
+
+
+class TestIntentMatching:
+    """Test suite for question normalization and intent lookup"""
+
+    @pytest.fixture
+    def registry(self):
+        return AnswerRegistry()
+
+    def test_normalize_and_detect_intent(self):
+        assert normalize_query("What's castling?") == ["whats", "castling"]
+        assert detect_intent(normalize_query("How do pawns move?")) == "move"
+        assert detect_intent(normalize_query("Can the king castle?")) == "can"
+        assert detect_intent(normalize_query("What is checkmate?")) == "what"
+        assert detect_intent(normalize_query("Tell me about checkmate")) == "about"
+
+    @pytest.mark.parametrize("game_id,query,expected", [
+        ("chess", "How do pawns move?", "move:pawn"),
+        ("chess", "how does the KNIGHT move", "move:knight"),
+        ("chess", "Can the king castle?", "can:castling"),
+        ("chess", "What is checkmate?", "about:checkmate"),
+        ("chess", "What is check?", "about:check"),
+        ("chess", "Explain en passant", "about:en passant"),
+        ("root", "How do I win?", "about:victory points"),
+        ("root", "What does it mean to rule a clearing?", "about:ruling")
+    ])
+    def test_bundled_answers_match(self, registry, game_id, query, expected):
+        assert registry.match(game_id, query)["intent_key"] == expected
+
+    def test_no_match(self, registry):
+        assert registry.match("chess", "Who invented this game?") is None
+        assert registry.match("unknown_game", "How do pawns move?") is None
+
+    def test_put_overrides_and_remove_restores_bundled(self, registry):
+        bundled_summary = registry.match("chess", "How do pawns move?")["summary"]
+        registry.put("chess", validate_answer("move", "pawn", {"summary": "**Forward.**", "aliases": ["pawns"]}))
+        assert registry.match("chess", "How do pawns move?")["summary"] == "**Forward.**"
+
+        registry.remove("chess", "move:pawn")
+
+        assert registry.match("chess", "How do pawns move?")["summary"] == bundled_summary
+
+    def test_validate_rejects_bad_answers(self):
+        with pytest.raises(ValueError):
+            validate_answer("dance", "pawn", {"summary": "x"})
+        with pytest.raises(ValueError):
+            validate_answer("move", "pawn", {})
+        with pytest.raises(ValueError):
+            validate_answer("move", "pawn", {"related": "not a list"})
+
+
+class TestTemplateResponse:
+    """Test suite for template responses built from registry answers"""
+
+    def test_uses_precomputed_answer(self):
+        response = create_structured_gaming_response(RULES, "How do pawns move?", "chess")
+        section = response.content["sections"][0].content
+
+        assert response.content["summary"]["text"].startswith("**Pawns move one square forward")
+        assert "• **En Passant**" in section
+
+    def test_unmatched_question_uses_rule_content(self):
+        response = create_structured_gaming_response(RULES, "Tell me about promotion", "chess")
+        section = response.content["sections"][0].content
+
+        assert response.content["summary"]["text"].startswith("**Found specific rules about")
+        assert "Pawns move forward one square" in section
+        assert "• **Pawn Promotion**" in section
+
+
+class TestAnswerEndpoints:
+    """Test suite for the admin answer endpoints"""
+
+    def test_put_list_delete(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.auth_service import get_admin_user
+        from app.services.answer_registry import answer_registry
+
+        db = mongomock_motor.AsyncMongoMockClient()["answers_test"]
+        app.dependency_overrides[get_database] = lambda: db
+        app.dependency_overrides[get_admin_user] = lambda: {"username": "admin"}
+        try:
+            client = TestClient(app)
+            bad = client.put("/api/admin/games/go/answers/dance:ko", json={"summary": "x"})
+            stored = client.put("/api/admin/games/go/answers/about:ko", json={"summary": "**Ko forbids repeating the board.**"})
+            listed = client.get("/api/admin/games/go/answers")
+            matched = answer_registry.match("go", "What is ko?")
+            deleted = client.delete("/api/admin/games/go/answers/about:ko")
+            missing = client.delete("/api/admin/games/go/answers/about:ko")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert bad.status_code == 400
+        assert stored.json()["intent_key"] == "about:ko"
+        assert listed.json()["total"] == 1
+        assert matched["summary"] == "**Ko forbids repeating the board.**"
+        assert asyncio.run(db.answers.count_documents({})) == 0
+        assert deleted.status_code == 200
+        assert missing.status_code == 404
+        assert answer_registry.match("go", "What is ko?") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
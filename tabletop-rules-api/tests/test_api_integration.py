@@ -177,11 +177,12 @@ class TestAPIIntegration:
             }
         ]
         
-        context = service._format_rules_context(long_rules, "test", "chess")
+        context, stats = service._build_rules_context(long_rules, "test", "chess", budget_tokens=100)
         
-        # Should be truncated to 500 chars + "..."
-        assert "A" * 500 + "..." in context
+        # Should be truncated to the token budget + "..."
+        assert "..." in context
         assert "A" * 600 not in context
+        assert stats["packed_tokens"] <= 100
 
 
 class TestBasicAPIHealth:
@@ -0,0 +1,101 @@
+# tests/test_batch_query.py - Tests for batch questions streamed as NDJSON
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.routes.chat import score_rules_for_queries, score_rules_for_query
+
+RULES = [
+    {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square.", "category_id": "movement"},
+    {"game_id": "chess", "title": "Castling", "content": "The king moves two squares towards a rook.", "category_id": "special"},
+    {"game_id": "root", "title": "Battle", "content": "In battle the attacker rolls two dice.", "category_id": "actions"}
+]
+
+
+class TestScoreRulesForQueries:
+    """Test suite for ranking several queries in one pass"""
+
+    def test_matches_ranking_each_query_alone(self):
+        rules = [dict(rule) for rule in RULES[:2]]
+        queries = ["how do pawns move", "can the king castle", "what about bishops"]
+
+        assert score_rules_for_queries(rules, queries) == [score_rules_for_query(rules, q) for q in queries]
+
+
+class TestBatchEndpoint:
+    """Test suite for /api/chat/batch"""
+
+    @pytest.fixture
+    def client(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.corpus_cache import corpus_cache
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["batch_test"]
+        asyncio.run(db.content_chunks.insert_many([dict(rule) for rule in RULES]))
+        corpus_cache.clear()
+        search_indexes.corpus.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        yield TestClient(app)
+        app.dependency_overrides.clear()
+        corpus_cache.clear()
+        search_indexes.corpus.clear()
+
+    def test_answers_streamed_with_bounded_concurrency(self, client):
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_llm(query, game_id, rules_context, history=None):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.05)
+            in_flight["now"] -= 1
+            return {"ai_powered": True, "response": f"{game_id}: {rules_context[0]['title']}"}
+
+        questions = [
+            {"query": "How do pawns move?", "game_system": "chess", "id": "q1"},
+            {"query": "Can the king castle?", "game_system": "Chess", "id": "q2"},
+            {"query": "How does battle work?", "game_system": "root", "id": "q3"},
+            {"query": "What about the rook?", "game_system": "chess"},
+            {"query": "Anything at all?", "game_system": "monopoly", "id": "q5"}
+        ]
+        with patch(
+            "app.services.ai_chat_service.ai_chat_service.generate_rule_response_guarded",
+            side_effect=fake_llm
+        ):
+            response = client.post("/api/chat/batch", json={"questions": questions, "concurrency": 2})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        summary = lines.pop()
+        answers = {line["index"]: line for line in lines}
+
+        assert summary["done"] is True
+        assert summary["count"] == 5
+        assert summary["errors"] == 0
+        assert sorted(answers) == [0, 1, 2, 3, 4]
+        assert [answers[i]["id"] for i in range(5)] == ["q1", "q2", "q3", None, "q5"]
+        assert answers[0]["search_method"] == "ai_powered_gpt4o_mini"
+        assert answers[1]["game_system"] == "chess"
+        assert "Castling" in str(answers[1]["structured_response"])
+        assert "root: Battle" in str(answers[2]["structured_response"])
+        assert answers[4]["search_method"] == "enhanced_scoring"
+        assert in_flight["max"] == 2
+
+    def test_rejects_empty_and_oversized_batches(self, client):
+        from app.config import settings
+
+        question = {"query": "How do pawns move?", "game_system": "chess"}
+        empty = client.post("/api/chat/batch", json={"questions": []})
+        oversized = client.post("/api/chat/batch", json={"questions": [question] * (settings.batch_max_questions + 1)})
+
+        assert empty.status_code == 400
+        assert oversized.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,176 @@
+# tests/test_boost_rules.py - Tests for data-driven per-game boost rules
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.services.boost_rules import AhoCorasick, CompiledBoosts, BoostRegistry, validate_boost_rules
+from app.routes.chat import score_rules_for_query
+from benchmarks.microbench import rulebook_rules
+
+CHESS_RULES = [
+    {"game_id": "chess", "title": "Game Overview", "content": "Each side has eight pawns and one king.", "category_id": "general"},
+    {"game_id": "chess", "title": "Illegal Pawn Moves", "content": "A pawn may not move backwards.", "category_id": "penalties"},
+    {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square.", "category_id": "movement"},
+    {"game_id": "chess", "title": "Castling", "content": "The king moves two squares towards a rook.", "category_id": "special"}
+]
+
+
+class TestAhoCorasick:
+    """Test suite for the multi-pattern matcher"""
+
+    def test_finds_overlapping_patterns(self):
+        matcher = AhoCorasick(["cat", "de cat", "marquise de cat", "location"])
+
+        assert matcher.scan("the marquise de cat's location") == {0, 1, 2, 3}
+        assert matcher.scan("de cat") == {0, 1}
+        assert matcher.scan("xyz") == set()
+
+    def test_matches_whole_words_only(self):
+        matcher = AhoCorasick(["cat", "cult", "he"])
+
+        assert matcher.scan("location, catering, difficult, the") == set()
+        assert matcher.scan("cat_1 cults") == set()
+        assert matcher.scan("a cat; the cult. he") == {0, 1, 2}
+
+
+class TestCompiledBoosts:
+    """Test suite for scoring with compiled boost rules"""
+
+    @pytest.fixture
+    def registry(self):
+        return BoostRegistry()
+
+    def test_root_faction_synonyms_skip_longer_words(self, registry):
+        boosts = registry.get("root")
+
+        assert boosts.scan("pick a location and communicate a difficult catering plan") == set()
+        assert boosts.scan("the cat player") != set()
+
+    def test_chess_piece_question_prefers_movement_rule(self, registry):
+        ranked = score_rules_for_query(CHESS_RULES, "how do pawns move?", registry.get("chess"))
+
+        assert ranked[0]["title"] == "Pawn Movement"
+        assert ranked.index(CHESS_RULES[1]) > ranked.index(CHESS_RULES[2])
+
+    def test_keyword_boost(self, registry):
+        ranked = score_rules_for_query(CHESS_RULES, "can i castle?", registry.get("chess"))
+
+        assert ranked[0]["title"] == "Castling"
+
+    def test_root_faction_boost(self, registry):
+        rules = [
+            {"game_id": "root", "title": "Birdsong", "content": "Place one wood at each sawmill.", "category_id": "marquise de cat"},
+            {"game_id": "root", "title": "Crafting", "content": "Activate workshops to craft cards.", "category_id": "key actions"}
+        ]
+        boosts = registry.get("root")
+
+        plan = boosts.plan("how do the cats score?", ["cats", "score"])
+
+        assert len(plan["entities"]) == 1
+        assert boosts.score(plan, "birdsong", "", "marquise de cat") == 0  # Entities are matched in title and content
+        assert boosts.score(plan, "marquise de cat", "", "") > 0
+        assert score_rules_for_query(rules, "how do cats craft?", boosts)[0]["title"] == "Crafting"
+
+    def test_each_field_scanned_once(self):
+        boosts = CompiledBoosts({"entities": [{"term": f"piece{i}"} for i in range(200)]})
+        plan = boosts.plan("where does piece7 go", ["piece7", "go"])
+
+        boosts.score(plan, "piece7 movement", "piece7 goes anywhere", "movement")
+        boosts.score(plan, "piece7 movement", "piece7 goes anywhere", "movement")
+
+        assert len(boosts.patterns) > 200
+        assert set(boosts._scan_cache) == {"piece7 movement", "piece7 goes anywhere"}
+
+    def test_global_demotes_apply_without_game_rules(self):
+        boosts = CompiledBoosts()
+
+        assert boosts.score(boosts.plan("how to win", ["win"]), "game overview", "", "") == -5
+        assert boosts.score(boosts.plan("game overview", ["game", "overview"]), "game overview", "", "") == 0
+
+    def test_validate_rejects_bad_config(self):
+        with pytest.raises(ValueError):
+            validate_boost_rules({"entities": [{"synonyms": ["x"]}]})
+        with pytest.raises(ValueError):
+            validate_boost_rules({"penalty_terms": [""]})
+        with pytest.raises(ValueError):
+            validate_boost_rules(["pawn"])
+
+    @pytest.mark.parametrize("boost_rules", [
+        {"keywords": [{"term": "ko", "weight": "high"}]},
+        {"demote": [{"term": "overview", "weight": True}]},
+        {"penalty_weight": "-10"},
+        {"entities": [{"term": "pawn", "synonyms": "pawns"}]},
+        {"entities": [{"term": "pawn", "phrases": [1]}]},
+        {"demote": [{"term": "setup", "unless": "start"}]},
+        {"keywords": {"term": "ko"}}
+    ])
+    def test_validate_rejects_bad_values(self, boost_rules):
+        with pytest.raises(ValueError):
+            validate_boost_rules(boost_rules)
+
+    def test_first_asked_entity_wins(self, registry):
+        boosts = registry.get("chess")
+
+        plan = boosts.plan("knight and bishop movement", ["knight", "bishop", "movement"])
+
+        assert len(plan["entities"]) == 1
+        assert plan["keywords"] == []
+        assert boosts.score(plan, "knight movement", "", "") > boosts.score(plan, "bishop movement", "", "")
+
+
+class TestChessRanking:
+    """Test suite for rankings over the bundled chess rulebook"""
+
+    @pytest.fixture(scope="class")
+    def rules(self):
+        return rulebook_rules("chess")
+
+    @pytest.mark.parametrize("query, expected_top", [
+        ("knight and bishop movement", "Rule: Movement of Pieces"),
+        ("can the king castle?", "Rule: Castling"),
+        ("what is checkmate", "Rule: Checkmate")
+    ])
+    def test_top_rule(self, rules, query, expected_top):
+        ranked = score_rules_for_query(rules, query, BoostRegistry().get("chess"))
+
+        assert ranked[0]["title"] == expected_top
+
+    def test_overview_not_first_for_piece_questions(self, rules):
+        ranked = score_rules_for_query(rules, "knight and bishop movement", BoostRegistry().get("chess"))
+
+        assert ranked.index(next(r for r in rules if "Overview" in r["title"])) > 0
+
+
+class TestBoostRuleEndpoints:
+    """Test suite for the admin boost rule endpoints"""
+
+    def test_put_then_get(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.auth_service import get_admin_user
+        from app.services.boost_rules import boost_registry
+
+        db = mongomock_motor.AsyncMongoMockClient()["boost_test"]
+        asyncio.run(db.games.insert_one({"game_id": "go", "name": "Go"}))
+
+        app.dependency_overrides[get_database] = lambda: db
+        app.dependency_overrides[get_admin_user] = lambda: {"username": "admin"}
+        try:
+            client = TestClient(app)
+            bad = client.put("/api/admin/games/go/boost-rules", json={"keywords": [{"weight": 5}]})
+            missing = client.put("/api/admin/games/nope/boost-rules", json={"keywords": [{"term": "ko"}]})
+            updated = client.put("/api/admin/games/go/boost-rules", json={"keywords": [{"term": "ko"}]})
+            fetched = client.get("/api/admin/games/go/boost-rules")
+        finally:
+            app.dependency_overrides.clear()
+            boost_registry.invalidate("go")
+
+        assert bad.status_code == 400
+        assert missing.status_code == 404
+        assert updated.json()["success"] is True
+        assert fetched.json()["source"] == "game"
+        assert fetched.json()["boost_rules"] == {"keywords": [{"term": "ko"}]}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
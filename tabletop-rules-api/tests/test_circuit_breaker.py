@@ -0,0 +1,218 @@
+# tests/test_circuit_breaker.py - Tests for the LLM latency budget, hedging and circuit breaker
+import pytest
+import asyncio
+from unittest.mock import patch
+from app.services.ai_chat_service import AIChatService
+from app.services.circuit_breaker import CircuitBreaker
+
+
+AI_SUCCESS = {"response": "**Answer.**", "ai_powered": True, "model": "gpt-4o-mini"}
+AI_FAILURE = {"error": "API Error", "ai_powered": False, "fallback_required": True, "error_type": "Exception"}
+
+
+class TestCircuitBreaker:
+    """Test suite for the rolling-window circuit breaker"""
+
+    @pytest.fixture
+    def breaker(self):
+        return CircuitBreaker(
+            "test",
+            window_size=10,
+            min_requests=4,
+            error_rate_threshold=0.5,
+            slow_call_rate_threshold=0.5,
+            slow_call_seconds=1.0,
+            open_seconds=30.0
+        )
+
+    def test_starts_closed(self, breaker):
+        assert breaker.allow_request() is True
+        assert breaker.get_status()["state"] == "closed"
+
+    def test_trips_on_error_rate(self, breaker):
+        for _ in range(2):
+            breaker.record_success(0.1)
+        for _ in range(2):
+            breaker.record_failure(0.1)
+
+        status = breaker.get_status()
+        assert status["state"] == "open"
+        assert status["trip_count"] == 1
+        assert "error rate" in status["last_trip_reason"]
+        assert breaker.allow_request() is False
+        assert breaker.get_status()["short_circuited_requests"] == 1
+
+    def test_trips_on_slow_call_rate(self, breaker):
+        for _ in range(4):
+            breaker.record_success(2.0)
+
+        assert breaker.state == "open"
+        assert "slow-call rate" in breaker.last_trip_reason
+
+    def test_needs_min_requests_before_tripping(self, breaker):
+        for _ in range(3):
+            breaker.record_failure(0.1)
+
+        assert breaker.state == "closed"
+
+    def test_half_open_probe_closes_on_success(self, breaker):
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        breaker.opened_at -= 31
+
+        assert breaker.allow_request() is True
+        assert breaker.state == "half_open"
+        # Only one probe at a time
+        assert breaker.allow_request() is False
+
+        breaker.record_success(0.1)
+        assert breaker.state == "closed"
+
+    def test_half_open_probe_reopens_on_failure(self, breaker):
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        breaker.opened_at -= 31
+
+        assert breaker.allow_request() is True
+        breaker.record_failure(0.1)
+
+        assert breaker.state == "open"
+        assert breaker.trip_count == 2
+
+    def test_released_probe_lets_next_probe_through(self, breaker):
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        breaker.opened_at -= 31
+
+        assert breaker.allow_request() is True
+        breaker.release_probe()
+
+        assert breaker.state == "half_open"
+        assert breaker.allow_request() is True
+
+
+class TestGuardedGeneration:
+    """Test suite for AIChatService.generate_rule_response_guarded"""
+
+    @pytest.fixture
+    def ai_service(self):
+        service = AIChatService()
+        service.client = None
+        service.usage_log = []
+        service.breaker.reset()
+        return service
+
+    @pytest.mark.asyncio
+    async def test_success_records_latency(self, ai_service):
+        with patch.object(ai_service, "generate_rule_response", return_value=AI_SUCCESS):
+            result = await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+        assert result["ai_powered"] is True
+        assert len(ai_service.latency_samples) == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.ai_chat_service.settings')
+    async def test_deadline_returns_timeout_error(self, mock_settings, ai_service):
+        mock_settings.llm_timeout_seconds = 0.05
+        mock_settings.llm_hedge_enabled = False
+
+        async def slow_response(*args, **kwargs):
+            await asyncio.sleep(1)
+            return AI_SUCCESS
+
+        with patch.object(ai_service, "generate_rule_response", side_effect=slow_response):
+            result = await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+        assert result["ai_powered"] is False
+        assert result["fallback_required"] is True
+        assert result["error_type"] == "TimeoutError"
+        assert ai_service.guard_stats["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    @patch('app.services.ai_chat_service.settings')
+    async def test_hedged_request_wins_when_first_is_slow(self, mock_settings, ai_service):
+        mock_settings.llm_timeout_seconds = 1.0
+        mock_settings.llm_hedge_enabled = True
+        mock_settings.llm_hedge_percentile = 0.95
+        mock_settings.llm_hedge_min_samples = 5
+        mock_settings.llm_max_hedged_requests = 1
+        ai_service.latency_samples.extend([0.01] * 10)
+
+        calls = []
+
+        async def first_slow(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+            return AI_SUCCESS
+
+        with patch.object(ai_service, "generate_rule_response", side_effect=first_slow):
+            result = await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+        assert result["ai_powered"] is True
+        assert len(calls) == 2
+        assert ai_service.guard_stats["hedges_launched"] == 1
+        assert ai_service.guard_stats["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_skips_llm(self, ai_service):
+        with patch.object(ai_service, "generate_rule_response", return_value=AI_FAILURE) as mock_generate:
+            for _ in range(ai_service.breaker.min_requests):
+                await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+            assert ai_service.breaker.state == "open"
+            calls_before = mock_generate.call_count
+
+            result = await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+        assert result["error_type"] == "CircuitOpen"
+        assert result["fallback_required"] is True
+        assert mock_generate.call_count == calls_before
+
+    @pytest.mark.asyncio
+    async def test_budget_skip_releases_half_open_probe(self, ai_service):
+        budget_skip = {"error": "Request does not fit the LLM budget", "ai_powered": False, "fallback_required": True, "error_type": "BudgetExceeded"}
+        for _ in range(ai_service.breaker.min_requests):
+            ai_service.breaker.record_failure(0.1)
+        ai_service.breaker.opened_at -= ai_service.breaker.open_seconds + 1
+
+        with patch.object(ai_service, "generate_rule_response", return_value=budget_skip):
+            skipped = await ai_service.generate_rule_response_guarded("q", "chess", [])
+        with patch.object(ai_service, "generate_rule_response", return_value=AI_SUCCESS):
+            result = await ai_service.generate_rule_response_guarded("q", "chess", [])
+
+        assert skipped["error_type"] == "BudgetExceeded"
+        assert result["ai_powered"] is True
+        assert ai_service.breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_releases_half_open_probe(self, ai_service):
+        for _ in range(ai_service.breaker.min_requests):
+            ai_service.breaker.record_failure(0.1)
+        ai_service.breaker.opened_at -= ai_service.breaker.open_seconds + 1
+
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(5)
+            return AI_SUCCESS
+
+        with patch.object(ai_service, "generate_rule_response", side_effect=hang):
+            task = asyncio.create_task(ai_service.generate_rule_response_guarded("q", "chess", []))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert ai_service.breaker.state == "half_open"
+        assert ai_service.breaker.allow_request() is True
+
+    def test_resilience_summary(self, ai_service):
+        summary = ai_service.get_resilience_summary()
+
+        assert summary["circuit_breaker"]["state"] == "closed"
+        assert summary["circuit_breaker"]["trip_count"] == 0
+        assert "timeouts" in summary
+        assert "hedges_launched" in summary
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
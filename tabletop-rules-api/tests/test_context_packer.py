@@ -0,0 +1,224 @@
+# tests/test_context_packer.py - Tests for token-budget-aware context packing
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+from app.services.context_packer import (
+    ContextPacker,
+    merge_part_chunks,
+    estimate_tokens,
+    prepare_chunk_for_prompt,
+    prompt_fields
+)
+
+
+def make_rule(title, content, tokens=None, section_index=None, category="chess_movement"):
+    metadata = {"source_file": "chess_rules.md"}
+    if tokens is not None:
+        metadata["tokens"] = tokens
+    if section_index is not None:
+        metadata["section_index"] = section_index
+    return {
+        "game_id": "chess",
+        "title": title,
+        "content": content,
+        "category_id": category,
+        "chunk_metadata": metadata
+    }
+
+
+class TestContextPacker:
+    """Test suite for ContextPacker"""
+
+    @pytest.fixture
+    def packer(self):
+        return ContextPacker()
+
+    def test_packs_in_relevance_order_within_budget(self, packer):
+        rules = [
+            make_rule("Pawn Movement", "Pawns move forward.", tokens=100),
+            make_rule("En Passant", "Special pawn capture.", tokens=100),
+            make_rule("Castling", "King and rook move together.", tokens=100)
+        ]
+
+        packed, stats = packer.pack(rules, budget_tokens=230)
+
+        assert [r["title"] for r in packed] == ["Pawn Movement", "En Passant"]
+        assert stats["chunks_packed"] == 2
+        assert stats["candidate_tokens"] == 300
+        assert stats["packed_tokens"] <= 230
+        assert stats["tokens_saved"] == stats["candidate_tokens"] - stats["packed_tokens"]
+
+    def test_uses_stored_token_counts(self, packer):
+        rules = [make_rule("Short Text, Big Count", "tiny", tokens=400)]
+
+        packed, stats = packer.pack(rules, budget_tokens=1000)
+
+        assert stats["candidate_tokens"] == 400
+        assert packed[0]["tokens"] >= 400
+
+    def test_skips_oversized_chunk_but_keeps_filling(self, packer):
+        rules = [
+            make_rule("Pawn Movement", "Pawns move forward.", tokens=100),
+            make_rule("Huge Section", "x " * 4000, tokens=2000),
+            make_rule("Castling", "King and rook move together.", tokens=100)
+        ]
+
+        packed, stats = packer.pack(rules, budget_tokens=300)
+
+        assert [r["title"] for r in packed] == ["Pawn Movement", "Castling"]
+        assert stats["truncated_chunks"] == 0
+
+    def test_truncates_only_the_top_chunk(self, packer):
+        rules = [make_rule("Huge Section", "word " * 4000, tokens=4000)]
+
+        packed, stats = packer.pack(rules, budget_tokens=300)
+
+        assert len(packed) == 1
+        assert packed[0]["prompt_text"].endswith("...")
+        assert stats["truncated_chunks"] == 1
+        assert stats["packed_tokens"] == 300
+
+    def test_merges_part_chunks_of_same_section(self, packer):
+        rules = [
+            make_rule("Castling (Part 2)", "Conditions for castling.", tokens=50, section_index=4),
+            make_rule("Check", "The king is attacked.", tokens=50, section_index=5),
+            make_rule("Castling (Part 1)", "Castling procedure.", tokens=50, section_index=4)
+        ]
+
+        packed, stats = packer.pack(rules, budget_tokens=1000)
+
+        assert [r["title"] for r in packed] == ["Castling", "Check"]
+        assert stats["parts_merged"] == 1
+        # Parts are joined in document order
+        castling = packed[0]["prompt_text"]
+        assert castling.index("procedure") < castling.index("Conditions")
+
+    def test_marks_gap_between_non_adjacent_parts(self, packer):
+        rules = [
+            make_rule("Castling (Part 1)", "First part.", tokens=10, section_index=4),
+            make_rule("Castling (Part 3)", "Third part.", tokens=10, section_index=4)
+        ]
+
+        packed, _ = packer.pack(rules, budget_tokens=1000)
+
+        assert "[...]" in packed[0]["prompt_text"]
+
+    def test_deduplicates_repeated_paragraphs(self, packer):
+        shared = "Pawns capture diagonally forward one square."
+        rules = [
+            make_rule("Pawn Movement", f"Pawns move forward.\n\n{shared}", tokens=40),
+            make_rule("Pawn Capture", f"{shared}\n\nEn passant is a pawn capture.", tokens=40),
+            make_rule("Pawn Movement", f"Pawns move forward.\n\n{shared}", tokens=40)
+        ]
+
+        packed, stats = packer.pack(rules, budget_tokens=1000)
+
+        assert len(packed) == 2
+        assert stats["duplicate_paragraphs_removed"] == 3
+        assert shared not in packed[1]["prompt_text"]
+        assert "En passant" in packed[1]["prompt_text"]
+
+    def test_estimates_tokens_when_not_stored(self, packer):
+        rules = [make_rule("Unknown Size", "A" * 400)]
+
+        _, stats = packer.pack(rules, budget_tokens=1000)
+
+        assert stats["candidate_tokens"] == estimate_tokens("A" * 400) == 100
+
+    def test_merge_part_chunks_without_parts(self):
+        entries, merged = merge_part_chunks([make_rule("Check", "text")])
+
+        assert merged == 0
+        assert entries[0]["title"] == "Check"
+
+
+class TestPromptReadyChunks:
+    """Test suite for the prompt-ready rendering stored at ingest"""
+
+    @pytest.fixture
+    def packer(self):
+        return ContextPacker()
+
+    def test_prepare_chunk_for_prompt(self):
+        chunk = make_rule("Pawn Movement", "## Pawn Movement\n\nPawns move forward one square.")
+
+        prepare_chunk_for_prompt(chunk)
+
+        assert chunk["prompt_text"] == "**Pawn Movement** (Category: chess_movement)\n   ## Pawn Movement Pawns move forward one square."
+        assert chunk["preview"].startswith("## Pawn Movement")
+        assert chunk["chunk_metadata"]["tokens"] > 0
+        assert chunk["chunk_metadata"]["prompt_tokens"] > 0
+        assert len(chunk["chunk_metadata"]["paragraph_hashes"]) == 2
+        # Existing metadata is kept
+        assert chunk["chunk_metadata"]["source_file"] == "chess_rules.md"
+
+    def test_preview_is_truncated(self):
+        chunk = prepare_chunk_for_prompt(make_rule("Long", "A" * 400))
+
+        assert chunk["preview"] == "A" * 150 + "..."
+
+    def test_prompt_fields_for_mongo_set(self):
+        fields = prompt_fields({"title": "Check", "content": "The king is attacked.", "category_id": "chess_check"})
+
+        assert fields["prompt_text"].startswith("**Check** (Category: chess_check)")
+        assert "chunk_metadata.prompt_tokens" in fields
+        assert "chunk_metadata.paragraph_hashes" in fields
+
+    def test_packer_uses_stored_rendering(self, packer):
+        rule = prepare_chunk_for_prompt(make_rule("Check", "The king is attacked."))
+        rule["prompt_text"] = "**Check** (Category: chess_movement)\n   stored rendering"
+
+        packed, stats = packer.pack([rule], budget_tokens=1000)
+
+        assert packed[0]["prompt_text"].endswith("stored rendering")
+        assert stats["packed_tokens"] == rule["chunk_metadata"]["prompt_tokens"]
+
+    def test_packer_falls_back_when_stored_chunk_has_duplicates(self, packer):
+        shared = "Pawns capture diagonally forward one square."
+        first = prepare_chunk_for_prompt(make_rule("Pawn Movement", f"Pawns move forward.\n\n{shared}"))
+        second = prepare_chunk_for_prompt(make_rule("Pawn Capture", f"{shared}\n\nEn passant is a pawn capture."))
+
+        packed, stats = packer.pack([first, second], budget_tokens=1000)
+
+        assert stats["duplicate_paragraphs_removed"] == 1
+        assert shared not in packed[1]["prompt_text"]
+
+
+class TestUpdateRuleRegeneratesPrompt:
+    """update_rule must keep the stored prompt rendering in sync with the rule"""
+
+    def test_update_rule_sets_prompt_fields(self):
+        from fastapi.testclient import TestClient
+        from main import app
+        from app.database import get_database
+        from app.services.auth_service import get_admin_user
+
+        rule_id = ObjectId()
+        existing = {
+            "_id": rule_id,
+            "title": "Check",
+            "content": "Old content.",
+            "category_id": "chess_check"
+        }
+        mock_db = MagicMock()
+        mock_db.content_chunks.find_one = AsyncMock(side_effect=[existing, {**existing, "content": "New content."}])
+        mock_db.content_chunks.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+
+        app.dependency_overrides[get_database] = lambda: mock_db
+        app.dependency_overrides[get_admin_user] = lambda: {"username": "admin", "is_admin": True}
+        try:
+            response = TestClient(app).put(f"/api/admin/rules/{rule_id}", json={"content": "New content."})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        update = mock_db.content_chunks.update_one.call_args[0][1]["$set"]
+        assert update["content"] == "New content."
+        assert update["prompt_text"] == "**Check** (Category: chess_check)\n   New content."
+        assert update["preview"] == "New content."
+        assert "chunk_metadata.prompt_tokens" in update
+        assert response.json()["modified_fields"] == ["content", "updated_at"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,171 @@
+# tests/test_conversation_service.py - Tests for the server-side conversation store
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.conversation_service import ConversationService
+
+
+@pytest.fixture
+def mongo_db():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["conversation_test"]
+    with patch("app.services.conversation_service.get_database", return_value=db):
+        yield db
+
+
+class TestConversationService:
+    """Test suite for appending turns, windowed history and keyset pages"""
+
+    @pytest.fixture
+    def service(self):
+        return ConversationService()
+
+    async def _append_exchanges(self, service, count, user_id="alice"):
+        for i in range(count):
+            await service.append_turns("conv-1", user_id, "chess", [
+                {"role": "user", "content": f"Question {i}?"},
+                {"role": "assistant", "content": f"Answer {i}."}
+            ])
+
+    @pytest.mark.asyncio
+    async def test_append_assigns_sequence_numbers(self, service, mongo_db):
+        await self._append_exchanges(service, 2)
+
+        conversation = await service.get_conversation("conv-1", "alice")
+        seqs = [t["seq"] async for t in mongo_db.conversation_turns.find({}).sort("seq", 1)]
+
+        assert conversation["turn_count"] == 4
+        assert seqs == [1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_window_returns_newest_turns_in_order(self, service, mongo_db):
+        await self._append_exchanges(service, 5)
+
+        window = await service.load_window("conv-1", "alice", window=4)
+
+        assert [t["content"] for t in window] == ["Question 3?", "Answer 3.", "Question 4?", "Answer 4."]
+
+    @pytest.mark.asyncio
+    async def test_conversations_are_scoped_to_user(self, service, mongo_db):
+        await self._append_exchanges(service, 1, user_id="alice")
+
+        assert await service.load_window("conv-1", "bob") == []
+        assert await service.get_conversation("conv-1", "bob") is None
+
+    @pytest.mark.asyncio
+    async def test_keyset_pages(self, service, mongo_db):
+        await self._append_exchanges(service, 3)
+
+        first, cursor = await service.get_turns_page("conv-1", "alice", limit=4)
+        second, last_cursor = await service.get_turns_page("conv-1", "alice", before=cursor, limit=4)
+
+        assert [t["seq"] for t in first] == [6, 5, 4, 3]
+        assert cursor == 3
+        assert [t["seq"] for t in second] == [2, 1]
+        assert last_cursor is None
+
+    def test_history_trims_to_token_budget(self, service):
+        turns = [
+            {"role": "user", "content": "How do pawns move?", "tokens": 5},
+            {"role": "assistant", "content": "Pawns move forward. " * 20, "tokens": 100},
+            {"role": "user", "content": "What about castling?", "tokens": 5},
+            {"role": "assistant", "content": "The king moves two squares.", "tokens": 8}
+        ]
+
+        history = service.build_history(turns, budget_tokens=40)
+
+        assert history[0]["role"] == "system"
+        assert "How do pawns move?" in history[0]["content"]
+        assert [m["content"] for m in history[1:]] == ["What about castling?", "The king moves two squares."]
+
+
+class TestConversationEndpoints:
+    """Test suite for conversation history on the chat endpoints"""
+
+    def test_history_endpoint_pages_turns(self, mongo_db):
+        import asyncio
+        from main import app
+        from app.services.auth_service import VISITOR_COOKIE, verify_visitor_cookie
+
+        client = TestClient(app)
+        missing = client.get("/api/chat/conversations/unknown/turns")
+        visitor_id = verify_visitor_cookie(client.cookies.get(VISITOR_COOKIE))
+
+        service = ConversationService()
+        asyncio.run(service.append_turns("conv-2", f"visitor:{visitor_id}", "chess", [
+            {"role": "user", "content": "How do knights move?"},
+            {"role": "assistant", "content": "In an L shape."}
+        ]))
+
+        response = client.get("/api/chat/conversations/conv-2/turns", params={"limit": 1})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["turn_count"] == 2
+        assert [t["content"] for t in data["turns"]] == ["In an L shape."]
+        assert data["next_before"] == 2
+        assert missing.status_code == 404
+
+    def test_anonymous_conversations_are_scoped_to_visitor(self, mongo_db):
+        import asyncio
+        from main import app
+        from app.services.auth_service import VISITOR_COOKIE, sign_visitor_id
+
+        asyncio.run(ConversationService().append_turns("conv-3", "visitor:owner", "chess", [
+            {"role": "user", "content": "How do knights move?"}
+        ]))
+
+        owner = TestClient(app, cookies={VISITOR_COOKIE: sign_visitor_id("owner")})
+        stranger = TestClient(app)
+        forged = TestClient(app, cookies={VISITOR_COOKIE: "owner.not-the-signature"})
+
+        assert owner.get("/api/chat/conversations/conv-3/turns").status_code == 200
+        assert stranger.get("/api/chat/conversations/conv-3/turns").status_code == 404
+        assert forged.get("/api/chat/conversations/conv-3/turns").status_code == 404
+        assert VISITOR_COOKIE in stranger.cookies
+
+    def test_invalid_token_is_treated_as_anonymous(self, mongo_db):
+        from main import app
+
+        client = TestClient(app)
+        response = client.get("/api/chat/conversations/conv-3/turns", headers={"Authorization": "Bearer not-a-jwt"})
+
+        assert response.status_code == 404
+
+    def test_expired_token_can_still_query(self, mongo_db):
+        import asyncio
+        from datetime import timedelta
+        from main import app
+        from app.database import get_database
+        from app.services.auth_service import VISITOR_COOKIE, create_access_token
+        from app.services.corpus_cache import corpus_cache
+
+        asyncio.run(mongo_db.content_chunks.insert_one(
+            {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square.", "category_id": "movement"}
+        ))
+        corpus_cache.clear()
+        expired = {"Authorization": f"Bearer {create_access_token({'sub': 'alice'}, expires_delta=timedelta(minutes=-5))}"}
+        fake_llm = {"ai_powered": True, "response": "**Pawns move forward.**"}
+
+        app.dependency_overrides[get_database] = lambda: mongo_db
+        try:
+            with patch("app.services.ai_chat_service.ai_chat_service.generate_rule_response_guarded", return_value=fake_llm):
+                one_off = TestClient(app)
+                single = one_off.post("/api/chat/query", json={"query": "How do pawns move?", "game_system": "chess"}, headers=expired)
+                threaded = TestClient(app)
+                followed = threaded.post(
+                    "/api/chat/query",
+                    json={"query": "How do pawns move?", "game_system": "chess", "conversation_id": "conv-4"},
+                    headers=expired
+                )
+        finally:
+            app.dependency_overrides.clear()
+            corpus_cache.clear()
+
+        assert single.status_code == 200
+        assert VISITOR_COOKIE not in one_off.cookies
+        assert followed.status_code == 200
+        assert VISITOR_COOKIE in threaded.cookies
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,221 @@
+# tests/test_corpus_cache.py - Tests for in-memory rule corpora and cache warming
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.corpus_cache import CorpusCache
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_db(name):
+    db = mongomock_motor.AsyncMongoMockClient()[name]
+
+    async def seed():
+        await db.games.insert_many([
+            {"game_id": "chess", "name": "Chess", "corpus_version": 1},
+            {"game_id": "root", "name": "Root", "corpus_version": 1}
+        ])
+        await db.content_chunks.insert_many([
+            {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square.", "rule_embedding": [0.1, 0.2]},
+            {"game_id": "chess", "title": "Castling", "content": "The king moves two squares towards a rook."},
+            {"game_id": "root", "title": "Battle", "content": "Roll two dice."}
+        ])
+    asyncio.run(seed())
+    return db
+
+
+class TestCorpusCache:
+    """Test suite for CorpusCache"""
+
+    def test_second_read_served_from_memory(self):
+        db = make_db("corpus_hit")
+        cache = CorpusCache(check_seconds=60)
+
+        async def run():
+            first = await cache.get_rules(db, "chess")
+            await db.content_chunks.insert_one({"game_id": "chess", "title": "En Passant", "content": "A special pawn capture."})
+            return first, await cache.get_rules(db, "chess")
+
+        first, second = asyncio.run(run())
+
+        assert len(first) == 2
+        assert second is first
+        assert all("rule_embedding" not in rule for rule in first)
+
+    def test_limit_slices_the_shared_list(self):
+        db = make_db("corpus_limit")
+        cache = CorpusCache(check_seconds=60)
+
+        async def run():
+            return await cache.get_rules(db, "chess", limit=1), await cache.get_rules(db, "chess")
+
+        limited, full = asyncio.run(run())
+
+        assert limited == full[:1]
+        assert len(full) == 2
+
+    def test_indexes_share_one_corpus(self):
+        from app.services.corpus_cache import corpus_cache
+        from app.services.search_index import search_indexes
+        from app.services.spelling import spelling_indexes
+        from app.services.typeahead import typeahead_indexes
+
+        assert search_indexes.corpus is corpus_cache
+        assert spelling_indexes.corpus is corpus_cache
+        assert typeahead_indexes.corpus is corpus_cache
+
+    def test_reloads_when_corpus_version_changes(self):
+        db = make_db("corpus_version")
+        cache = CorpusCache(check_seconds=0)
+
+        async def run():
+            await cache.get_rules(db, "chess")
+            await db.content_chunks.insert_one({"game_id": "chess", "title": "En Passant", "content": "A special pawn capture."})
+            unchanged = await cache.get_rules(db, "chess")
+            await db.games.update_one({"game_id": "chess"}, {"$inc": {"corpus_version": 1}})
+            return unchanged, await cache.get_rules(db, "chess")
+
+        unchanged, reloaded = asyncio.run(run())
+
+        assert len(unchanged) == 2
+        assert len(reloaded) == 3
+
+    def test_least_recently_used_game_evicted(self):
+        db = make_db("corpus_lru")
+        cache = CorpusCache(check_seconds=60, max_games=1)
+
+        async def run():
+            await cache.get_rules(db, "chess")
+            await cache.get_rules(db, "root")
+
+        asyncio.run(run())
+
+        assert not cache.is_warm("chess")
+        assert cache.is_warm("root")
+
+    def test_invalidate_drops_game(self):
+        db = make_db("corpus_invalidate")
+        cache = CorpusCache(check_seconds=60)
+
+        asyncio.run(cache.get_rules(db, "chess"))
+        cache.invalidate("chess")
+
+        assert not cache.is_warm("chess")
+
+
+class TestPrepareGame:
+    """Test suite for warming a game on selection"""
+
+    def test_prepare_warms_corpus_and_precomputed_answers(self):
+        from main import app
+        from app.database import get_database
+        from app.services.corpus_cache import corpus_cache
+        from app.services.precompute_service import precompute_service
+
+        db = make_db("corpus_prepare")
+        corpus_cache.clear()
+        precompute_service.versions.clear()
+        precompute_service.warm_answers.clear()
+        asyncio.run(db.precomputed_answers.insert_one({
+            "game_id": "chess", "question": "how do pawns move", "query": "How do pawns move?",
+            "corpus_version": 1, "response": "**Pawns move forward.**"
+        }))
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            client = TestClient(app)
+            first = client.post("/api/games/chess/prepare")
+            second = client.post("/api/games/chess/prepare")
+            missing = client.post("/api/games/unknown/prepare")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert first.status_code == 200
+        assert first.json()["rules"] == 2
+        assert first.json()["precomputed_answers"] == 1
+        assert first.json()["already_warm"] is False
+        assert second.json()["already_warm"] is True
+        assert missing.status_code == 404
+
+        # Served from memory even once the stored document is gone
+        asyncio.run(db.precomputed_answers.delete_many({}))
+        answer = asyncio.run(precompute_service.lookup(db, "chess", "How do pawns move?"))
+        corpus_cache.clear()
+        precompute_service.versions.clear()
+        precompute_service.warm_answers.clear()
+        assert answer["response"] == "**Pawns move forward.**"
+
+    def test_cold_prepares_are_rate_limited(self):
+        from main import app
+        from app.config import settings
+        from app.database import get_database
+        from app.routes import games
+        from app.services.corpus_cache import corpus_cache
+        from app.services.precompute_service import precompute_service
+
+        db = make_db("corpus_prepare_limit")
+        corpus_cache.clear()
+        precompute_service.warm_answers.clear()
+        games._cold_prepares.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            with patch.object(settings, "prepare_max_cold_per_minute", 1):
+                client = TestClient(app)
+                first = client.post("/api/games/chess/prepare")
+                warm_again = client.post("/api/games/chess/prepare")
+                corpus_cache.clear()
+                cold_again = client.post("/api/games/chess/prepare")
+        finally:
+            app.dependency_overrides.clear()
+            corpus_cache.clear()
+            precompute_service.warm_answers.clear()
+            games._cold_prepares.clear()
+
+        assert first.status_code == 200
+        assert warm_again.status_code == 200
+        assert warm_again.json()["already_warm"] is True
+        assert cold_again.status_code == 429
+
+
+
+class TestRuleEdits:
+    """Test suite for admin rule edits reaching the worker's caches"""
+
+    def test_edited_rule_served_immediately(self):
+        from main import app
+        from app.config import settings
+        from app.database import get_database
+        from app.services.auth_service import get_admin_user
+        from app.services.corpus_cache import corpus_cache
+        from app.services.search_index import search_indexes
+
+        db = make_db("corpus_rule_edit")
+        corpus_cache.clear()
+        search_indexes.indexes.clear()
+        pawn = asyncio.run(db.content_chunks.find_one({"title": "Pawn Movement"}))
+
+        app.dependency_overrides[get_database] = lambda: db
+        app.dependency_overrides[get_admin_user] = lambda: {"username": "admin", "is_admin": True}
+        try:
+            with patch.object(settings, "precompute_on_change", False):
+                client = TestClient(app)
+                before = client.get("/api/chat/search/chess", params={"q": "backwards"})
+                edited = client.put(f"/api/admin/rules/{pawn['_id']}", json={"content": "Pawns never move backwards."})
+                after = client.get("/api/chat/search/chess", params={"q": "backwards"})
+                rules = asyncio.run(corpus_cache.get_rules(db, "chess"))
+        finally:
+            app.dependency_overrides.clear()
+            corpus_cache.clear()
+            search_indexes.indexes.clear()
+
+        assert before.json()["total_found"] == 0
+        assert edited.status_code == 200
+        assert after.json()["total_found"] == 1
+        assert after.json()["results"][0]["title"] == "Pawn Movement"
+        assert {rule["title"]: rule["content"] for rule in rules}["Pawn Movement"] == "Pawns never move backwards."
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,75 @@
+# tests/test_corpus_generator.py - Tests for the synthetic rulebook corpus generator and bulk loader
+import pytest
+import frontmatter
+from benchmarks.corpus_generator import (
+    CorpusConfig,
+    RulebookGenerator,
+    generate_corpus,
+    write_corpus,
+    bulk_load
+)
+
+
+class TestRulebookGenerator:
+    """Test suite for synthetic rulebook generation"""
+
+    @pytest.fixture
+    def config(self):
+        return CorpusConfig(games=3, sections="fixed:12", subsection_rate=0.5, cross_reference_rate=0.5)
+
+    def test_generation_is_deterministic(self, config):
+        assert list(generate_corpus(config)) == list(generate_corpus(config))
+
+    def test_rulebook_format(self, config):
+        game_id, markdown = RulebookGenerator(config).generate(0)
+        post = frontmatter.loads(markdown)
+
+        assert game_id == "synth_0000"
+        assert post.metadata["game_id"] == game_id
+        assert post.metadata["min_players"] <= post.metadata["max_players"]
+        assert post.content.startswith("# Game: ")
+        assert markdown.count("\n## Rule: ") == 12
+        assert markdown.count("**Category**:") == 12
+        assert markdown.count("**Complexity**:") == 12
+        assert "\n### " in markdown
+        assert "(see Rule: " in markdown
+
+    def test_size_distribution_controls_sections(self):
+        small = RulebookGenerator(CorpusConfig(sections="fixed:5")).generate(0)[1]
+        large = RulebookGenerator(CorpusConfig(sections="fixed:50")).generate(0)[1]
+
+        assert small.count("\n## ") == 5
+        assert large.count("\n## ") == 50
+
+    def test_write_corpus_manifest(self, config, tmp_path):
+        manifest = write_corpus(config, tmp_path)
+
+        assert manifest["games"] == 3
+        assert manifest["sections"] == 36
+        assert len(list(tmp_path.glob("*.md"))) == 3
+        assert (tmp_path / "manifest.json").exists()
+
+
+class TestBulkLoad:
+    """Test suite for loading a generated corpus through the ingest path"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_load_into_in_memory_mongo(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        db = mongomock_motor.AsyncMongoMockClient()["corpus_test"]
+        config = CorpusConfig(games=4, sections="fixed:10")
+
+        summary = await bulk_load(generate_corpus(config), db, concurrency=2, include_bundled=False)
+
+        assert summary["games"] == 4
+        # 10 rule sections plus the "# Game:" introduction per rulebook
+        assert summary["chunks"] == 44
+        assert await db.content_chunks.count_documents({}) == 44
+        game = await db.games.find_one({"game_id": "synth_0001"})
+        assert game["rule_count"] == 11
+        chunk = await db.content_chunks.find_one({"game_id": "synth_0001"})
+        assert chunk["prompt_text"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
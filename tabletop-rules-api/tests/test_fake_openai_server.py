@@ -0,0 +1,146 @@
+# tests/test_fake_openai_server.py - Tests for the offline OpenAI-compatible stand-in
+import pytest
+import httpx
+from fastapi.testclient import TestClient
+from openai import AsyncOpenAI
+from app.services.ai_chat_service import AIChatService
+from app.services.ai_service import AIService
+from benchmarks.fake_openai_server import (
+    create_app,
+    FakeOpenAIConfig,
+    LatencyDistribution,
+    deterministic_embedding
+)
+
+
+def make_client(app, max_retries=0):
+    """Real AsyncOpenAI client talking to the fake server in-process"""
+    return AsyncOpenAI(
+        api_key="fake",
+        base_url="http://fake-openai/v1",
+        max_retries=max_retries,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    )
+
+
+class TestFakeOpenAIServer:
+    """Test suite for the fake OpenAI server endpoints"""
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(create_app())
+
+    def test_embeddings_are_deterministic_and_normalized(self, client):
+        response = client.post("/v1/embeddings", json={"model": "text-embedding-3-small", "input": ["pawn", "pawn", "rook"]})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert len(data[0]["embedding"]) == 1536
+        assert data[0]["embedding"] == data[1]["embedding"]
+        assert data[0]["embedding"] != data[2]["embedding"]
+        assert abs(sum(v * v for v in data[0]["embedding"]) - 1.0) < 1e-6
+        assert response.json()["usage"]["prompt_tokens"] > 0
+
+    def test_chat_completion_reports_usage(self, client):
+        response = client.post("/v1/chat/completions", json={
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "Question: How do pawns move?"}]
+        })
+
+        body = response.json()
+        assert response.status_code == 200
+        assert "How do pawns move?" in body["choices"][0]["message"]["content"]
+        assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + body["usage"]["completion_tokens"]
+
+    def test_max_tokens_truncates_answer(self, client):
+        response = client.post("/v1/chat/completions", json={
+            "messages": [{"role": "user", "content": "How do pawns move?"}],
+            "max_tokens": 10
+        })
+
+        assert response.json()["choices"][0]["finish_reason"] == "length"
+
+    def test_streaming_ends_with_done(self, client):
+        response = client.post("/v1/chat/completions", json={
+            "messages": [{"role": "user", "content": "How do pawns move?"}],
+            "stream": True
+        })
+
+        events = [line for line in response.text.split("\n") if line.startswith("data: ")]
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert events[-1] == "data: [DONE]"
+        assert len(events) > 3
+
+    def test_rate_limit_injection(self):
+        client = TestClient(create_app(FakeOpenAIConfig(rate_limit_rate=1.0)))
+
+        response = client.post("/v1/chat/completions", json={"messages": []})
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+        assert client.get("/_fake/stats").json()["injected_rate_limits"] == 1
+
+    def test_error_injection_can_be_changed_at_runtime(self, client):
+        client.post("/_fake/config", json={"error_rate": 1.0})
+
+        response = client.post("/v1/embeddings", json={"input": "pawn"})
+
+        assert response.status_code == 500
+        assert client.get("/_fake/stats").json()["injected_errors"] == 1
+
+    def test_invalid_config_is_rejected(self, client):
+        response = client.post("/_fake/config", json={"latency": "gamma:1"})
+
+        assert response.status_code == 400
+
+    def test_latency_distributions(self):
+        import random
+        rng = random.Random(1)
+
+        assert LatencyDistribution("none").sample(rng) == 0.0
+        assert LatencyDistribution("fixed:0.25").sample(rng) == 0.25
+        assert 0.1 <= LatencyDistribution("uniform:0.1,0.2").sample(rng) <= 0.2
+        assert LatencyDistribution("lognormal:0.5,0.3").sample(rng) > 0
+        with pytest.raises(ValueError):
+            LatencyDistribution("uniform:0.1")
+
+
+class TestServicesAgainstFakeServer:
+    """The real OpenAI client and services work end to end against the fake server"""
+
+    @pytest.mark.asyncio
+    async def test_ai_service_embedding(self):
+        service = AIService()
+        service.client = make_client(create_app())
+
+        embedding = await service.generate_embedding("How do pawns move?")
+
+        assert embedding == deterministic_embedding("How do pawns move?")
+
+    @pytest.mark.asyncio
+    async def test_ai_chat_service_response(self):
+        service = AIChatService()
+        service.usage_log = []
+        service.client = make_client(create_app())
+        rules = [{"title": "Pawn Movement", "content": "Pawns move forward.", "category_id": "chess_movement"}]
+
+        result = await service.generate_rule_response("How do pawns move?", "chess", rules)
+
+        assert result["ai_powered"] is True
+        assert result["usage"]["total_tokens"] > 0
+        assert len(service.usage_log) == 1
+
+    @pytest.mark.asyncio
+    async def test_ai_chat_service_falls_back_on_rate_limit(self):
+        service = AIChatService()
+        service.client = make_client(create_app(FakeOpenAIConfig(rate_limit_rate=1.0)))
+
+        result = await service.generate_rule_response("How do pawns move?", "chess", [])
+
+        assert result["ai_powered"] is False
+        assert result["fallback_required"] is True
+        assert result["error_type"] == "RateLimitError"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
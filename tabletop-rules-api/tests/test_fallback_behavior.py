@@ -223,11 +223,12 @@ class TestFallbackBehavior:
             }
         ]
         
-        context = ai_service._format_rules_context(long_rules, "test", "chess")
+        context, stats = ai_service._build_rules_context(long_rules, "test", "chess", budget_tokens=100)
         
-        # Should truncate content to 500 chars + "..."
-        assert "A" * 500 + "..." in context
+        # Should truncate content to the token budget + "..."
+        assert "..." in context
         assert len([line for line in context.split('\n') if 'A' * 600 in line]) == 0
+        assert stats["truncated_chunks"] == 1
     
     def test_create_system_prompt_consistency(self, ai_service):
         """Test system prompt creation is consistent across games"""
@@ -0,0 +1,41 @@
+# tests/test_import_time.py - Tests for the import-time report and startup budget
+import pytest
+from benchmarks.import_time import parse_importtime, lazy_violations, check_budget, measure_imports
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       900 |       1500 |     openai._client
+import time:      2000 |       3500 |   openai
+import time:       500 |       4100 | main
+"""
+
+
+class TestImportTime:
+    """Test suite for -X importtime parsing and the startup budget"""
+
+    def test_parse_importtime(self):
+        entries = parse_importtime(IMPORTTIME_OUTPUT)
+
+        assert [e["module"] for e in entries] == ["_io", "openai._client", "openai", "main"]
+        assert [e["depth"] for e in entries] == [1, 2, 1, 0]
+        assert entries[3]["cumulative_ms"] == 4.1
+        assert entries[2]["self_ms"] == 2.0
+
+    def test_budget_and_lazy_modules(self):
+        entries = parse_importtime(IMPORTTIME_OUTPUT)
+        report = {"target": "main", "best_ms": 4.1, "lazy_violations": lazy_violations(entries)}
+
+        assert report["lazy_violations"] == ["openai"]
+        assert len(check_budget(report, budget_ms=10)) == 1
+        assert len(check_budget(report, budget_ms=1)) == 2
+
+    def test_app_import_keeps_heavy_dependencies_lazy(self):
+        report = measure_imports("main", runs=1, top=5)
+
+        assert report["lazy_violations"] == []
+        assert report["best_ms"] > 0
+        assert len(report["slowest_cumulative"]) == 5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,94 @@
+# tests/test_load_test.py - Tests for the end-to-end load test harness
+import pytest
+from benchmarks.load_test import (
+    percentile,
+    summarize,
+    parse_mix,
+    compare_results,
+    build_parser,
+    parse_server_timing,
+    run_load_test,
+    LoadRecorder
+)
+
+
+class TestLoadTestHelpers:
+    """Test suite for load test statistics and options"""
+
+    def test_percentile_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
+
+    def test_summarize_in_milliseconds(self):
+        stats = summarize([0.1, 0.2, 0.3, 0.4], elapsed=2.0, errors=1)
+
+        assert stats["count"] == 4
+        assert stats["errors"] == 1
+        assert stats["throughput_rps"] == 2.0
+        assert stats["p50_ms"] == 200.0
+        assert stats["max_ms"] == 400.0
+
+    def test_parse_mix_normalizes_weights(self):
+        assert parse_mix("chess=3,root=1") == {"chess": 0.75, "root": 0.25}
+        assert parse_mix("chess") == {"chess": 1.0}
+
+    def test_parse_mix_rejects_unknown_game(self):
+        with pytest.raises(ValueError):
+            parse_mix("monopoly=1")
+
+    def test_recorder_ignores_warmup_and_counts_errors(self):
+        recorder = LoadRecorder()
+        recorder.record_request("POST /api/chat/query", 0.1, 200)
+        recorder.recording = True
+        recorder.record_request("POST /api/chat/query", 0.2, 200)
+        recorder.record_request("POST /api/chat/query", 0.3, 500)
+
+        results = recorder.results(elapsed=1.0)
+
+        assert results["routes"]["POST /api/chat/query"]["count"] == 1
+        assert results["routes"]["POST /api/chat/query"]["errors"] == 1
+        assert results["status_codes"] == {"200": 1, "500": 1}
+
+    def test_compare_results(self):
+        baseline = {"routes": {"r": {"p95_ms": 100.0}}, "stages": {}}
+        current = {"routes": {"r": {"p95_ms": 120.0}}, "stages": {"s": {"p95_ms": 1.0}}}
+
+        assert compare_results(current, baseline) == [("routes", "r", 100.0, 120.0)]
+
+    def test_parse_server_timing(self):
+        stages = parse_server_timing("mongo_read;dur=12.5, scoring;dur=3.0, cache;desc=hit, total;dur=20.0")
+
+        assert stages == {"mongo_read": 0.0125, "scoring": 0.003, "total": 0.02}
+        assert parse_server_timing(None) == {}
+
+
+class TestLoadTestRun:
+    """Short in-memory run of the whole stack"""
+
+    @pytest.mark.asyncio
+    async def test_in_memory_run(self):
+        pytest.importorskip("mongomock_motor")
+        from app.config import settings
+        api_key = settings.openai_api_key
+
+        args = build_parser().parse_args([
+            "--in-memory", "--concurrency", "2", "--duration", "0.5", "--warmup", "0",
+            "--upload-concurrency", "1", "--llm-latency", "fixed:0.01", "--mix", "chess=1"
+        ])
+        results = await run_load_test(args)
+
+        assert results["routes"]["POST /api/chat/query"]["count"] > 0
+        assert results["routes"]["POST /api/chat/query"]["errors"] == 0
+        assert results["routes"]["POST /api/admin/upload/markdown-simple"]["count"] > 0
+        assert {"mongo_read", "scoring", "context_build", "llm_call", "serialization", "mongo_write"} <= set(results["stages"])
+        assert results["llm_server"]["chat_requests"] > 0
+        # Settings are restored after the run
+        assert settings.openai_api_key == api_key
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+# tests/test_metrics.py - Tests for in-process metrics and the /metrics endpoint
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.services.metrics import MetricsRegistry, Histogram, metrics
+
+
+class TestMetricsRegistry:
+    """Test suite for MetricsRegistry aggregation and exposition"""
+
+    @pytest.fixture
+    def registry(self):
+        return MetricsRegistry()
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(2.65)
+
+    def test_render_counter_and_histogram(self, registry):
+        registry.inc("http_requests_total", method="GET", route="/api/games/", status="200")
+        registry.observe("stage_duration_seconds", 0.02, stage="scoring")
+
+        text = registry.render()
+
+        assert "# TYPE tabletop_http_requests_total counter" in text
+        assert 'tabletop_http_requests_total{method="GET",route="/api/games/",status="200"} 1' in text
+        assert 'tabletop_stage_duration_seconds_bucket{stage="scoring",le="0.01"} 0' in text
+        assert 'tabletop_stage_duration_seconds_bucket{stage="scoring",le="0.025"} 1' in text
+        assert 'tabletop_stage_duration_seconds_bucket{stage="scoring",le="+Inf"} 1' in text
+        assert 'tabletop_stage_duration_seconds_count{stage="scoring"} 1' in text
+
+    def test_track_in_flight(self, registry):
+        with registry.track_in_flight("http_requests_in_flight"):
+            assert registry.gauges[("http_requests_in_flight", ())] == 1
+
+        assert registry.gauges[("http_requests_in_flight", ())] == 0
+
+    def test_cache_hit_ratio(self, registry):
+        for hit in (True, True, True, False):
+            registry.record_cache("retrieval", hit)
+
+        assert 'tabletop_cache_hit_ratio{cache="retrieval"} 0.75' in registry.render()
+
+    def test_record_ingest(self, registry):
+        registry.record_ingest("markdown_simple", 20, 0.5)
+
+        text = registry.render()
+        assert 'tabletop_ingest_chunks_total{source="markdown_simple"} 20' in text
+        assert 'tabletop_ingest_last_chunks_per_second{source="markdown_simple"} 40' in text
+
+    def test_merges_worker_snapshots(self, tmp_path):
+        worker = MetricsRegistry(str(tmp_path))
+        worker.inc("llm_tokens_total", 100, model="gpt-4o-mini", direction="input")
+        worker.observe("stage_duration_seconds", 0.2, stage="llm_call")
+
+        # Another worker's snapshot, including one from a worker that has exited
+        other = worker.snapshot()
+        other["pid"] = 999999999
+        other["gauges"] = [["http_requests_in_flight", [], 3]]
+        (tmp_path / "metrics_999999999.json").write_text(json.dumps(other))
+
+        worker.add_gauge("http_requests_in_flight", 1)
+        merged = worker.merged()
+
+        assert merged["counters"][("llm_tokens_total", (("direction", "input"), ("model", "gpt-4o-mini")))] == 200
+        assert merged["histograms"][("stage_duration_seconds", (("stage", "llm_call"),))].count == 2
+        # Gauges of dead workers are dropped
+        assert merged["gauges"][("http_requests_in_flight", ())] == 1
+
+
+class TestMetricsEndpoint:
+    """Test suite for the /metrics endpoint and request middleware"""
+
+    def test_metrics_endpoint_reports_route_templates(self):
+        from main import app
+
+        metrics.reset()
+        client = TestClient(app)
+        client.get("/test")
+        client.get("/does-not-exist")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'tabletop_http_requests_total{method="GET",route="/test",status="200"} 1' in response.text
+        assert 'route="unmatched",status="404"' in response.text
+        assert "tabletop_http_request_duration_seconds_bucket" in response.text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,43 @@
+# tests/test_microbench.py - Tests for the microbenchmark runner
+import pytest
+from benchmarks.microbench import measure, compare, run_benchmarks, synthetic_rules, rulebook_rules
+
+
+class TestMicrobench:
+    """Test suite for microbenchmark measurement and baseline comparison"""
+
+    def test_measure_reports_rate_and_allocations(self):
+        stats = measure(lambda: [i for i in range(1000)], min_time=0.01, rounds=2)
+
+        assert stats["ops_per_sec"] > 0
+        assert stats["ops_per_sec"] >= stats["median_ops_per_sec"]
+        assert stats["alloc_peak_kib"] > 0
+        assert stats["rounds"] == 2
+
+    def test_compare_flags_regressions_past_threshold(self):
+        baseline = {"benchmarks": {
+            "fast": {"ops_per_sec": 1000.0, "alloc_peak_kib": 1.0},
+            "slow": {"ops_per_sec": 1000.0, "alloc_peak_kib": 1.0}
+        }}
+        current = {"benchmarks": {
+            "fast": {"ops_per_sec": 900.0, "alloc_peak_kib": 1.0},
+            "slow": {"ops_per_sec": 700.0, "alloc_peak_kib": 1.0},
+            "new": {"ops_per_sec": 10.0, "alloc_peak_kib": 1.0}
+        }}
+
+        regressions = compare(current, baseline, threshold=0.15)
+
+        assert [r["name"] for r in regressions] == ["slow"]
+
+    def test_fixtures_are_stable(self):
+        assert synthetic_rules(5) == synthetic_rules(5)
+        assert len(rulebook_rules("chess")) > 10
+
+    def test_run_benchmarks_with_filter(self):
+        results = run_benchmarks("create_structured_gaming_response", min_time=0.01, rounds=1)
+
+        assert list(results["benchmarks"]) == ["create_structured_gaming_response[chess]"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,166 @@
+# tests/test_precompute_service.py - Tests for batch-precomputed answers
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.precompute_service import PrecomputeService, normalize_question
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+RULES = [
+    {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square.", "category_id": "movement"},
+    {"game_id": "chess", "title": "Castling", "content": "The king moves two squares towards a rook.", "category_id": "special"}
+]
+
+
+async def retrieve(db, game_id, question):
+    return RULES
+
+
+def make_db(name):
+    db = mongomock_motor.AsyncMongoMockClient()[name]
+
+    async def seed():
+        await db.games.insert_one({"game_id": "chess", "name": "Chess", "corpus_version": 1})
+        queries = ["How do pawns move?"] * 3 + ["how do pawns move", "Can I castle?"]
+        await db.query_log.insert_many([
+            {"game_id": "chess", "query": query, "question": normalize_question(query)} for query in queries
+        ] + [{"game_id": "root", "query": "How do I win?", "question": "how do i win"}])
+    asyncio.run(seed())
+    return db
+
+
+class TestPrecomputeService:
+    """Test suite for PrecomputeService jobs and lookups"""
+
+    @pytest.fixture
+    def service(self):
+        return PrecomputeService(version_ttl_seconds=0)
+
+    def test_normalize_question(self):
+        assert normalize_question("  How do PAWNS move?! ") == "how do pawns move"
+
+    def test_top_questions_merge_phrasings(self, service):
+        db = make_db("precompute_top")
+
+        top = asyncio.run(service.top_questions(db, "chess", limit=5))
+
+        assert top[0]["question"] == "how do pawns move"
+        assert top[0]["count"] == 4
+        assert [entry["question"] for entry in top] == ["how do pawns move", "can i castle"]
+
+    def test_job_bounds_concurrency_and_stores_answers(self, service):
+        db = make_db("precompute_job")
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_generate(query, game_id, rules_context, history=None):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            return {"response": f"**Answer to {query}**", "ai_powered": True, "usage": {"total_tokens": 10}}
+
+        async def run():
+            with patch("app.services.ai_chat_service.ai_chat_service.generate_rule_response", side_effect=fake_generate):
+                job = service.start_job(db, retrieve, ["chess"], top_n=2, concurrency=1)
+                await job["task"]
+                return job, await service.lookup(db, "chess", "How do pawns move")
+
+        job, answer = asyncio.run(run())
+
+        assert job["status"] == "completed"
+        assert job["generated"] == 2
+        assert in_flight["max"] == 1
+        assert answer["response"] == "**Answer to How do pawns move?**"
+        assert answer["corpus_version"] == 1
+
+    def test_warm_answers_evict_least_recently_used_game(self):
+        service = PrecomputeService(version_ttl_seconds=60, max_warm_games=2)
+        db = make_db("precompute_warm_cap")
+
+        async def run():
+            for game_id in ("chess", "root", "go"):
+                await service.warm(db, game_id)
+                if game_id == "root":
+                    await service.lookup(db, "chess", "how do pawns move")
+
+        asyncio.run(run())
+
+        assert list(service.warm_answers) == ["chess", "go"]
+
+    def test_cancelled_job_is_marked_cancelled(self, service):
+        db = make_db("precompute_cancel")
+
+        async def slow_generate(query, game_id, rules_context, history=None):
+            await asyncio.sleep(10)
+
+        async def run():
+            with patch("app.services.ai_chat_service.ai_chat_service.generate_rule_response", side_effect=slow_generate):
+                job = service.start_job(db, retrieve, ["chess"], top_n=2)
+                await asyncio.sleep(0.05)
+                job["task"].cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await job["task"]
+                return service.job_status(job["job_id"])
+
+        status = asyncio.run(run())
+
+        assert status["status"] == "cancelled"
+        assert status["finished_at"] is not None
+
+    def test_new_corpus_version_hides_and_refresh_regenerates(self, service):
+        db = make_db("precompute_refresh")
+        calls = []
+
+        async def fake_generate(query, game_id, rules_context, history=None):
+            calls.append(query)
+            return {"response": f"v{len(calls)}", "ai_powered": True}
+
+        async def run():
+            with patch("app.services.ai_chat_service.ai_chat_service.generate_rule_response", side_effect=fake_generate):
+                job = service.start_job(db, retrieve, ["chess"], top_n=1)
+                await job["task"]
+                await service.bump_corpus_version(db, "chess")
+                stale = await service.lookup(db, "chess", "how do pawns move")
+                service.schedule_refresh(db, "chess", retrieve, delay=0)
+                await service._refresh_tasks["chess"]
+                return stale, await service.lookup(db, "chess", "how do pawns move")
+
+        stale, fresh = asyncio.run(run())
+
+        assert stale is None
+        assert fresh["corpus_version"] == 2
+        assert fresh["response"] == "v2"
+        assert len(calls) == 2
+
+
+class TestPrecomputedQueries:
+    """Test suite for serving precomputed answers on /api/chat/query"""
+
+    def test_query_served_without_llm(self):
+        from main import app
+        from app.database import get_database
+        from app.services.precompute_service import precompute_service
+
+        db = make_db("precompute_query")
+        precompute_service.versions.clear()
+        asyncio.run(db.precomputed_answers.insert_one({
+            "game_id": "chess", "question": "how do pawns move", "query": "how do pawns move?",
+            "corpus_version": 1, "response": "**Pawns move forward.**", "sources": [{"title": "Pawn Movement", "category_id": "movement"}]
+        }))
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            with patch("app.services.ai_chat_service.ai_chat_service.generate_rule_response_guarded") as guarded:
+                response = TestClient(app).post("/api/chat/query", json={"query": "How do pawns move?", "game_system": "chess"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.json()["search_method"] == "precomputed"
+        assert response.json()["structured_response"]["content"]["summary"]["text"] == "**Pawns move forward.**"
+        guarded.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,95 @@
+# tests/test_profiling.py - Tests for per-request stage profiles and Server-Timing headers
+import pytest
+from fastapi.testclient import TestClient
+from app.services.metrics import metrics
+from app.services.profiling import (
+    RequestProfile,
+    SlowRequestSampler,
+    span,
+    start_request_profile,
+    slow_requests
+)
+
+
+class TestRequestProfile:
+    """Test suite for spans, profiles and the slow-request sampler"""
+
+    def test_span_records_into_profile_and_metrics(self):
+        metrics.reset()
+        profile = start_request_profile("POST", "/api/chat/query")
+
+        with span("scoring"):
+            pass
+        with span("scoring"):
+            pass
+
+        assert profile.stages["scoring"][1] == 2
+        assert metrics.histograms[("stage_duration_seconds", (("stage", "scoring"),))].count == 2
+
+    def test_server_timing_header(self):
+        profile = RequestProfile("GET", "/")
+        profile.add("mongo_read", 0.0125)
+        profile.add("mongo_read", 0.0025)
+        profile.duration = 0.05
+
+        assert profile.server_timing() == "mongo_read;dur=15.0, total;dur=50.0"
+
+    def test_slow_requests_always_kept(self):
+        sampler = SlowRequestSampler(size=10, sample_rate=0.0, slow_seconds=0.5)
+        for duration in (0.1, 0.6, 2.0):
+            profile = RequestProfile("GET", "/")
+            profile.duration = duration
+            profile.route = "/"
+            sampler.offer(profile)
+
+        slowest = sampler.slowest()
+        assert [p["duration_ms"] for p in slowest] == [2000.0, 600.0]
+        assert sampler.slowest(route="/other") == []
+
+    def test_sampler_is_bounded(self):
+        sampler = SlowRequestSampler(size=3, sample_rate=1.0, slow_seconds=10.0)
+        for _ in range(5):
+            profile = RequestProfile("GET", "/")
+            profile.duration = 0.01
+            sampler.offer(profile)
+
+        assert len(sampler.profiles) == 3
+
+
+class TestProfilingEndpoints:
+    """Test suite for the Server-Timing middleware and admin listing"""
+
+    def test_response_has_server_timing(self):
+        from main import app
+
+        response = TestClient(app).get("/test")
+
+        assert response.status_code == 200
+        assert "total;dur=" in response.headers["server-timing"]
+
+    def test_slow_requests_endpoint(self):
+        from main import app
+        from app.services.auth_service import get_admin_user
+
+        slow_requests.clear()
+        profile = RequestProfile("POST", "/api/chat/query")
+        profile.route = "/api/chat/query"
+        profile.duration = 5.0
+        profile.add("llm_call", 4.5)
+        slow_requests.offer(profile)
+
+        app.dependency_overrides[get_admin_user] = lambda: {"username": "admin"}
+        try:
+            response = TestClient(app).get("/api/admin/profiling/slow-requests", params={"limit": 5})
+        finally:
+            app.dependency_overrides.clear()
+            slow_requests.clear()
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["requests"][0]["stages"]["llm_call"]["duration_ms"] == 4500.0
+        assert "sample_rate" in data["sampling"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+# tests/test_query_log.py - Tests for the buffered query log and its aggregations
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+from app.services.query_log import QueryLog, top_queries, latency_by_game
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class TestQueryLog:
+    """Test suite for QueryLog buffering and flushing"""
+
+    def test_record_normalizes_and_keeps_retrieval_ids(self):
+        log = QueryLog()
+
+        log.record("chess", "How do Pawns move?", "llm", [{"_id": 1}, {"_id": 2}], latency=0.25)
+
+        entry = log.buffer[0]
+        assert entry["question"] == "how do pawns move"
+        assert entry["retrieval_ids"] == ["1", "2"]
+        assert entry["result_count"] == 2
+        assert entry["latency_ms"] == 250.0
+
+    def test_full_buffer_drops_instead_of_blocking(self):
+        log = QueryLog(max_buffer=2)
+
+        for _ in range(5):
+            log.record("chess", "q", "template")
+
+        assert len(log.buffer) == 2
+        assert log.stats()["dropped"] == 3
+
+    def test_flush_writes_batches(self):
+        log = QueryLog(batch_size=2)
+        db = MagicMock()
+        db.query_log.insert_many = AsyncMock()
+        for i in range(5):
+            log.record("chess", f"question {i}", "template")
+
+        written = asyncio.run(log.flush(db))
+
+        assert written == 5
+        assert db.query_log.insert_many.await_count == 3
+        assert log.buffer == []
+
+    def test_failed_batch_is_dropped(self):
+        log = QueryLog()
+        db = MagicMock()
+        db.query_log.insert_many = AsyncMock(side_effect=RuntimeError("down"))
+        log.record("chess", "q", "template")
+
+        assert asyncio.run(log.flush(db)) == 0
+        assert log.stats() == {"buffered": 0, "written": 0, "dropped": 1}
+
+
+class TestQueryAggregations:
+    """Test suite for query log aggregations"""
+
+    @pytest.fixture
+    def db(self):
+        db = mongomock_motor.AsyncMongoMockClient()["query_log_test"]
+        now = datetime.utcnow()
+        rows = [
+            ("chess", "how do pawns move", 1, "llm", 900.0),
+            ("chess", "how do pawns move", 1, "precomputed", 100.0),
+            ("chess", "what is a zugzwang", 0, "no_results", 20.0),
+            ("root", "how do i win", 3, "template", 50.0)
+        ]
+        asyncio.run(db.query_log.insert_many([
+            {"game_id": g, "question": q, "query": q, "result_count": n, "path": p, "latency_ms": ms, "created_at": now}
+            for g, q, n, p, ms in rows
+        ]))
+        return db
+
+    def test_top_and_zero_result_queries(self, db):
+        top = asyncio.run(top_queries(db, "chess"))
+        zero = asyncio.run(top_queries(db, zero_results=True))
+
+        assert top[0]["question"] == "how do pawns move"
+        assert top[0]["count"] == 2
+        assert top[0]["avg_latency_ms"] == 500.0
+        assert [q["question"] for q in zero] == ["what is a zugzwang"]
+
+    def test_latency_by_game(self, db):
+        games = asyncio.run(latency_by_game(db))
+
+        assert games[0]["game_id"] == "chess"
+        assert games[0]["queries"] == 3
+        assert games[0]["paths"] == {"llm": 1, "precomputed": 1, "no_results": 1}
+        assert games[0]["max_latency_ms"] == 900.0
+
+
+class TestQueryLogging:
+    """Test suite for query logging on /api/chat/query"""
+
+    def test_queries_are_logged(self):
+        from main import app
+        from app.database import get_database
+        from app.services.query_log import query_log
+        from app.services.corpus_cache import corpus_cache
+
+        db = mongomock_motor.AsyncMongoMockClient()["query_logging_test"]
+        query_log.buffer.clear()
+        corpus_cache.clear()
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            TestClient(app).post("/api/chat/query", json={"query": "How do pawns move?", "game_system": "chess"})
+        finally:
+            app.dependency_overrides.clear()
+
+        entry = query_log.buffer.pop()
+        assert entry["game_id"] == "chess"
+        assert entry["path"] == "no_results"
+        assert entry["latency_ms"] is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,157 @@
+# tests/test_retrieval_cache.py - Tests for per-conversation retrieval reuse
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.retrieval_cache import RetrievalCache
+from app.routes.chat import rerank_followup, is_followup
+
+RULES = [
+    {"_id": 1, "title": "Pawn Movement", "content": "Pawns move forward one square.", "category_id": "movement"},
+    {"_id": 2, "title": "Pawn Promotion", "content": "A pawn reaching the last rank is promoted.", "category_id": "special"},
+    {"_id": 3, "title": "Capturing", "content": "A captured piece is removed from the board.", "category_id": "capture"}
+]
+
+
+class TestRetrievalCache:
+    """Test suite for RetrievalCache expiry and eviction"""
+
+    def test_get_after_put(self):
+        cache = RetrievalCache(ttl_seconds=60)
+        cache.put(("alice", "c1"), "chess", "how do pawns move", RULES[:2])
+
+        entry = cache.get(("alice", "c1"), "chess")
+
+        assert entry["rules"] == RULES[:2]
+        assert entry["query"] == "how do pawns move"
+
+    def test_expired_and_other_game_miss(self):
+        cache = RetrievalCache(ttl_seconds=-1)
+        cache.put(("alice", "c1"), "chess", "q", RULES)
+        assert cache.get(("alice", "c1"), "chess") is None
+
+        cache = RetrievalCache(ttl_seconds=60)
+        cache.put(("alice", "c1"), "chess", "q", RULES)
+        assert cache.get(("alice", "c1"), "root") is None
+
+    def test_lru_eviction_and_invalidation(self):
+        cache = RetrievalCache(ttl_seconds=60, max_entries=2)
+        cache.put(("a", "1"), "chess", "q", RULES)
+        cache.put(("a", "2"), "root", "q", RULES)
+        cache.get(("a", "1"), "chess")
+        cache.put(("a", "3"), "chess", "q", RULES)
+
+        assert set(cache.entries) == {("a", "1"), ("a", "3")}
+        cache.invalidate_game("chess")
+        assert cache.entries == {}
+
+
+class TestFollowupRerank:
+    """Test suite for re-ranking follow-ups within cached candidates"""
+
+    def test_fresh_rules_join_the_pool(self):
+        cached = {"query": "how do pawns move", "rules": RULES[:2]}
+
+        ranked = rerank_followup(cached, [RULES[2], RULES[0]], "what happens when captured")
+
+        assert ranked[0]["_id"] == 3
+        assert len({r["_id"] for r in ranked}) == len(ranked)
+
+    def test_previous_question_fills_in_topic(self):
+        cached = {"query": "how do pawns move", "rules": RULES[:2]}
+
+        ranked = rerank_followup(cached, [], "and on the first turn")
+
+        assert ranked[0]["title"] == "Pawn Movement"
+
+    def test_unmatched_followup_is_not_filled_from_cache(self):
+        cached = {"query": "what is zugzwang", "rules": RULES[:2]}
+
+        assert rerank_followup(cached, [], "and stalemate?") == []
+
+
+class TestFollowupDetection:
+    """Test suite for telling follow-ups from new topics"""
+
+    @pytest.fixture
+    def cached(self):
+        return {"query": "how do pawns move", "rules": RULES[:2]}
+
+    def test_references_and_shared_terms_are_followups(self, cached):
+        assert is_followup(cached, "what if it is captured?")
+        assert is_followup(cached, "and on the first turn?")
+        assert is_followup(cached, "can a pawn move backwards?")
+        assert is_followup(cached, "why?")
+
+    def test_new_topic_is_not_a_followup(self, cached):
+        assert not is_followup(cached, "how does castling work?")
+
+
+class TestFollowupQueries:
+    """Test suite for follow-up queries on /api/chat/query"""
+
+    def test_second_question_uses_cache(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.retrieval_cache import retrieval_cache
+        from app.services.corpus_cache import corpus_cache
+
+        db = mongomock_motor.AsyncMongoMockClient()["followup_test"]
+        asyncio.run(db.content_chunks.insert_many([
+            {"game_id": "chess", "title": r["title"], "content": r["content"], "category_id": r["category_id"]}
+            for r in RULES
+        ]))
+
+        retrieval_cache.clear()
+        corpus_cache.clear()
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            with patch("app.services.conversation_service.get_database", return_value=db):
+                client = TestClient(app)
+                first = client.post("/api/chat/query", json={"query": "How do pawns move?", "game_system": "chess", "conversation_id": "c1"})
+                second = client.post("/api/chat/query", json={"query": "What if it is captured?", "game_system": "chess", "conversation_id": "c1"})
+        finally:
+            app.dependency_overrides.clear()
+            retrieval_cache.clear()
+
+        assert first.status_code == 200
+        assert first.json()["metadata"]["retrieval"] == "full"
+        assert second.json()["metadata"]["retrieval"] == "followup_cache"
+        assert second.json()["metadata"]["history_messages"] == 2
+
+    def test_new_topic_gets_fresh_search(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.retrieval_cache import retrieval_cache
+        from app.services.corpus_cache import corpus_cache
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["followup_test"]
+        asyncio.run(db.content_chunks.insert_many([
+            {"game_id": "chess", "title": r["title"], "content": r["content"], "category_id": r["category_id"]}
+            for r in RULES + [{"title": "Castling", "content": "The king moves two squares towards a rook.", "category_id": "special"}]
+        ]))
+
+        retrieval_cache.clear()
+        corpus_cache.clear()
+        search_indexes.corpus.clear()
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            with patch("app.services.conversation_service.get_database", return_value=db):
+                client = TestClient(app)
+                client.post("/api/chat/query", json={"query": "How do pawns move?", "game_system": "chess", "conversation_id": "c2"})
+                second = client.post("/api/chat/query", json={"query": "How does castling work?", "game_system": "chess", "conversation_id": "c2"})
+        finally:
+            app.dependency_overrides.clear()
+            retrieval_cache.clear()
+            corpus_cache.clear()
+            search_indexes.corpus.clear()
+
+        assert second.json()["metadata"]["retrieval"] == "full"
+        assert "Castling" in str(second.json()["structured_response"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,76 @@
+# tests/test_retrieval_eval.py - Tests for the labeled retrieval evaluation
+import asyncio
+import pytest
+from unittest.mock import patch
+from benchmarks.retrieval_eval import (
+    recall_at_k,
+    reciprocal_rank,
+    ndcg_at_k,
+    reciprocal_rank_fusion,
+    load_eval_set,
+    eval_games,
+    compare,
+    run_eval
+)
+from benchmarks.microbench import rulebook_rules
+
+
+class TestRetrievalMetrics:
+    """Test suite for recall@k, MRR, nDCG and rank fusion"""
+
+    def test_recall_and_reciprocal_rank(self):
+        ranked = ["a", "b", "c", "d"]
+
+        assert recall_at_k(ranked, ["b", "d"], 2) == 0.5
+        assert recall_at_k(ranked, ["b", "d"], 4) == 1.0
+        assert reciprocal_rank(ranked, ["c"], 10) == pytest.approx(1 / 3)
+        assert reciprocal_rank(ranked, ["c"], 2) == 0.0
+
+    def test_ndcg_is_graded_by_label_order(self):
+        assert ndcg_at_k(["a", "b"], ["a", "b"], 2) == pytest.approx(1.0)
+        swapped = ndcg_at_k(["b", "a"], ["a", "b"], 2)
+        assert 0 < swapped < 1
+        assert ndcg_at_k(["x", "y"], ["a"], 2) == 0.0
+
+    def test_reciprocal_rank_fusion(self):
+        assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]]) == ["b", "c", "a"]
+
+
+class TestEvalSets:
+    """Test suite for the labeled queries and the runner"""
+
+    def test_labels_name_real_chunks(self):
+        assert eval_games() == ["chess", "root"]
+        for game in eval_games():
+            titles = {rule["title"] for rule in rulebook_rules(game)}
+            for item in load_eval_set(game):
+                assert item["relevant"] and set(item["relevant"]) <= titles, item["query"]
+
+    def test_run_eval_reports_quality_and_latency(self):
+        with patch("app.services.ai_service.settings.openai_api_key", None):
+            results = asyncio.run(run_eval(["chess"], ["keyword", "vector", "hybrid"], repeat=1))
+
+        strategies = results["games"]["chess"]["strategies"]
+        assert "skipped" in strategies["vector"]
+        for name in ("keyword", "hybrid"):
+            assert 0 < strategies[name]["recall@5"] <= 1
+            assert 0 < strategies[name]["mrr"] <= 1
+            assert strategies[name]["latency_p95_ms"] >= strategies[name]["latency_p50_ms"] > 0
+            assert len(strategies[name]["queries"]) == len(load_eval_set("chess"))
+
+    def test_unknown_strategy_rejected(self):
+        with pytest.raises(ValueError):
+            asyncio.run(run_eval(["chess"], ["telepathy"]))
+
+    def test_compare_flags_quality_drops(self):
+        def result(recall):
+            stats = {"recall@5": recall, "mrr": 0.5, "ndcg@5": 0.5, "latency_p50_ms": 1.0}
+            return {"games": {"chess": {"strategies": {"keyword": stats, "vector": {"skipped": "no key"}}}}}
+
+        assert compare(result(0.79), result(0.8), threshold=0.02) == []
+        regressions = compare(result(0.7), result(0.8), threshold=0.02)
+        assert [(r["strategy"], r["metric"]) for r in regressions] == [("keyword", "recall@5")]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,247 @@
+# tests/test_search_index.py - Tests for the keyword search inverted index
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.services.search_index import RuleIndex, federated_search, highlight, parse_query, pooled_stats
+
+RULES = [
+    {"game_id": "chess", "title": "Pawn Movement", "content": "Pawns move forward one square. On their first move pawns may move two squares.", "category_id": "movement"},
+    {"game_id": "chess", "title": "En Passant", "content": "A pawn that moves two squares may be captured en passant by an adjacent enemy pawn.", "category_id": "special"},
+    {"game_id": "chess", "title": "Castling", "content": "The king moves two squares towards a rook, which jumps over it.", "category_id": "special"},
+    {"game_id": "chess", "title": "Check", "content": "A king attacked by an enemy piece is in check.", "category_id": "endgame"}
+]
+
+
+class TestRuleIndex:
+    """Test suite for RuleIndex search"""
+
+    @pytest.fixture
+    def index(self):
+        return RuleIndex(RULES)
+
+    def test_parse_query(self):
+        assert parse_query('"two squares" cast* en-passant king') == [
+            ("phrase", ["two", "square"]),
+            ("prefix", ["cast"]),
+            ("phrase", ["en", "passant"]),
+            ("term", ["king"])
+        ]
+
+    def test_title_matches_rank_first(self, index):
+        total, hits = index.search("pawn")
+
+        assert total == 2
+        assert [hit["rule"]["title"] for hit in hits] == ["Pawn Movement", "En Passant"]
+
+    def test_rules_matching_more_terms_rank_higher(self, index):
+        total, hits = index.search("king check")
+
+        assert total == 2
+        assert hits[0]["rule"]["title"] == "Check"
+
+    def test_phrase_is_required_and_ordered(self, index):
+        assert index.search('"squares two"')[0] == 0
+        total, hits = index.search('"enemy pawn"')
+        assert total == 1
+        assert hits[0]["rule"]["title"] == "En Passant"
+        start = RULES[1]["content"].index("enemy pawn")
+        assert hits[0]["matches"]["content"] == [(start, start + len("enemy pawn"))]
+
+    def test_prefix_expands_to_indexed_terms(self, index):
+        total, hits = index.search("cast*")
+
+        assert total == 1
+        assert hits[0]["rule"]["title"] == "Castling"
+
+    def test_no_match(self, index):
+        assert index.search("bishop") == (0, [])
+        assert index.search("") == (0, [])
+
+    def test_limit(self, index):
+        total, hits = index.search("two", limit=1)
+
+        assert total == 3
+        assert len(hits) == 1
+
+    def test_highlight_escapes_rule_text(self):
+        text = "<script>alert(1)</script> & pawns"
+
+        assert highlight(text, [(28, 33)]) == "&lt;script&gt;alert(1)&lt;/script&gt; &amp; <mark>pawns</mark>"
+
+    def test_highlight_wraps_matches_and_trims(self, index):
+        _, hits = index.search("pawn move")
+        rule = hits[0]["rule"]
+
+        assert highlight(rule["title"], hits[0]["matches"]["title"]) == "<mark>Pawn</mark> Movement"
+        assert highlight(rule["content"], hits[0]["matches"]["content"], max_chars=40) == (
+            "<mark>Pawns</mark> <mark>move</mark> forward one square. On their ..."
+        )
+
+
+class TestKeywordSearchEndpoint:
+    """Test suite for /api/chat/search/{game_id}"""
+
+    def test_search_uses_index_and_follows_corpus_changes(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["keyword_search_test"]
+        asyncio.run(db.content_chunks.insert_many([dict(rule) for rule in RULES]))
+        search_indexes.corpus.clear()
+        search_indexes.indexes.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            client = TestClient(app)
+            first = client.get("/api/chat/search/chess", params={"q": '"two squares" king'})
+            asyncio.run(db.content_chunks.insert_one({"game_id": "chess", "title": "King Safety", "content": "Keep the king safe."}))
+            search_indexes.invalidate("chess")
+            second = client.get("/api/chat/search/chess", params={"q": "king", "limit": 1})
+        finally:
+            app.dependency_overrides.clear()
+            search_indexes.invalidate("chess")
+
+        assert first.status_code == 200
+        body = first.json()
+        assert body["total_found"] == 3
+        assert body["results"][0]["title"] == "Castling"
+        assert body["results"][0]["highlight"].startswith("The <mark>king</mark> moves <mark>two squares</mark>")
+        assert body["results"][0]["score"] > body["results"][1]["score"]
+        assert second.json()["total_found"] == 3
+        assert second.json()["results"][0]["title"] == "King Safety"
+        assert second.json()["results"][0]["title_highlight"] == "<mark>King</mark> Safety"
+
+
+
+ROOT_RULES = [
+    {"game_id": "root", "title": "Battle", "content": "The attacker rolls two dice; the defender takes hits.", "category_id": "actions"},
+    {"game_id": "root", "title": "Marquise de Cat", "content": "Place workshops, sawmills and recruiters; the king of cats is absent.", "category_id": "factions"}
+]
+
+
+class TestFederatedSearch:
+    """Test suite for cross-game search"""
+
+    def test_games_searched_concurrently_and_slow_games_reported(self):
+        indexes = {"chess": RuleIndex(RULES), "root": RuleIndex(ROOT_RULES)}
+
+        async def fake_get(db, game_id):
+            await asyncio.sleep(0.5 if game_id == "slow" else 0.1)
+            return indexes.get(game_id) or RuleIndex([])
+
+        async def run():
+            with patch("app.services.search_index.search_indexes.get", side_effect=fake_get):
+                start = time.perf_counter()
+                merged = await federated_search(None, ["chess", "root", "slow"], "king", limit=3, timeout=0.3)
+                return merged, time.perf_counter() - start
+
+        merged, elapsed = asyncio.run(run())
+
+        assert elapsed < 0.45
+        assert merged["failed"] == {"slow": "timeout"}
+        assert merged["per_game"] == {"chess": 2, "root": 1}
+        assert merged["total_found"] == 3
+        scores = [hit["score"] for hit in merged["hits"]]
+        assert scores == sorted(scores, reverse=True)
+        assert {hit["game_id"] for hit in merged["hits"]} == {"chess", "root"}
+
+    def test_search_stops_at_deadline(self):
+        class SlowIndex(RuleIndex):
+            def search(self, q, limit=10, stats=None):
+                time.sleep(0.2)
+                return super().search(q, limit, stats)
+
+        indexes = {game_id: SlowIndex(RULES) for game_id in ("a", "b", "c")}
+
+        async def fake_get(db, game_id):
+            return indexes[game_id]
+
+        async def run():
+            with patch("app.services.search_index.search_indexes.get", side_effect=fake_get):
+                return await federated_search(None, ["a", "b", "c"], "king", limit=3, timeout=0.3)
+
+        merged = asyncio.run(run())
+
+        assert merged["per_game"] == {"a": 2, "b": 2}
+        assert merged["failed"] == {"c": "timeout"}
+
+    def test_global_top_k(self):
+        indexes = {"chess": RuleIndex(RULES), "root": RuleIndex(ROOT_RULES)}
+
+        async def fake_get(db, game_id):
+            return indexes[game_id]
+
+        async def run():
+            with patch("app.services.search_index.search_indexes.get", side_effect=fake_get):
+                return await federated_search(None, ["chess", "root"], "king two", limit=2)
+
+        merged = asyncio.run(run())
+        stats = pooled_stats(list(indexes.values()), "king two")
+        expected = sorted(
+            [(hit["score"], "chess") for hit in indexes["chess"].search("king two", stats=stats)[1]]
+            + [(hit["score"], "root") for hit in indexes["root"].search("king two", stats=stats)[1]],
+            reverse=True
+        )[:2]
+
+        assert [(hit["score"], hit["game_id"]) for hit in merged["hits"]] == expected
+
+    def test_weak_hit_ranks_below_strong_hits_in_other_game(self):
+        indexes = {"root": RuleIndex(ROOT_RULES), "chess": RuleIndex(RULES)}
+
+        async def fake_get(db, game_id):
+            return indexes[game_id]
+
+        async def run():
+            with patch("app.services.search_index.search_indexes.get", side_effect=fake_get):
+                return await federated_search(None, ["root", "chess"], "king two squares", limit=3)
+
+        merged = asyncio.run(run())
+
+        assert merged["per_game"]["root"] == 2
+        assert [hit["game_id"] for hit in merged["hits"]] == ["chess", "chess", "chess"]
+        assert merged["hits"][0]["rule"]["title"] == "Castling"
+
+    def test_endpoint_filters_games(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["federated_search_test"]
+
+        async def seed():
+            await db.games.insert_many([
+                {"game_id": "chess", "name": "Chess", "complexity": "medium", "ai_tags": ["strategy", "classic"], "min_players": 2, "max_players": 2},
+                {"game_id": "root", "name": "Root", "complexity": "hard", "ai_tags": ["strategy", "asymmetric"], "min_players": 2, "max_players": 4}
+            ])
+            await db.content_chunks.insert_many([dict(rule) for rule in RULES + ROOT_RULES])
+        asyncio.run(seed())
+        search_indexes.corpus.clear()
+        search_indexes.indexes.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            client = TestClient(app)
+            everything = client.get("/api/chat/search", params={"q": "king", "tags": "strategy"})
+            four_players = client.get("/api/chat/search", params={"q": "king", "players": 4})
+            library = client.get("/api/chat/search", params={"q": "king", "games": "chess", "complexity": "medium"})
+        finally:
+            app.dependency_overrides.clear()
+            search_indexes.invalidate("chess")
+            search_indexes.invalidate("root")
+
+        assert everything.status_code == 200
+        assert everything.json()["games_searched"] == 2
+        assert everything.json()["per_game"] == {"chess": 2, "root": 1}
+        assert everything.json()["failed_games"] == {}
+        assert four_players.json()["games_searched"] == 1
+        assert [r["game_name"] for r in four_players.json()["results"]] == ["Root"]
+        assert {r["game_id"] for r in library.json()["results"]} == {"chess"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
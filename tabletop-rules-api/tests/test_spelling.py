@@ -0,0 +1,98 @@
+# tests/test_spelling.py - Tests for typo correction of query terms
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+from app.services.spelling import SymSpell, build_vocabulary, edit_distance, deletes
+
+RULES = [
+    {"game_id": "root", "title": "The Vagabond", "content": "The Vagabond explores the forests and crafts items.", "category_id": "factions"},
+    {"game_id": "root", "title": "The Eyrie Dynasties", "content": "The Eyrie must follow their Decree every turn.", "category_id": "factions"},
+    {"game_id": "root", "title": "Battle", "content": "In battle the attacker rolls two dice.", "category_id": "actions"}
+]
+
+
+class TestEditDistance:
+    """Test suite for edit_distance and deletes"""
+
+    def test_transposition_is_one_edit(self):
+        assert edit_distance("eyire", "eyrie", 2) == 1
+        assert edit_distance("battle", "battle", 1) == 0
+
+    def test_gives_up_past_max_distance(self):
+        assert edit_distance("kitten", "sitting", 2) is None
+        assert edit_distance("cat", "category", 2) is None
+
+    def test_deletes(self):
+        assert deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+
+
+class TestSymSpell:
+    """Test suite for SymSpell lookups and query correction"""
+
+    @pytest.fixture
+    def speller(self):
+        return SymSpell(build_vocabulary(RULES, {"keywords": [{"term": "ambush"}]}))
+
+    def test_lookup_finds_closest_word(self, speller):
+        assert speller.lookup("vagabnd") == ("vagabond", 1)
+        assert speller.lookup("eyire") == ("eyrie", 1)
+        assert speller.lookup("ambsuh") == ("ambush", 1)
+        assert speller.lookup("battle") == ("battle", 0)
+        assert speller.lookup("wizard") is None
+
+    def test_correct_reports_corrections(self, speller):
+        corrected, corrections = speller.correct("What does the Vagabnd do in a battel?")
+
+        assert corrected == "what does the vagabond do in a battle?"
+        assert corrections == [
+            {"from": "vagabnd", "to": "vagabond", "distance": 1},
+            {"from": "battel", "to": "battle", "distance": 1}
+        ]
+
+    def test_common_and_short_words_left_alone(self, speller):
+        assert speller.correct("how does this work") == ("how does this work", [])
+        assert speller.correct("the dyce") == ("the dyce", [])
+        assert speller.correct("who explore") == ("who explore", [])
+
+
+class TestCorrectedQueries:
+    """Test suite for spelling correction on /api/chat/query"""
+
+    def test_misspelled_query_finds_rules(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.corpus_cache import corpus_cache
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["spelling_test"]
+        asyncio.run(db.content_chunks.insert_many([dict(rule) for rule in RULES]))
+        corpus_cache.clear()
+        search_indexes.corpus.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            with patch(
+                "app.services.ai_chat_service.ai_chat_service.generate_rule_response_guarded",
+                new=AsyncMock(return_value={"error": "disabled"})
+            ):
+                response = TestClient(app).post("/api/chat/query", json={"query": "Tell me about the Vagabnd", "game_system": "root"})
+        finally:
+            app.dependency_overrides.clear()
+            corpus_cache.clear()
+            search_indexes.invalidate("root")
+
+        assert response.status_code == 200
+        assert response.json()["search_method"] == "enhanced_scoring_fallback"
+        assert response.json()["metadata"]["corrections"] == [{"from": "vagabnd", "to": "vagabond", "distance": 1}]
+        assert "The Vagabond explores" in str(response.json()["structured_response"]["content"])
+
+    def test_corrections_counter_is_registered(self):
+        from app.services.metrics import METRICS
+
+        assert METRICS["query_spelling_corrections_total"][0] == "counter"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,84 @@
+# tests/test_typeahead.py - Tests for the typeahead prefix index
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.services.typeahead import PrefixIndex, extract_suggestions
+
+RULES = [
+    {"game_id": "chess", "title": "Rule: En Passant", "content": "## Rule: En Passant\n\n**Category**: Special Moves\n\nA pawn that moved two squares may be captured."},
+    {"game_id": "chess", "title": "Castling (Part 1)", "content": "## Castling\n\n### Castling Conditions\n\n**Stalemate**: no legal move and not in check."},
+    {"game_id": "chess", "title": "Castling (Part 2)", "content": "The king moves two squares towards a rook."},
+    {"game_id": "chess", "title": "Passed Pawns", "content": "A pawn with no opposing pawns ahead of it."}
+]
+
+BOOST_RULES = {"entities": [{"term": "pawn", "phrases": ["pawn movement"]}], "keywords": [{"term": "castling"}]}
+
+
+class TestExtractSuggestions:
+    """Test suite for extract_suggestions"""
+
+    def test_titles_headings_and_terms(self):
+        suggestions = {s["text"]: s for s in extract_suggestions(RULES, BOOST_RULES)}
+
+        assert set(suggestions) == {
+            "En Passant", "Castling", "Castling Conditions", "Stalemate", "Passed Pawns", "pawn", "pawn movement"
+        }
+        assert suggestions["Castling"]["kind"] == "title"
+        assert suggestions["Castling Conditions"]["kind"] == "heading"
+        assert suggestions["Stalemate"]["kind"] == "term"
+        assert suggestions["Castling"]["weight"] > suggestions["En Passant"]["weight"]
+
+
+class TestPrefixIndex:
+    """Test suite for PrefixIndex completion"""
+
+    @pytest.fixture
+    def index(self):
+        return PrefixIndex(extract_suggestions(RULES, BOOST_RULES))
+
+    def test_matches_any_word_start_first_word_first(self, index):
+        texts = [s["text"] for s in index.complete("pass")]
+
+        assert texts == ["Passed Pawns", "En Passant"]
+
+    def test_completes_end_of_question(self, index):
+        suggestions = index.complete("How does en pa")
+
+        assert suggestions[0] == {"text": "En Passant", "kind": "title", "replace_from": 9}
+
+    def test_limit_and_no_match(self, index):
+        assert len(index.complete("c", limit=1)) == 1
+        assert index.complete("bishop") == []
+        assert index.complete("   ") == []
+
+
+class TestSuggestEndpoint:
+    """Test suite for /api/chat/suggest/{game_id}"""
+
+    def test_suggestions_served_for_game(self):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from main import app
+        from app.database import get_database
+        from app.services.search_index import search_indexes
+
+        db = mongomock_motor.AsyncMongoMockClient()["typeahead_test"]
+        asyncio.run(db.content_chunks.insert_many([dict(rule) for rule in RULES]))
+        search_indexes.corpus.clear()
+
+        app.dependency_overrides[get_database] = lambda: db
+        try:
+            client = TestClient(app)
+            response = client.get("/api/chat/suggest/chess", params={"q": "can I cast"})
+            missing = client.get("/api/chat/suggest/chess", params={"q": ""})
+        finally:
+            app.dependency_overrides.clear()
+            search_indexes.invalidate("chess")
+
+        assert response.status_code == 200
+        assert response.json()["suggestions"][0]["text"] == "Castling"
+        assert response.json()["suggestions"][0]["replace_from"] == 6
+        assert missing.status_code == 422
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
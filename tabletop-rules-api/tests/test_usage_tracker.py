@@ -0,0 +1,123 @@
+# tests/test_usage_tracker.py - Tests for running usage counters and minute rollups
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.usage_tracker import UsageTracker
+
+
+class TestUsageTracker:
+    """Test suite for UsageTracker counters, ring buffer and rollup flushes"""
+
+    @pytest.fixture
+    def tracker(self):
+        return UsageTracker(recent_size=3)
+
+    def test_summary_from_running_counters(self, tracker):
+        tracker.record("gpt-4o-mini", 100, 50, 0.001, game_id="chess", latency=0.5)
+        tracker.record("gpt-4o-mini", 200, 100, 0.002, game_id="root", latency=1.5)
+
+        summary = tracker.summary()
+
+        assert summary["total_requests"] == 2
+        assert summary["total_tokens"] == 450
+        assert summary["total_cost"] == 0.003
+        assert summary["average_latency"] == 1.0
+        assert summary["last_24h"] == 2
+        assert summary["by_game"]["chess"]["requests"] == 1
+
+    def test_ring_buffer_keeps_totals(self, tracker):
+        for _ in range(5):
+            tracker.record("gpt-4o-mini", 10, 5, 0.001)
+
+        assert len(tracker.recent) == 3
+        assert tracker.summary()["total_requests"] == 5
+
+    def test_rollups_grouped_by_minute_game_and_model(self, tracker):
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess", latency=0.2)
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess", latency=0.4)
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="root")
+
+        assert len(tracker.pending) <= 4  # At most one extra key if a minute boundary passed
+        chess = [r for (_, game, _), r in tracker.pending.items() if game == "chess"]
+        assert sum(r["requests"] for r in chess) == 2
+        assert max(r["latency_max"] for r in chess) == 0.4
+
+    @pytest.mark.asyncio
+    async def test_flush_batches_writes(self, tracker):
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess")
+        tracker.record("gpt-4o-mini", 20, 5, 0.002, game_id="root")
+        db = MagicMock()
+        db.usage_rollups.bulk_write = AsyncMock()
+        db.usage_totals.update_one = AsyncMock()
+
+        written = await tracker.flush(db)
+
+        assert written >= 2
+        db.usage_rollups.bulk_write.assert_awaited_once()
+        update = db.usage_totals.update_one.await_args.args[1]
+        assert update["$inc"]["requests"] == 2
+        assert update["$inc"]["input_tokens"] == 30
+        assert tracker.pending == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_pending(self, tracker):
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess")
+        db = MagicMock()
+        db.usage_rollups.bulk_write = AsyncMock(side_effect=RuntimeError("down"))
+
+        with pytest.raises(RuntimeError):
+            await tracker.flush(db)
+
+        assert sum(r["requests"] for r in tracker.pending.values()) == 1
+
+    @pytest.mark.asyncio
+    async def test_partial_bulk_write_requeues_only_failed_rollups(self, tracker):
+        from pymongo.errors import BulkWriteError
+
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess")
+        tracker.record("gpt-4o-mini", 20, 5, 0.002, game_id="root")
+        failed_key = list(tracker.pending)[1]
+        db = MagicMock()
+        db.usage_rollups.bulk_write = AsyncMock(side_effect=BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "boom"}]}))
+        db.usage_totals.update_one = AsyncMock()
+
+        with pytest.raises(BulkWriteError):
+            await tracker.flush(db)
+
+        assert list(tracker.pending) == [failed_key]
+        assert db.usage_totals.update_one.await_args.args[1]["$inc"]["input_tokens"] == 10
+
+    @pytest.mark.asyncio
+    async def test_failed_totals_update_retried_without_rewriting_rollups(self, tracker):
+        tracker.record("gpt-4o-mini", 10, 5, 0.001, game_id="chess")
+        db = MagicMock()
+        db.usage_rollups.bulk_write = AsyncMock()
+        db.usage_totals.update_one = AsyncMock(side_effect=[RuntimeError("down"), None])
+
+        with pytest.raises(RuntimeError):
+            await tracker.flush(db)
+        assert tracker.pending == {}
+
+        await tracker.flush(db)
+
+        db.usage_rollups.bulk_write.assert_awaited_once()
+        assert db.usage_totals.update_one.await_args.args[1]["$inc"]["requests"] == 1
+        assert tracker.pending_totals["requests"] == 0
+
+    @pytest.mark.asyncio
+    async def test_fleet_summary_reads_totals_document(self, tracker):
+        db = MagicMock()
+        db.usage_totals.find_one = AsyncMock(return_value={
+            "_id": "all", "requests": 4, "input_tokens": 400, "output_tokens": 200,
+            "cost": 0.004, "latency_sum": 8.0, "latency_count": 4, "updated_at": None
+        })
+
+        fleet = await tracker.fleet_summary(db)
+
+        db.usage_totals.find_one.assert_awaited_once_with({"_id": "all"})
+        assert fleet["requests"] == 4
+        assert fleet["average_latency"] == 2.0
+        assert await tracker.fleet_summary(None) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
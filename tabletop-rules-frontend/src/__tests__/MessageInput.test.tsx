@@ -203,4 +203,29 @@ describe('MessageInput', () => {
     expect(mockOnSendMessage).toHaveBeenCalledWith('Test message');
     expect(textarea).toHaveValue(''); // Should clear after sending
   });
-});
\ No newline at end of file
+
+  test('shows suggestions for the selected game and applies one', async () => {
+    (global.fetch as jest.Mock).mockImplementation(() =>
+      Promise.resolve({
+        ok: true,
+        status: 200,
+        json: () => Promise.resolve({
+          suggestions: [{ text: 'En Passant', kind: 'title', replace_from: 9 }],
+        }),
+      })
+    );
+    const user = userEvent.setup();
+    render(<MessageInput {...defaultProps} gameId="chess" />);
+    
+    const textarea = screen.getByPlaceholderText('Ask a question about the rules...');
+    await user.type(textarea, 'How does en pa');
+    
+    const option = await screen.findByRole('option', { name: 'En Passant' });
+    expect(global.fetch).toHaveBeenCalledWith('/api/chat/suggest/chess?q=How%20does%20en%20pa&limit=5');
+    
+    await user.click(option);
+    
+    expect(textarea).toHaveValue('How does En Passant ');
+    expect(screen.queryByRole('listbox')).not.toBeInTheDocument();
+  });
+});
@@ -49,6 +49,19 @@ describe('Game Selection', () => {
       });
     });
 
+    test('prepares the selected game on the server', async () => {
+      render(<GameSelector />);
+      
+      await waitFor(() => {
+        expect(screen.getByText('Chess')).toBeInTheDocument();
+      });
+
+      const chessCard = screen.getAllByText('Chess')[0].closest('div');
+      fireEvent.click(chessCard!);
+      
+      expect(global.fetch).toHaveBeenCalledWith('/api/games/chess/prepare', { method: 'POST' });
+    });
+
     test('handles API error gracefully', async () => {
       // Mock fetch to return error for this test
       (global.fetch as jest.Mock).mockImplementationOnce(() => {
@@ -56,7 +56,7 @@ interface QueryResponse {
 export const ChatInterface: React.FC = () => {
   const navigate = useNavigate();
   const { gameId, conversationId } = useParams<{ gameId?: string; conversationId?: string }>();
-  const { messages, isLoading, currentGameId, addMessage, setLoading, setCurrentGame } = useConversationStore();
+  const { messages, isLoading, currentGameId, activeConversationId, addMessage, setLoading, setCurrentGame } = useConversationStore();
   const { selectedGame } = useGameStore();
   const { token, user, logout } = useAuthStore();
 
@@ -81,6 +81,8 @@ export const ChatInterface: React.FC = () => {
         body: JSON.stringify({
           query,
           game_system: selectedGame.game_id,
+          // The API keeps the conversation history server-side for follow-up questions
+          conversation_id: conversationId ?? activeConversationId ?? undefined,
         }),
       });
 
@@ -295,6 +297,7 @@ export const ChatInterface: React.FC = () => {
             onSendMessage={handleSendMessage}
             isLoading={isLoading}
             disabled={!selectedGame}
+            gameId={selectedGame?.game_id}
           />
         </div>
       </div>
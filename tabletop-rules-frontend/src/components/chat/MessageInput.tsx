@@ -1,25 +1,65 @@
-import React, { useState, KeyboardEvent } from 'react';
+import React, { useEffect, useState, KeyboardEvent } from 'react';
 
 interface MessageInputProps {
   onSendMessage: (message: string) => void;
   isLoading: boolean;
   placeholder?: string;
   disabled?: boolean;
+  gameId?: string;
 }
 
+interface Suggestion {
+  text: string;
+  kind: string;
+  replace_from: number;
+}
+
+const SUGGEST_DELAY_MS = 150;
+
 export const MessageInput: React.FC<MessageInputProps> = ({
   onSendMessage,
   isLoading,
   placeholder = "Ask a question about the rules...",
   disabled = false,
+  gameId,
 }) => {
   const [input, setInput] = useState('');
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+
+  // Autocomplete rule titles and key terms while a word is being typed
+  useEffect(() => {
+    if (!gameId || !input.trim() || /\s$/.test(input) || disabled) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      fetch(`/api/chat/suggest/${gameId}?q=${encodeURIComponent(input)}&limit=5`)
+        .then((response) => (response.ok ? response.json() : { suggestions: [] }))
+        .then((data) => {
+          if (!cancelled) setSuggestions(data.suggestions || []);
+        })
+        .catch(() => {
+          if (!cancelled) setSuggestions([]);
+        });
+    }, SUGGEST_DELAY_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [input, gameId, disabled]);
+
+  const applySuggestion = (suggestion: Suggestion) => {
+    setInput(input.slice(0, suggestion.replace_from) + suggestion.text + ' ');
+    setSuggestions([]);
+  };
 
   const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault();
     if (input.trim() && !isLoading && !disabled) {
       onSendMessage(input.trim());
       setInput('');
+      setSuggestions([]);
     }
   };
 
@@ -32,6 +72,33 @@ export const MessageInput: React.FC<MessageInputProps> = ({
 
   return (
     <form onSubmit={handleSubmit} className="message-input-form">
+      {suggestions.length > 0 && (
+        <ul
+          role="listbox"
+          aria-label="Suggestions"
+          style={{ listStyle: 'none', margin: '0 0 8px 0', padding: '0', display: 'flex', gap: '6px', flexWrap: 'wrap' }}
+        >
+          {suggestions.map((suggestion) => (
+            <li
+              key={suggestion.text}
+              role="option"
+              aria-selected={false}
+              onMouseDown={(e) => e.preventDefault()}
+              onClick={() => applySuggestion(suggestion)}
+              style={{
+                padding: '4px 10px',
+                border: '1px solid #ddd',
+                borderRadius: '12px',
+                fontSize: '12px',
+                cursor: 'pointer',
+                backgroundColor: '#f8f9fa',
+              }}
+            >
+              {suggestion.text}
+            </li>
+          ))}
+        </ul>
+      )}
       <div className="input-container">
         <textarea
           value={input}
@@ -139,7 +139,11 @@ export const GameSelector: React.FC = () => {
         {filteredGames.map((game: Game) => (
           <div
             key={game.game_id}
-            onClick={() => selectGame(game)}
+            onClick={() => {
+              selectGame(game);
+              // Warm the game's rules on the server before the first question; failures are harmless
+              fetch(`/api/games/${game.game_id}/prepare`, { method: 'POST' }).catch(() => {});
+            }}
             style={{
               padding: '20px',
               backgroundColor: 'white',